@@ -0,0 +1,317 @@
+"""
+Re-classifies stored missions of a time range with the current model.
+
+Classification points are streamed from InfluxDB chunk by chunk. Their features
+are reused, or recomputed from the flowmeter data with ``--recompute-features``,
+classified in vectorized batches spread over a process pool and written back
+through a batched writer. Completed chunks are recorded in a checkpoint file so
+an interrupted run resumes where it stopped.
+
+Usage:
+    python -m app.backfill --start 2025-04-01T00:00:00 --stop 2025-05-01T00:00:00
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.models.flow_data import FeatureSource, FlowClassifierFeatures
+from app.models.missions import CompletedFlowControlMission, EndUseType, FlowControlMission
+from app.services.batch_predictor import BatchPredictor
+from app.services.meters import ValveMeters, valve_meters_from_config
+from app.services.model_loader import load_classifier, model_version, validate_classifier
+from app.utils.config import config
+from app.utils.influx_client import CLASSIFICATION_MEASUREMENT, InfluxConnector, flux_time
+from app.utils.influx_writer import BufferedInfluxWriter
+from app.utils.logger import logger
+
+FEATURE_NAMES = list(FlowClassifierFeatures.model_fields)
+TAG_NAMES = ["valve_id", "predicted_end_use", "actual_end_use"]
+# Points written before the model version became a field hold it as a tag, read
+# back under this name so it does not clash with the field
+LEGACY_VERSION_COLUMN = "legacy_model_version"
+
+# Model of a pool worker process, loaded once by the initializer
+_worker_predictor: Optional[BatchPredictor] = None
+
+
+def load_predictor(model_path: str) -> BatchPredictor:
+    """Loads the classifier with the configured inference backend"""
+    classifier = load_classifier(model_path)
+    validate_classifier(classifier)
+    return BatchPredictor(classifier=classifier)
+
+
+def _init_worker(model_path: str):
+    global _worker_predictor
+    _worker_predictor = load_predictor(model_path)
+
+
+def _predict_in_worker(matrix: np.ndarray) -> np.ndarray:
+    return _worker_predictor.predict_matrix(matrix)
+
+
+def stored_missions_query(bucket: str, start: datetime, stop: datetime) -> str:
+    """Flux query returning one row per stored classification"""
+    return f"""from(bucket: "{bucket}")
+                |> range(start: {flux_time(start)}, stop: {flux_time(stop)})
+                |> filter(fn: (r) => r["_measurement"] == "{CLASSIFICATION_MEASUREMENT}")
+                |> filter(fn: (r) => exists r["predicted_end_use"])
+                |> rename(
+                    fn: (column) =>
+                        if column == "model_version" then "{LEGACY_VERSION_COLUMN}" else column,
+                )
+                |> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")"""
+
+
+def read_chunk(influx: InfluxConnector, start: datetime, stop: datetime) -> List[Dict]:
+    """Streams the stored classifications of one chunk"""
+    records = influx.query_api.query_stream(
+        stored_missions_query(influx.bucket, start, stop)
+    )
+    return [record.values for record in records]
+
+
+def recompute_features(
+    influx: InfluxConnector, rows: List[Dict], meters: Optional[ValveMeters] = None
+) -> List[Dict]:
+    """Replaces the stored flow features by features computed from the flowmeter data"""
+    meters = meters if meters is not None else ValveMeters()
+    usable = [
+        row
+        for row in rows
+        if row.get("end_ts_ns") is not None
+        and row.get("duration_scaling_factor") is not None
+    ]
+    missions = [
+        CompletedFlowControlMission(
+            # The trajectory is not stored and not needed for the flow summary
+            flow_control_mission=FlowControlMission.model_construct(valve_id=-1),
+            start_ts=row["_time"],
+            end_ts=datetime.fromtimestamp(row["end_ts_ns"] / 1e9, tz=timezone.utc),
+        )
+        for row in usable
+    ]
+    meter_ids = [
+        meters.meter_for(int(row["valve_id"]))
+        if row.get("valve_id") is not None
+        else meters.default_meter
+        for row in usable
+    ]
+    summaries = influx.get_flow_summaries(missions, meter_ids) if missions else []
+
+    recomputed = []
+    for row, summary in zip(usable, summaries):
+        if summary is None:
+            continue
+        row = dict(row)
+        row["Mean"] = summary.Mean
+        row["Peak"] = summary.Peak
+        row["Volume"] = summary.Volume * row["duration_scaling_factor"]
+        row["feature_source"] = FeatureSource.FLOWMETER.value
+        recomputed.append(row)
+    return recomputed
+
+
+def write_chunk(
+    influx: InfluxConnector,
+    writer: BufferedInfluxWriter,
+    rows: List[Dict],
+    labels: np.ndarray,
+    version: str,
+) -> int:
+    """
+    Writes the new classifications, removing stored points whose tags changed.
+
+    Returns the number of missions whose predicted end use changed.
+    """
+    changed = 0
+    stale = []
+    written = True
+    for row, label in zip(rows, labels):
+        end_use = EndUseType(label)
+        actual_end_use = row.get("actual_end_use")
+        end_ts_ns = row.get("end_ts_ns")
+        point = InfluxConnector.classification_point(
+            end_use=end_use,
+            start_ts=row["_time"],
+            flow_features={name: row[name] for name in FEATURE_NAMES},
+            valve_id=row.get("valve_id"),
+            actual_end_use=EndUseType(actual_end_use) if actual_end_use else None,
+            end_ts=(
+                datetime.fromtimestamp(end_ts_ns / 1e9, tz=timezone.utc)
+                if end_ts_ns is not None
+                else None
+            ),
+            duration_scaling_factor=row.get("duration_scaling_factor"),
+            model_version=version,
+            feature_source=row.get("feature_source"),
+        )
+        # A full batch is written right here, a spilled one fails the chunk too
+        written = writer.write(point) and written
+        if end_use.value != row["predicted_end_use"]:
+            changed += 1
+        old_tags = _series_tags(row)
+        if row.get(LEGACY_VERSION_COLUMN):
+            old_tags["model_version"] = str(row[LEGACY_VERSION_COLUMN])
+        new_tags = _series_tags(row, predicted_end_use=end_use.value)
+        if old_tags != new_tags:
+            stale.append((row, old_tags))
+
+    if not (writer.flush() and written):
+        raise RuntimeError("Failed to write re-classified missions to InfluxDB")
+
+    # A changed predicted end use, or a legacy model version tag, means a new
+    # series. The old tags differ from the new ones in a tag the new series lacks
+    # or holds another value of, so the predicate never matches the new point.
+    delete_api = influx.client.delete_api()
+    for row, old_tags in stale:
+        predicate = " AND ".join(
+            [f'_measurement="{CLASSIFICATION_MEASUREMENT}"']
+            + [f'{tag}="{value}"' for tag, value in old_tags.items()]
+        )
+        delete_api.delete(
+            start=row["_time"], stop=row["_time"], predicate=predicate, bucket=influx.bucket
+        )
+    return changed
+
+
+def _series_tags(row: Dict, **overrides: str) -> Dict[str, str]:
+    # The tags of a stored row as written by `InfluxConnector.classification_point`
+    tags = {tag: str(row[tag]) for tag in TAG_NAMES if row.get(tag)}
+    tags.update(overrides)
+    return tags
+
+
+def load_checkpoint(path: str, start: datetime, stop: datetime) -> datetime:
+    """Time up to which a previous run of the same range completed"""
+    if not os.path.exists(path):
+        return start
+    with open(path, "r", encoding="utf-8") as file:
+        checkpoint = json.load(file)
+    if checkpoint["start"] != start.isoformat() or checkpoint["stop"] != stop.isoformat():
+        logger.warning("Ignoring checkpoint %s of a different range", path)
+        return start
+    return datetime.fromisoformat(checkpoint["completed_until"])
+
+
+def save_checkpoint(path: str, start: datetime, stop: datetime, completed_until: datetime):
+    """Atomically records the progress of the run"""
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "start": start.isoformat(),
+                "stop": stop.isoformat(),
+                "completed_until": completed_until.isoformat(),
+            },
+            file,
+        )
+    os.replace(path + ".tmp", path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Re-classify stored missions with the current model"
+    )
+    parser.add_argument("--start", type=datetime.fromisoformat, required=True)
+    parser.add_argument("--stop", type=datetime.fromisoformat, required=True)
+    parser.add_argument(
+        "--model", default=config.MODEL_PATH, help="Model file, see app.export_model"
+    )
+    parser.add_argument(
+        "--chunk-hours", type=float, default=6, help="Time span of one query"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=4096, help="Rows per prediction task"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count(), help="Prediction processes"
+    )
+    parser.add_argument(
+        "--recompute-features",
+        action="store_true",
+        help="Recompute the flow features from the flowmeter data",
+    )
+    parser.add_argument("--checkpoint", default="backfill.checkpoint.json")
+    args = parser.parse_args()
+
+    influx = InfluxConnector()
+    meters = valve_meters_from_config(config.VALVE_METERS, config.DEFAULT_METER_ID)
+    # Not started: batches are written synchronously so the checkpoint is reliable
+    writer = BufferedInfluxWriter(
+        influx.write_api,
+        bucket=influx.bucket,
+        batch_size=config.INFLUXDB_WRITE_BATCH_SIZE,
+        spill_path=config.INFLUXDB_SPILL_PATH,
+    )
+    predictor = load_predictor(args.model)
+    version = model_version(args.model)
+    logger.info("Backfilling with model %s", version)
+    pool = (
+        ProcessPoolExecutor(
+            max_workers=args.workers, initializer=_init_worker, initargs=(args.model,)
+        )
+        if args.workers > 1
+        else None
+    )
+
+    chunk = timedelta(hours=args.chunk_hours)
+    chunk_start = load_checkpoint(args.checkpoint, args.start, args.stop)
+    if chunk_start > args.start:
+        logger.info("Resuming backfill at %s", chunk_start.isoformat())
+
+    total = 0
+    changed_total = 0
+    began = time.perf_counter()
+    try:
+        while chunk_start < args.stop:
+            chunk_stop = min(chunk_start + chunk, args.stop)
+            rows = read_chunk(influx, chunk_start, chunk_stop)
+            if args.recompute_features:
+                rows = recompute_features(influx, rows, meters)
+
+            if rows:
+                matrix = np.array(
+                    [[row[name] for name in predictor.feature_names] for row in rows],
+                    dtype=np.float64,
+                )
+                batches = [
+                    matrix[i : i + args.batch_size]
+                    for i in range(0, len(matrix), args.batch_size)
+                ]
+                if pool is not None:
+                    labels = np.concatenate(list(pool.map(_predict_in_worker, batches)))
+                else:
+                    labels = np.concatenate(
+                        [predictor.predict_matrix(batch) for batch in batches]
+                    )
+                changed_total += write_chunk(influx, writer, rows, labels, version)
+
+            total += len(rows)
+            save_checkpoint(args.checkpoint, args.start, args.stop, chunk_stop)
+            elapsed = time.perf_counter() - began
+            progress = (chunk_stop - args.start) / (args.stop - args.start)
+            logger.info(
+                "Backfilled up to %s (%.1f%%): %d missions, %d changed, %.0f missions/s",
+                chunk_stop.isoformat(),
+                progress * 100,
+                total,
+                changed_total,
+                total / max(elapsed, 1e-9),
+            )
+            chunk_start = chunk_stop
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        writer.close()
+        influx.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Converts the pickled classifier into a format that loads faster.
+
+``--format txt`` writes the native LightGBM model file, parsed by LightGBM's
+C++ loader, next to a ``<model>.txt.classes.json`` label file. ``--format json``
+writes the tree dump together with the class labels, loaded by the tree
+inference backend without importing lightgbm. Point ``MODEL_PATH`` to the
+exported file.
+
+Usage:
+    python -m app.export_model --model model.pkl --format json
+"""
+
+import argparse
+import json
+import os
+import pickle
+
+from app.services.model_loader import classes_path
+from app.utils.logger import logger
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the pickled classifier")
+    parser.add_argument("--model", default="model.pkl", help="Pickled classifier")
+    parser.add_argument("--format", choices=["txt", "json"], default="txt")
+    parser.add_argument("--output", help="Defaults to the model path with the new extension")
+    args = parser.parse_args()
+
+    with open(args.model, "rb") as file:
+        classifier = pickle.load(file)
+    booster = classifier.booster_
+    classes = classifier.classes_.tolist()
+    output = args.output or f"{os.path.splitext(args.model)[0]}.{args.format}"
+
+    if args.format == "txt":
+        booster.save_model(output)
+        with open(classes_path(output), "w", encoding="utf-8") as file:
+            json.dump(classes, file)
+    else:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump({"model": booster.dump_model(), "classes": classes}, file)
+
+    logger.info("Exported %s to %s", args.model, output)
+
+
+if __name__ == "__main__":
+    main()
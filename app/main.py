@@ -1,25 +1,123 @@
-import pickle
-import uvicorn
-from fastapi import FastAPI
+import time
 
-from app.services.websocket_service import WebSocketService
-from app.utils.config import config
-from app.routes.api import api_router
-from app.utils.influx_client import InfluxConnector
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager  # noqa: E402
+
+import uvicorn  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+from app.services.feed import MissionFeed  # noqa: E402
+from app.services.flow_buffer import FlowmeterIngest  # noqa: E402
+from app.services.inference_pool import shared_pool  # noqa: E402
+from app.services.journal import WriteAheadJournal  # noqa: E402
+from app.services.meters import valve_meters_from_config  # noqa: E402
+from app.services.model_loader import ModelLoader, load_model  # noqa: E402
+from app.services.model_registry import ModelRegistry  # noqa: E402
+from app.services.sharding import shard_from_config  # noqa: E402
+from app.services.websocket_service import WebSocketService  # noqa: E402
+from app.utils.config import config, log_config  # noqa: E402
+from app.routes.api import api_router  # noqa: E402
+from app.utils.influx_client import InfluxConnector  # noqa: E402
+from app.utils.logger import logger  # noqa: E402
+from app.utils.profiler import SamplingProfiler  # noqa: E402
+
+
+# Set when this process was forked by app.serve, the model then lives in the
+# shared inference workers
+inference_pool = shared_pool()
+# HTTP-only processes leave the mission stream to the consumer process
+consumes_missions = config.SERVE_ROLE != "http"
+
+influx = InfluxConnector()
+meters = valve_meters_from_config(config.VALVE_METERS, config.DEFAULT_METER_ID)
+flow_buffer = (
+    FlowmeterIngest(influx=influx, meter_ids=meters.meter_ids)
+    if config.FLOW_BUFFER_ENABLED
+    else None
+)
+shard = shard_from_config(config.SHARD_MEMBERS, config.SHARD_ID, config.SHARD_VIRTUAL_NODES)
+journal = (
+    WriteAheadJournal(
+        config.JOURNAL_DIR,
+        segment_bytes=config.JOURNAL_SEGMENT_BYTES,
+        fsync_interval_ms=config.JOURNAL_FSYNC_INTERVAL_MS,
+        fsync_batch=config.JOURNAL_FSYNC_BATCH,
+        checkpoint_interval_s=config.JOURNAL_CHECKPOINT_INTERVAL_S,
+    )
+    if config.JOURNAL_ENABLED and consumes_missions
+    else None
+)
+# Only the process consuming missions has anything to push
+feed = MissionFeed() if consumes_missions else None
+ws_service = WebSocketService(
+    influx=influx,
+    flow_buffer=flow_buffer,
+    shard=shard,
+    journal=journal,
+    meters=meters,
+    feed=feed,
+)
+model_registry = ModelRegistry(on_swap=ws_service.set_model)
+startup_timings = {}
+
+
+def _on_model_ready(model):
+    # Missions are only consumed once the warmed-up model is in place
+    model_registry.install(model)
+    if consumes_missions:
+        ws_service.start()
+    if inference_pool is None:
+        model_registry.start()
+
+    startup_timings["ready_s"] = time.perf_counter() - _import_started
+    if startup_timings["ready_s"] > config.STARTUP_BUDGET_S:
+        logger.warning(
+            "Startup took %.2f s, over the budget of %.2f s",
+            startup_timings["ready_s"],
+            config.STARTUP_BUDGET_S,
+        )
+    else:
+        logger.info("Service ready after %.2f s", startup_timings["ready_s"])
+
+
+model_loader = ModelLoader(
+    config.MODEL_PATH,
+    on_ready=_on_model_ready,
+    load=inference_pool.attach if inference_pool is not None else load_model,
+)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    log_config()
+    # The server answers liveness probes while the model loads in the background
+    model_loader.start()
+    yield
+    # Drain in-flight missions and flush buffered points before exiting
+    model_registry.stop()
+    ws_service.stop()
+    influx.close()
 
 
 app = FastAPI(
     version=config.VERSION,
     title=config.PROJECT_NAME,
     debug=config.DEBUG_LEVEL == "DEBUG",
+    lifespan=lifespan,
 )
 
-influx = InfluxConnector()
-lgbm = pickle.load(open("model.pkl", "rb"))
-ws_service = WebSocketService(influx=influx, classifier=lgbm)
-ws_service.start()
-
+app.state.ws_service = ws_service
+app.state.model_loader = model_loader
+app.state.model_registry = model_registry
+app.state.inference_pool = inference_pool
+app.state.feed = feed
+app.state.profiler = SamplingProfiler()
+app.state.startup_timings = startup_timings
 app.include_router(api_router)
 
+startup_timings["import_s"] = time.perf_counter() - _import_started
+logger.info("Application imported in %.2f s", startup_timings["import_s"])
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,189 @@
+"""
+Rewrites legacy classification points into the current "Classification" schema.
+
+Legacy points stored every classifier feature as a tag, creating one series per
+classification. This command streams them chunk by chunk, writes each one again
+with the features as fields and optionally deletes the legacy points of a chunk
+once all its replacements are written.
+
+Usage:
+    python -m app.migrate --start 2025-04-01T00:00:00 --stop 2025-05-01T00:00:00
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from influxdb_client import InfluxDBClient
+from influxdb_client.client.write_api import SYNCHRONOUS
+
+from app.models.flow_data import FlowClassifierFeatures
+from app.models.missions import EndUseType
+from app.utils.config import config
+from app.utils.influx_client import CLASSIFICATION_MEASUREMENT, InfluxConnector, flux_time
+from app.utils.influx_writer import BufferedInfluxWriter
+from app.utils.logger import logger
+
+FEATURE_NAMES = list(FlowClassifierFeatures.model_fields)
+
+
+def legacy_query(bucket: str, start: datetime, stop: datetime) -> str:
+    """Flux query selecting the legacy points, recognisable by their feature tags"""
+    return f"""from(bucket: "{bucket}")
+                |> range(start: {flux_time(start)}, stop: {flux_time(stop)})
+                |> filter(fn: (r) => r["_measurement"] == "{CLASSIFICATION_MEASUREMENT}")
+                |> filter(fn: (r) => r["_field"] == "end_use")
+                |> filter(fn: (r) => exists r["Volume"])"""
+
+
+def migrate_chunk(
+    client: InfluxDBClient,
+    bucket: str,
+    start: datetime,
+    stop: datetime,
+    writer: Optional[BufferedInfluxWriter],
+    delete_legacy: bool,
+) -> int:
+    """
+    Migrates the legacy points of one time chunk.
+
+    Parameters
+    ----------
+    client : InfluxDBClient
+        Client of the source bucket.
+    bucket : str
+        Bucket holding the legacy points.
+    start, stop : datetime
+        The chunk, ``start <= t < stop``.
+    writer : Optional[BufferedInfluxWriter]
+        Writer of the replacements, not started so batches are written
+        synchronously. None only counts the legacy points.
+    delete_legacy : bool
+        Delete the legacy points of the chunk once all replacements are written.
+
+    Returns
+    -------
+    int
+        Number of migrated points.
+
+    Raises
+    ------
+    RuntimeError
+        If a batch could not be written, no legacy point is deleted then.
+    """
+    migrated = 0
+    written = True
+    records = client.query_api().query_stream(legacy_query(bucket, start, stop))
+    for record in records:
+        migrated += 1
+        if writer is None:
+            continue
+        values = record.values
+        point = InfluxConnector.classification_point(
+            end_use=EndUseType(record.get_value()),
+            start_ts=record.get_time(),
+            flow_features={name: float(values[name]) for name in FEATURE_NAMES},
+        )
+        # A full batch is written right here, a spilled one fails the chunk too
+        written = writer.write(point) and written
+    if writer is None or not migrated:
+        return migrated
+
+    if not (writer.flush() and written):
+        raise RuntimeError(f"Failed to write the migrated points of {start} to {stop}")
+    if delete_legacy:
+        # One range delete per chunk. Legacy points have no predicted end use
+        # tag, and a predicate on an empty tag value matches the series without
+        # it, so the migrated points are kept. The stop time of a delete is
+        # inclusive, the points were written with microsecond timestamps.
+        client.delete_api().delete(
+            start=start,
+            stop=stop - timedelta(microseconds=1),
+            predicate=f'_measurement="{CLASSIFICATION_MEASUREMENT}" AND predicted_end_use=""',
+            bucket=bucket,
+        )
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rewrite legacy classification points with features as fields"
+    )
+    parser.add_argument("--start", type=datetime.fromisoformat, required=True)
+    parser.add_argument("--stop", type=datetime.fromisoformat, required=True)
+    parser.add_argument(
+        "--chunk-hours", type=float, default=24, help="Time span of one query"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=5000, help="Points per write request"
+    )
+    parser.add_argument(
+        "--spill-path",
+        default="migrate_spill.lp",
+        help="File receiving batches that could not be written, replayed on the next write",
+    )
+    parser.add_argument(
+        "--target-bucket", default=None, help="Defaults to the configured bucket"
+    )
+    parser.add_argument(
+        "--delete-legacy",
+        action="store_true",
+        help="Delete the legacy points of a chunk once its replacements are written",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Only count the legacy points"
+    )
+    args = parser.parse_args()
+
+    # A plain client, the writer and reader threads of InfluxConnector are not needed
+    client = InfluxDBClient(
+        url=config.INFLUXDB_URL.unicode_string(),
+        token=config.INFLUXDB_TOKEN,
+        org=config.INFLUXDB_ORG,
+        timeout=config.INFLUXDB_TIMEOUT_MS,
+    )
+    # Not started: batches are written synchronously before the legacy points are deleted
+    writer = (
+        BufferedInfluxWriter(
+            client.write_api(write_options=SYNCHRONOUS),
+            bucket=args.target_bucket or config.INFLUXDB_BUCKET,
+            batch_size=args.batch_size,
+            spill_path=args.spill_path,
+        )
+        if not args.dry_run
+        else None
+    )
+    chunk = timedelta(hours=args.chunk_hours)
+
+    total = 0
+    began = time.perf_counter()
+    chunk_start = args.start
+    try:
+        while chunk_start < args.stop:
+            chunk_stop = min(chunk_start + chunk, args.stop)
+            migrated = migrate_chunk(
+                client,
+                config.INFLUXDB_BUCKET,
+                chunk_start,
+                chunk_stop,
+                writer,
+                args.delete_legacy,
+            )
+            total += migrated
+            logger.info(
+                "Migrated %d points up to %s (%d total, %.0f points/s)",
+                migrated,
+                chunk_stop.isoformat(),
+                total,
+                total / max(time.perf_counter() - began, 1e-9),
+            )
+            chunk_start = chunk_stop
+    finally:
+        if writer is not None:
+            writer.close()
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
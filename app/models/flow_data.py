@@ -1,7 +1,17 @@
+from enum import Enum
 from typing import List, Optional, Tuple
 from pydantic import BaseModel
 
 
+class FeatureSource(str, Enum):
+    """Where the flow summary behind a classification comes from"""
+
+    # Flowmeter readings, from InfluxDB or the in-memory buffer
+    FLOWMETER = "flowmeter"
+    # Estimated from the flow trajectory of the mission
+    TRAJECTORY = "trajectory"
+
+
 class FlowDataSummary(BaseModel):
     """
     Summary of processed flow data obtained from InfluxDB.
@@ -2,9 +2,9 @@ from enum import Enum
 from datetime import datetime, time
 from typing import NamedTuple, Optional
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_serializer, field_validator
 
-from app.models.flow_data import FlowClassifierFeatures
+from app.models.flow_data import FeatureSource, FlowClassifierFeatures
 
 
 class TrajectoryPoint(NamedTuple):
@@ -127,6 +127,12 @@ class FlowControlMission(BaseModel):
 
         return trajectory
 
+    @field_serializer("flow_trajectory", when_used="json")
+    def _serialize_trajectory(self, trajectory) -> list[tuple[float, float]]:
+        # Same JSON as the NamedTuples, but serialized natively instead of
+        # field by field in Python (about 5x faster)
+        return trajectory
+
 
 class CompletedFlowControlMission(BaseModel):
     """
@@ -163,6 +169,11 @@ class ClassifiedFlowControlMission(CompletedFlowControlMission):
         An instance of `FlowClassifierFeatures` used for classifying the mission.
     predicted_end_use : EndUseType
         The predicted end use for this mission as determined by the classifier.
+    model_version : Optional[str]
+        Version of the model that produced the prediction.
+    feature_source : Optional[FeatureSource]
+        Whether the features were computed from flowmeter readings or estimated
+        from the flow trajectory.
 
     Attributes
     ----------
@@ -170,6 +181,10 @@ class ClassifiedFlowControlMission(CompletedFlowControlMission):
         Features of the mission used for classification.
     predicted_end_use : EndUseType
         The end use category that the mission's features suggest it matches.
+    model_version : Optional[str]
+        The model the prediction can be traced back to.
+    feature_source : Optional[FeatureSource]
+        The source of the flow features.
 
     Methods
     -------
@@ -191,3 +206,36 @@ class ClassifiedFlowControlMission(CompletedFlowControlMission):
 
     features: FlowClassifierFeatures
     predicted_end_use: EndUseType
+    model_version: Optional[str] = Field(
+        None, description="Version of the model that produced the prediction"
+    )
+    feature_source: Optional[FeatureSource] = Field(
+        None, description="Source of the flow features: flowmeter readings or the trajectory"
+    )
+
+    # "model_version" is a field, not part of pydantic's model_* API
+    model_config = ConfigDict(protected_namespaces=())
+
+
+class EndUseClassification(BaseModel):
+    """
+    Result of a synchronous classification request.
+
+    Attributes
+    ----------
+    features : FlowClassifierFeatures
+        The features the prediction is based on, computed server-side for missions.
+    predicted_end_use : EndUseType
+        The predicted end use.
+    model_version : str
+        Version of the model that produced the prediction.
+    feature_source : Optional[FeatureSource]
+        Source of the features computed for missions, None for given features.
+    """
+
+    features: FlowClassifierFeatures
+    predicted_end_use: EndUseType
+    model_version: str
+    feature_source: Optional[FeatureSource] = None
+
+    model_config = ConfigDict(protected_namespaces=())
@@ -1,14 +1,400 @@
-from fastapi import APIRouter
+import asyncio
+import hmac
+import os
+import threading
+from typing import List, Optional, Union
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    status,
+)
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from app.models.flow_data import FeatureSource, FlowClassifierFeatures
+from app.models.missions import (
+    CompletedFlowControlMission,
+    EndUseClassification,
+    EndUseType,
+)
+from app.services.feed import FeedSubscription, MissionFeed
+from app.services.model_registry import ModelRegistry
+from app.services.websocket_service import WebSocketService
+from app.utils.config import config
+from app.utils.metrics import REGISTRY
+from app.utils.profiler import SamplingProfiler, collapsed
 
 api_router = APIRouter()
 
+# One profile per process at a time
+_profiling = threading.Lock()
+
+ClassificationRequest = Union[FlowClassifierFeatures, CompletedFlowControlMission]
+
+
+def get_ws_service(request: Request) -> WebSocketService:
+    """Dependency returning the service holding the loaded classifier."""
+    service = request.app.state.ws_service
+    if not service.ready:
+        raise HTTPException(status_code=503, detail="Model is still loading")
+    return service
+
+
+def require_admin(authorization: Optional[str] = Header(None)):
+    """Dependency admitting requests with the ``ADMIN_TOKEN`` bearer token."""
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=403, detail="Admin routes are disabled, set ADMIN_TOKEN"
+        )
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(
+        token.encode(), config.ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid admin token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+def get_model_registry(request: Request) -> ModelRegistry:
+    """Dependency returning the registry of the active model."""
+    if not request.app.state.ws_service.ready:
+        raise HTTPException(status_code=503, detail="Model is still loading")
+    return request.app.state.model_registry
+
+
+def get_reloadable_registry(request: Request) -> ModelRegistry:
+    """Dependency returning the registry if this process may replace its model."""
+    if request.app.state.inference_pool is not None:
+        # The model is shared with the inference workers of app.serve
+        raise HTTPException(
+            status_code=409, detail="Models cannot be reloaded in process mode"
+        )
+    return get_model_registry(request)
+
+
+class ModelReloadRequest(BaseModel):
+    """Model file of ``MODEL_DIR`` to activate, defaults to its newest file."""
+
+    path: Optional[str] = None
+
 
 @api_router.get("/health")
+@api_router.get("/health/live")
 def read_health():
     """
     Check the health status of the application.
 
+    Answers as soon as the server runs, independent of the model (liveness).
+
     Returns:
         dict: A dictionary containing the health status of the application.
     """
     return {"status": "ok"}
+
+
+@api_router.get("/health/ready")
+def read_readiness(request: Request, response: Response):
+    """
+    Check whether the application can classify missions.
+
+    Ready once the model is loaded, warmed up and the mission consumer runs.
+
+    Returns:
+        dict: The readiness status and the measured startup timings in seconds.
+    """
+    loader = request.app.state.model_loader
+    timings = request.app.state.startup_timings
+    if loader.ready.is_set():
+        return {"status": "ready", **timings, "model_load_s": loader.load_seconds}
+
+    response.status_code = 503
+    if loader.error is not None:
+        return {"status": "failed", "error": str(loader.error)}
+    return {"status": "loading", **timings}
+
+
+@api_router.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """
+    Expose the service metrics for Prometheus.
+
+    Counters and histograms are updated in place while missions are processed,
+    queue depths are read only when this route is scraped.
+
+    Returns:
+        PlainTextResponse: All metrics in the Prometheus text format.
+    """
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@api_router.get("/admin/models")
+def read_active_model(registry: ModelRegistry = Depends(get_model_registry)):
+    """
+    Describe the model serving predictions.
+
+    Returns:
+        dict: Version, file and load time of the active model.
+    """
+    return _describe(registry)
+
+
+@api_router.post("/admin/models/reload", dependencies=[Depends(require_admin)])
+def reload_model(
+    body: Optional[ModelReloadRequest] = None,
+    registry: ModelRegistry = Depends(get_reloadable_registry),
+):
+    """
+    Load, validate and activate a model without interrupting predictions.
+
+    Args:
+        body: The model file to activate, absolute or relative to ``MODEL_DIR``.
+
+    Returns:
+        dict: The newly active model. The previous model stays active on errors.
+    """
+    path = body.path if body is not None else None
+    if path is not None:
+        # Loading a pickle runs code, only files deployed as models are accepted
+        if not registry.contains(path):
+            raise HTTPException(
+                status_code=403, detail="Models can only be loaded from MODEL_DIR"
+            )
+        path = os.path.join(registry.directory, path)
+    try:
+        registry.activate(path)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        # Any file that cannot be loaded or validated, e.g. a label file
+        raise HTTPException(status_code=422, detail=f"Invalid model: {e}")
+    return _describe(registry)
+
+
+@api_router.post(
+    "/admin/profile",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(require_admin)],
+)
+def profile(
+    request: Request,
+    seconds: float = Query(10.0, gt=0, le=config.PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(config.PROFILE_INTERVAL_MS, ge=1),
+    trace: bool = False,
+):
+    """
+    Sample the stacks of all threads of this process while it keeps running.
+
+    Args:
+        seconds: How long to sample.
+        interval_ms: Time between two samples.
+        trace: Also record the timings of every mission received meanwhile
+            and write them as JSON lines to ``PROFILE_TRACE_DIR``.
+
+    Returns:
+        PlainTextResponse: Collapsed stacks for flamegraph.pl or speedscope. The
+            trace file is named in the ``X-Trace-File`` header.
+    """
+    if not _profiling.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    try:
+        profiler: SamplingProfiler = request.app.state.profiler
+        tracer = request.app.state.ws_service.tracer
+        if trace:
+            tracer.start(seconds)
+        try:
+            stacks = profiler.profile(seconds, interval_ms)
+        finally:
+            trace_file = tracer.finish() if trace else None
+    finally:
+        _profiling.release()
+    headers = {"X-Trace-File": trace_file} if trace_file is not None else None
+    return PlainTextResponse(collapsed(stacks), headers=headers)
+
+
+def _describe(registry: ModelRegistry) -> dict:
+    model = registry.current
+    return {"version": model.version, "path": model.path, "loaded_at": model.loaded_at}
+
+
+@api_router.post("/classify", response_model=EndUseClassification)
+def classify(
+    item: ClassificationRequest,
+    service: WebSocketService = Depends(get_ws_service),
+):
+    """
+    Classify a single event.
+
+    Args:
+        item: Either the classifier features or a completed mission whose features
+            are computed from the flowmeter data.
+
+    Returns:
+        EndUseClassification: The predicted end use and the features it is based on.
+    """
+    result = _classify_items([item], service)[0]
+    if result is None:
+        raise HTTPException(status_code=404, detail="No flowmeter data for mission")
+    return result
+
+
+@api_router.post(
+    "/classify/batch", response_model=List[Optional[EndUseClassification]]
+)
+def classify_batch(
+    items: List[ClassificationRequest],
+    service: WebSocketService = Depends(get_ws_service),
+):
+    """
+    Classify many events with one vectorized prediction.
+
+    Args:
+        items: Classifier features and/or completed missions.
+
+    Returns:
+        list: One classification per item, in order. Missions without flowmeter data
+            yield null.
+    """
+    return _classify_items(items, service)
+
+
+def _classify_items(
+    items: List[ClassificationRequest], service: WebSocketService
+) -> List[Optional[EndUseClassification]]:
+    # Runs in FastAPI's threadpool, so the blocking Influx query and prediction
+    # do not stall the event loop
+    features: List[Optional[FlowClassifierFeatures]] = [
+        item if isinstance(item, FlowClassifierFeatures) else None for item in items
+    ]
+    sources: List[Optional[FeatureSource]] = [None] * len(items)
+    missions = [
+        (index, item)
+        for index, item in enumerate(items)
+        if isinstance(item, CompletedFlowControlMission)
+    ]
+    mission_features, mission_sources = service.features_for_missions(
+        [item for _, item in missions]
+    )
+    for (index, _), flow_features, source in zip(missions, mission_features, mission_sources):
+        features[index] = flow_features
+        sources[index] = source
+
+    known = [flow_features for flow_features in features if flow_features is not None]
+    end_uses, model_version = service.classify_features(known)
+    end_uses = iter(end_uses)
+    return [
+        EndUseClassification(
+            features=flow_features,
+            predicted_end_use=next(end_uses),
+            model_version=model_version,
+            feature_source=source,
+        )
+        if flow_features is not None
+        else None
+        for flow_features, source in zip(features, sources)
+    ]
+
+
+@api_router.websocket("/missions/classified/ws")
+async def classified_missions_ws(
+    websocket: WebSocket,
+    valve_id: Optional[List[int]] = Query(None),
+    end_use: Optional[List[EndUseType]] = Query(None),
+):
+    """
+    Push every classified mission to the client as a JSON text message.
+
+    Args:
+        valve_id: Only missions of these valves (repeatable).
+        end_use: Only missions predicted as these end uses (repeatable).
+
+    The connection is closed with code 1013 when the subscriber limit is
+    reached, or when the client falls behind and ``FEED_SLOW_POLICY`` is
+    ``disconnect``.
+    """
+    feed: Optional[MissionFeed] = websocket.app.state.feed
+    if feed is None:
+        await websocket.close(
+            code=status.WS_1008_POLICY_VIOLATION,
+            reason="The live feed is served by the mission consumer",
+        )
+        return
+    subscription = feed.subscribe(valve_id, end_use)
+    if subscription is None:
+        await websocket.close(
+            code=status.WS_1013_TRY_AGAIN_LATER, reason="Too many subscribers"
+        )
+        return
+
+    await websocket.accept()
+    # Notices a disconnect while no mission arrives
+    watcher = asyncio.create_task(_close_on_disconnect(websocket, subscription))
+    try:
+        while (message := await subscription.get()) is not None:
+            await websocket.send_text(message.text)
+        if not watcher.done():
+            await websocket.close(
+                code=status.WS_1013_TRY_AGAIN_LATER, reason="Too slow"
+            )
+    except Exception:
+        # The client went away in the middle of a send
+        pass
+    finally:
+        watcher.cancel()
+        feed.unsubscribe(subscription)
+
+
+async def _close_on_disconnect(websocket: WebSocket, subscription: FeedSubscription):
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+    subscription.close()
+
+
+@api_router.get("/missions/classified/stream")
+async def classified_missions_stream(
+    request: Request,
+    valve_id: Optional[List[int]] = Query(None),
+    end_use: Optional[List[EndUseType]] = Query(None),
+):
+    """
+    Stream every classified mission as a server-sent event.
+
+    Args:
+        valve_id: Only missions of these valves (repeatable).
+        end_use: Only missions predicted as these end uses (repeatable).
+
+    Returns:
+        StreamingResponse: ``text/event-stream`` with one JSON ``data`` line per mission.
+    """
+    feed: Optional[MissionFeed] = request.app.state.feed
+    if feed is None:
+        raise HTTPException(
+            status_code=404, detail="The live feed is served by the mission consumer"
+        )
+    subscription = feed.subscribe(valve_id, end_use)
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Too many subscribers")
+
+    async def events():
+        # Cancelled by the server when the client disconnects
+        try:
+            while (message := await subscription.get()) is not None:
+                yield message.event
+        finally:
+            feed.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
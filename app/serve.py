@@ -0,0 +1,160 @@
+"""
+Serves the classifier with several processes on one machine.
+
+A supervisor loads and validates the model once, creates a shared-memory
+inference pool and forks:
+
+* ``--inference-workers`` processes evaluating the model, see
+  `SharedMemoryInferencePool`;
+* exactly one mission consumer (``SERVE_ROLE=consumer``), which reads the
+  mission WebSocket and serves its own API on ``--consumer-port``;
+* ``--http-workers`` API processes (``SERVE_ROLE=http``) sharing the listening
+  socket of ``--port``, which never consume missions.
+
+Every process classifies through the inference workers, so the HTTP workers
+scale independently of the single consumer and no mission is classified
+twice. Processes that exit are restarted. Models cannot be hot-reloaded in
+this mode, restart the supervisor instead.
+
+Usage:
+    python -m app.serve --http-workers 4 --inference-workers 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from typing import Callable, Dict, Optional
+
+from app.services.inference_pool import SharedMemoryInferencePool, share_pool
+from app.services.model_loader import load_classifier, model_version, validate_classifier
+from app.utils.config import config
+from app.utils.logger import logger
+
+# Children inherit the model and the pool instead of loading them again
+_FORK = multiprocessing.get_context("fork")
+
+
+def _run_server(
+    pool: SharedMemoryInferencePool,
+    client: int,
+    role: str,
+    host: str,
+    port: int,
+    sock: Optional[socket.socket] = None,
+):
+    """Runs the API of `app.main` in a forked client process of the pool"""
+    config.SERVE_ROLE = role
+    share_pool(pool, client)
+    # Imported after the fork, app.main starts threads and connections
+    import uvicorn
+
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port))
+    server.run(sockets=[sock] if sock is not None else None)
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve with one mission consumer and shared inference workers"
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000, help="Port of the HTTP workers")
+    parser.add_argument(
+        "--consumer-port", type=int, default=5001, help="API port of the mission consumer"
+    )
+    parser.add_argument("--http-workers", type=int, default=2)
+    parser.add_argument(
+        "--inference-workers", type=int, default=os.cpu_count(), help="Model processes"
+    )
+    parser.add_argument("--model", default=config.MODEL_PATH)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    # Only parsed here, the model is first evaluated by the inference workers
+    classifier = load_classifier(args.model)
+    validate_classifier(classifier)
+    pool = SharedMemoryInferencePool(
+        classifier,
+        version=model_version(args.model),
+        path=args.model,
+        workers=args.inference_workers,
+        clients=1 + args.http_workers,
+    )
+    logger.info(
+        "Loaded model %s in %.2f s for %d inference workers",
+        pool.version,
+        time.perf_counter() - started,
+        args.inference_workers,
+    )
+    sock = _bind(args.host, args.port)
+
+    # Process name -> function starting it, client 0 is the consumer
+    targets: Dict[str, Callable[[], multiprocessing.Process]] = {}
+    for worker in range(args.inference_workers):
+        targets[f"inference-{worker}"] = lambda worker=worker: _FORK.Process(
+            target=pool.serve, args=(worker,), daemon=True
+        )
+    targets["consumer"] = lambda: _FORK.Process(
+        target=_run_server, args=(pool, 0, "consumer", args.host, args.consumer_port)
+    )
+    for index in range(args.http_workers):
+        targets[f"http-{index}"] = lambda index=index: _FORK.Process(
+            target=_run_server,
+            args=(pool, 1 + index, "http", args.host, args.port, sock),
+        )
+
+    stopping = False
+
+    def _stop(_signum, _frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    processes = {}
+    for name, create in targets.items():
+        processes[name] = create()
+        processes[name].start()
+
+    try:
+        while not stopping:
+            time.sleep(1)
+            for name, process in processes.items():
+                if not process.is_alive() and not stopping:
+                    logger.error(
+                        "Process %s exited with code %s, restarting it", name, process.exitcode
+                    )
+                    processes[name] = targets[name]()
+                    processes[name].start()
+    finally:
+        # The API processes drain their missions while the model still answers
+        for name, process in processes.items():
+            if not name.startswith("inference-"):
+                process.terminate()
+        for name, process in processes.items():
+            if not name.startswith("inference-"):
+                process.join()
+        for name, process in processes.items():
+            if name.startswith("inference-"):
+                process.terminate()
+                process.join()
+        sock.close()
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from app.models.flow_data import FlowClassifierFeatures
+from app.utils.config import config
+from app.utils.logger import logger
+from app.utils.metrics import Histogram
+
+PREDICT_SECONDS = Histogram(
+    "predict_batch_seconds", "Duration of one batched classifier call"
+)
+PREDICT_BATCH_ROWS = Histogram(
+    "predict_batch_rows",
+    "Rows per batched classifier call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+)
+
+
+class BatchPredictor:
+    """
+    Micro-batching front end for the end use classifier.
+
+    Feature vectors submitted from any thread are written straight into a
+    preallocated NumPy matrix whose columns follow the classifier's
+    ``feature_name_`` order. A background thread flushes the matrix through a
+    single classifier call as soon as ``max_batch_size`` rows are pending or
+    ``max_wait_ms`` have passed since the first pending row, and resolves one
+    future per submitted row.
+
+    Parameters
+    ----------
+    classifier : LGBMClassifier
+        A fitted classifier exposing ``feature_name_`` and ``classes_``.
+    max_batch_size : int
+        Number of rows that triggers an immediate flush.
+    max_wait_ms : float
+        Maximum time a row waits for companions before the batch is flushed.
+
+    Examples
+    --------
+    >>> predictor = BatchPredictor(classifier=lgbm)
+    >>> predictor.start()
+    >>> predictor.predict(flow_features)
+    'Shower'
+    """
+
+    def __init__(
+        self,
+        classifier,
+        max_batch_size: int = config.PREDICT_BATCH_SIZE,
+        max_wait_ms: float = config.PREDICT_BATCH_WAIT_MS,
+    ):
+        self.classifier = classifier
+        self.feature_names: List[str] = list(classifier.feature_name_)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        # Two buffers so new rows can be written while the other one is predicted
+        shape = (max_batch_size, len(self.feature_names))
+        self._buffers = [np.empty(shape, dtype=np.float64) for _ in range(2)]
+        self._active = 0
+        self._pending: List[Future] = []
+        self._first_arrival = 0.0
+
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the flushing thread"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name="batch-predictor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Flush pending rows and stop the flushing thread"""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, features: FlowClassifierFeatures) -> Future:
+        """
+        Queue a feature vector for the next batch.
+
+        Returns
+        -------
+        Future
+            Resolves to the predicted class label of this row.
+        """
+        future: Future = Future()
+        with self._condition:
+            while self._running and len(self._pending) >= self.max_batch_size:
+                # Both buffers are busy, wait for the flusher to swap
+                self._condition.wait()
+            if self._running:
+                row = len(self._pending)
+                matrix = self._buffers[self._active]
+                for column, name in enumerate(self.feature_names):
+                    matrix[row, column] = getattr(features, name)
+                if row == 0:
+                    self._first_arrival = time.monotonic()
+                self._pending.append(future)
+                self._condition.notify_all()
+                return future
+
+        # Not started or already stopped (e.g. replaced by a reloaded model):
+        # predict the row right away instead of leaving the future unresolved
+        try:
+            future.set_result(self.predict_many([features])[0])
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def predict(self, features: FlowClassifierFeatures):
+        """Predict the class label of a single feature vector through the batch queue."""
+        return self.submit(features).result()
+
+    def predict_many(self, features: Sequence[FlowClassifierFeatures]) -> np.ndarray:
+        """Predict several feature vectors in one classifier call, bypassing the queue."""
+        return self.predict_matrix(self.to_matrix(features))
+
+    def to_matrix(self, features: Sequence[FlowClassifierFeatures]) -> np.ndarray:
+        """Build a feature matrix in ``feature_name_`` column order."""
+        matrix = np.empty((len(features), len(self.feature_names)), dtype=np.float64)
+        for row, flow_features in enumerate(features):
+            for column, name in enumerate(self.feature_names):
+                matrix[row, column] = getattr(flow_features, name)
+        return matrix
+
+    def predict_matrix(self, matrix: np.ndarray) -> np.ndarray:
+        """
+        Predict class labels for a matrix whose columns follow ``feature_name_``.
+
+        LightGBM's scikit-learn wrapper validates feature names on every call,
+        so fitted LGBMClassifier instances are evaluated through their booster
+        directly. The label selection mirrors ``LGBMClassifier.predict``.
+        """
+        booster = getattr(self.classifier, "booster_", None)
+        if booster is None:
+            return np.asarray(self.classifier.predict(matrix))
+
+        result = booster.predict(matrix)
+        if result.ndim == 1:
+            class_index = (result > 0.5).astype(np.intp)
+        else:
+            class_index = np.argmax(result, axis=1)
+        return np.asarray(self.classifier.classes_)[class_index]
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._pending:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+
+                deadline = self._first_arrival + self.max_wait
+                while (
+                    self._running
+                    and len(self._pending) < self.max_batch_size
+                    and (remaining := deadline - time.monotonic()) > 0
+                ):
+                    self._condition.wait(remaining)
+
+                futures = self._pending
+                matrix = self._buffers[self._active][: len(futures)]
+                self._pending = []
+                self._active ^= 1
+                self._condition.notify_all()
+
+            self._flush(matrix, futures)
+
+    def _flush(self, matrix: np.ndarray, futures: List[Future]):
+        PREDICT_BATCH_ROWS.observe(len(futures))
+        try:
+            with PREDICT_SECONDS.time():
+                labels = self.predict_matrix(matrix)
+        except Exception as e:
+            logger.error(f"Batch prediction failed: {e}")
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        logger.debug("Predicted batch of %d missions", len(futures))
+        for future, label in zip(futures, labels):
+            future.set_result(label)
@@ -0,0 +1,206 @@
+import asyncio
+import threading
+from collections import deque
+from typing import Collection, Literal, NamedTuple, Optional, Tuple
+
+from app.models.missions import EndUseType
+from app.utils.config import config
+from app.utils.metrics import Counter, Gauge
+
+FEED_SUBSCRIBERS = Gauge("feed_subscribers", "Connected subscribers of the live feed")
+FEED_MESSAGES = Counter(
+    "feed_messages_total",
+    "Live feed messages by outcome (queued, dropped, disconnected)",
+    ["outcome"],
+)
+_QUEUED = FEED_MESSAGES.labels("queued")
+_DROPPED = FEED_MESSAGES.labels("dropped")
+_DISCONNECTED = FEED_MESSAGES.labels("disconnected")
+
+SlowSubscriberPolicy = Literal["drop_oldest", "disconnect"]
+
+
+class FeedMessage(NamedTuple):
+    """A classified mission, encoded once for every subscriber and transport"""
+
+    text: str
+    # Complete server-sent event
+    event: bytes
+
+
+class FeedSubscription:
+    """
+    Bounded queue of one subscriber of the live feed.
+
+    Messages are offered from the publishing threads and consumed by the
+    subscriber's connection on the event loop.
+
+    Parameters
+    ----------
+    loop : asyncio.AbstractEventLoop
+        The loop of the subscriber's connection.
+    queue_size : int
+        Messages kept while the subscriber falls behind.
+    policy : SlowSubscriberPolicy
+        ``drop_oldest`` discards the oldest queued message of a full queue,
+        ``disconnect`` closes the subscription instead.
+    valve_ids : Optional[Collection[int]]
+        Only missions of these valves, all if None.
+    end_uses : Optional[Collection[EndUseType]]
+        Only missions predicted as one of these end uses, all if None.
+
+    Attributes
+    ----------
+    dropped : int
+        Messages discarded because the queue was full.
+    closed : bool
+        Set once the subscriber disconnected or was disconnected for being
+        too slow.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        queue_size: int,
+        policy: SlowSubscriberPolicy,
+        valve_ids: Optional[Collection[int]] = None,
+        end_uses: Optional[Collection[EndUseType]] = None,
+    ):
+        self.loop = loop
+        self.queue_size = queue_size
+        self.policy = policy
+        self.valve_ids = frozenset(valve_ids) if valve_ids else None
+        self.end_uses = frozenset(end_uses) if end_uses else None
+        self.dropped = 0
+        self.closed = False
+
+        self._queue: deque = deque()
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event()
+
+    def matches(self, valve_id: int, end_use: EndUseType) -> bool:
+        return (self.valve_ids is None or valve_id in self.valve_ids) and (
+            self.end_uses is None or end_use in self.end_uses
+        )
+
+    def offer(self, message: FeedMessage):
+        """Queue a message without ever blocking the publisher"""
+        with self._lock:
+            if self.closed:
+                return
+            if len(self._queue) >= self.queue_size:
+                if self.policy == "disconnect":
+                    self.closed = True
+                    self._queue.clear()
+                    _DISCONNECTED.inc()
+                else:
+                    self._queue.popleft()
+                    self.dropped += 1
+                    _DROPPED.inc()
+            if not self.closed:
+                self._queue.append(message)
+                _QUEUED.inc()
+        try:
+            self.loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            # The loop of the connection is already closed
+            pass
+
+    def close(self):
+        """End the subscription, e.g. when the subscriber disconnected"""
+        with self._lock:
+            self.closed = True
+            self._queue.clear()
+        self.loop.call_soon_threadsafe(self._ready.set)
+
+    async def get(self) -> Optional[FeedMessage]:
+        """The next message, None once the subscription was closed"""
+        while True:
+            with self._lock:
+                if self._queue:
+                    return self._queue.popleft()
+                if self.closed:
+                    return None
+                # Cleared under the lock, a later offer sets it again
+                self._ready.clear()
+            await self._ready.wait()
+
+
+class MissionFeed:
+    """
+    Fans classified missions out to the subscribers of the live feed.
+
+    Every mission is encoded once and the same message object is queued for
+    all matching subscribers, each of which has its own bounded queue, so a
+    slow subscriber never holds up the pipeline or the others.
+
+    Parameters
+    ----------
+    queue_size : int
+        Queue capacity of every subscriber.
+    policy : SlowSubscriberPolicy
+        What happens when a subscriber's queue is full, see `FeedSubscription`.
+    max_subscribers : int
+        Further subscriptions are refused. A subscriber disconnected for being
+        too slow no longer counts.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = config.FEED_QUEUE_SIZE,
+        policy: SlowSubscriberPolicy = config.FEED_SLOW_POLICY,
+        max_subscribers: int = config.FEED_MAX_SUBSCRIBERS,
+    ):
+        self.queue_size = queue_size
+        self.policy = policy
+        self.max_subscribers = max_subscribers
+        # Replaced as a whole, publishers iterate without taking the lock
+        self._subscriptions: Tuple[FeedSubscription, ...] = ()
+        self._lock = threading.Lock()
+        FEED_SUBSCRIBERS.set_function(lambda: len(self._subscriptions))
+
+    def subscribe(
+        self,
+        valve_ids: Optional[Collection[int]] = None,
+        end_uses: Optional[Collection[EndUseType]] = None,
+    ) -> Optional[FeedSubscription]:
+        """
+        Register a subscriber of the running event loop.
+
+        Returns
+        -------
+        Optional[FeedSubscription]
+            None if ``max_subscribers`` are connected already.
+        """
+        subscription = FeedSubscription(
+            asyncio.get_running_loop(), self.queue_size, self.policy, valve_ids, end_uses
+        )
+        with self._lock:
+            if len(self._subscriptions) >= self.max_subscribers:
+                return None
+            self._subscriptions = self._subscriptions + (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription: FeedSubscription):
+        with self._lock:
+            self._subscriptions = tuple(
+                other for other in self._subscriptions if other is not subscription
+            )
+
+    def publish(self, payload: bytes, valve_id: int, end_use: EndUseType):
+        """Queue the JSON of a classified mission for every matching subscriber"""
+        subscriptions = self._subscriptions
+        if not subscriptions:
+            return
+        message = None
+        for subscription in subscriptions:
+            if not subscription.matches(valve_id, end_use):
+                continue
+            if message is None:
+                message = FeedMessage(
+                    text=payload.decode(), event=b"data: " + payload + b"\n\n"
+                )
+            subscription.offer(message)
+            if subscription.closed:
+                # Disconnected for being too slow, its place is free right away
+                self.unsubscribe(subscription)
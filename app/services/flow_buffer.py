@@ -0,0 +1,309 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.models.flow_data import FlowDataSummary
+from app.utils.config import config
+from app.utils.flow_aggregation import PEAK_WINDOW_NS, VOLUME_UNIT_NS
+from app.utils.influx_client import InfluxConnector, to_ns
+from app.utils.logger import logger
+
+_NO_TIMES = np.empty(0, dtype=np.int64)
+_NO_VALUES = np.empty(0, dtype=np.float64)
+
+
+class FlowRingBuffer:
+    """
+    Fixed-size, array-backed buffer of the readings of one flowmeter.
+
+    Next to every reading the buffer stores running accumulators: the prefix
+    sum of the readings and the prefix trapezoidal integral between
+    consecutive readings. The mean and the volume of any buffered time window
+    are therefore differences of two accumulators (O(1)); only the peak of
+    the 10 s window means is computed over the window itself (O(window)).
+
+    Parameters
+    ----------
+    capacity : int
+        Number of readings kept. The oldest reading is overwritten when full.
+    max_age_ns : int
+        Readings older than the newest one by more than this are evicted.
+
+    Attributes
+    ----------
+    complete_from_ns : int
+        The buffer holds every reading at or after this time.
+    watermark_ns : int
+        Every reading before this time has been ingested.
+    """
+
+    def __init__(self, capacity: int, max_age_ns: int):
+        self.capacity = capacity
+        self.max_age_ns = max_age_ns
+        self.complete_from_ns = 0
+        self.watermark_ns = 0
+
+        self._times = np.zeros(capacity, dtype=np.int64)
+        self._values = np.zeros(capacity, dtype=np.float64)
+        self._sums = np.zeros(capacity, dtype=np.float64)
+        self._integrals = np.zeros(capacity, dtype=np.float64)
+        # Sequence numbers of the oldest and the next reading
+        self._head = 0
+        self._tail = 0
+        self._lock = threading.Lock()
+        # Notified whenever the watermark advances
+        self._ingested = threading.Condition(self._lock)
+
+    def __len__(self):
+        return self._tail - self._head
+
+    def extend(self, timestamps: np.ndarray, values: np.ndarray, watermark_ns: int):
+        """
+        Appends readings sorted by time and advances the ingest watermark.
+
+        Readings not newer than the last buffered one are ignored.
+        """
+        with self._lock:
+            if not self.complete_from_ns and len(timestamps):
+                self.complete_from_ns = int(timestamps[0])
+            for ts, value in zip(timestamps.tolist(), values.tolist()):
+                self._append(ts, value)
+            self.watermark_ns = max(self.watermark_ns, watermark_ns)
+            self._evict_by_age()
+            self._ingested.notify_all()
+
+    def wait_for(self, end_ns: int, timeout: float) -> bool:
+        """Waits up to ``timeout`` seconds until every reading before ``end_ns`` is ingested"""
+        with self._ingested:
+            return self._ingested.wait_for(lambda: self.watermark_ns >= end_ns, timeout)
+
+    def _append(self, ts: int, value: float):
+        if self._tail > self._head:
+            last = (self._tail - 1) % self.capacity
+            previous_ts = int(self._times[last])
+            if ts <= previous_ts:
+                return
+            previous_sum = self._sums[last]
+            previous_integral = self._integrals[last] + 0.5 * (
+                value + self._values[last]
+            ) * ((ts - previous_ts) / VOLUME_UNIT_NS)
+        else:
+            previous_sum = 0.0
+            previous_integral = 0.0
+
+        if self._tail - self._head == self.capacity:
+            self._evict_oldest()
+
+        index = self._tail % self.capacity
+        self._times[index] = ts
+        self._values[index] = value
+        self._sums[index] = previous_sum + value
+        self._integrals[index] = previous_integral
+        self._tail += 1
+
+        if self._tail % self.capacity == 0:
+            self._rebase()
+
+    def _evict_oldest(self):
+        self.complete_from_ns = int(self._times[self._head % self.capacity]) + 1
+        self._head += 1
+
+    def _evict_by_age(self):
+        if self._tail == self._head:
+            return
+        newest = int(self._times[(self._tail - 1) % self.capacity])
+        while (
+            self._head < self._tail
+            and newest - int(self._times[self._head % self.capacity]) > self.max_age_ns
+        ):
+            self._evict_oldest()
+
+    def _rebase(self):
+        """Keeps the accumulators small so that their differences stay precise"""
+        if self._tail == self._head:
+            return
+        oldest = self._head % self.capacity
+        base_sum = self._sums[oldest] - self._values[oldest]
+        base_integral = self._integrals[oldest]
+        self._sums -= base_sum
+        self._integrals -= base_integral
+
+    def summarize(self, start_ns: int, end_ns: int) -> Optional[FlowDataSummary]:
+        """
+        Summarizes the readings of ``start_ns <= t < end_ns``.
+
+        Returns
+        -------
+        Optional[FlowDataSummary]
+            None if the window is not completely buffered or holds no reading.
+        """
+        with self._lock:
+            if start_ns < self.complete_from_ns or end_ns > self.watermark_ns:
+                return None
+            first = self._rank(start_ns)
+            last = self._rank(end_ns)
+            if first == last:
+                return None
+            i = (self._head + first) % self.capacity
+            j = (self._head + last - 1) % self.capacity
+
+            count = last - first
+            mean = (self._sums[j] - self._sums[i] + self._values[i]) / count
+            volume = self._integrals[j] - self._integrals[i]
+
+            window = np.arange(self._head + first, self._head + last) % self.capacity
+            values = self._values[window]
+            buckets = self._times[window] // PEAK_WINDOW_NS
+            starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+            counts = np.diff(np.append(starts, count))
+            peak = np.max(np.add.reduceat(values, starts) / counts)
+
+        return FlowDataSummary(Volume=float(volume), Mean=float(mean), Peak=float(peak))
+
+    def _rank(self, ts: int) -> int:
+        """Number of buffered readings before ``ts``, a binary search per ring segment"""
+        head = self._head % self.capacity
+        size = self._tail - self._head
+        # The readings run from ``head`` to the end of the arrays, then wrap to 0
+        first_size = min(size, self.capacity - head)
+        rank = int(np.searchsorted(self._times[head : head + first_size], ts))
+        if rank == first_size and size > first_size:
+            rank += int(np.searchsorted(self._times[: size - first_size], ts))
+        return rank
+
+
+class FlowmeterIngest:
+    """
+    Keeps the recent readings of every flowmeter in memory.
+
+    Readings arrive either by polling InfluxDB for everything newer than the
+    last poll (all meters with one grouped query), or from a local feed
+    calling `push`. Mission summaries are
+    answered from the per-meter `FlowRingBuffer`. A window ending after the
+    last ingested reading, as a mission that just completed does, waits for
+    the next poll up to ``max_wait_ms``. Windows that are no longer (or still
+    not) buffered return None so the caller can fall back to
+    `InfluxConnector.get_flow_summary`.
+
+    Parameters
+    ----------
+    influx : Optional[InfluxConnector]
+        Connector to poll. Without one, readings must be pushed.
+    meter_ids : List[str]
+        Flowmeters to buffer.
+    capacity : int
+        Readings kept per meter.
+    max_age_s : float
+        Maximum age of buffered readings.
+    poll_interval_ms : float
+        Interval between two InfluxDB polls.
+    poll_lag_ms : float
+        Readings younger than this are left for the next poll, giving writes
+        to InfluxDB time to land.
+    max_wait_ms : float
+        Longest wait of a summary for the readings of its window, 0 falls
+        back right away.
+    """
+
+    def __init__(
+        self,
+        influx: Optional[InfluxConnector] = None,
+        meter_ids: Optional[List[str]] = None,
+        capacity: int = config.FLOW_BUFFER_CAPACITY,
+        max_age_s: float = config.FLOW_BUFFER_MAX_AGE_S,
+        poll_interval_ms: float = config.FLOW_BUFFER_POLL_INTERVAL_MS,
+        poll_lag_ms: float = config.FLOW_BUFFER_POLL_LAG_MS,
+        max_wait_ms: float = config.FLOW_BUFFER_MAX_WAIT_MS,
+    ):
+        self.influx = influx
+        self.max_wait = max_wait_ms / 1000
+        self.poll_interval = poll_interval_ms / 1000
+        self.poll_lag = timedelta(milliseconds=poll_lag_ms)
+        self.buffers: Dict[str, FlowRingBuffer] = {
+            meter_id: FlowRingBuffer(capacity, int(max_age_s * 1e9))
+            for meter_id in (meter_ids or ["0"])
+        }
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start polling InfluxDB in a daemon thread"""
+        if self.influx is None or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._poll, name="flowmeter-ingest", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop polling"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def push(self, meter_id: str, timestamps_ns, values, watermark_ns: Optional[int] = None):
+        """
+        Adds readings of a local feed.
+
+        ``watermark_ns`` declares that every reading before it has been pushed,
+        it defaults to the newest pushed reading.
+        """
+        timestamps_ns = np.atleast_1d(np.asarray(timestamps_ns, dtype=np.int64))
+        values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+        if watermark_ns is None:
+            watermark_ns = int(timestamps_ns[-1]) if len(timestamps_ns) else 0
+        self.buffers[meter_id].extend(timestamps_ns, values, watermark_ns)
+
+    def summarize(
+        self,
+        start_ts: datetime,
+        end_ts: datetime,
+        meter_id: str = "0",
+        deadline: Optional[float] = None,
+    ) -> Optional[FlowDataSummary]:
+        """
+        Summary of a window from memory, None if it is not buffered.
+
+        A window whose readings are not all ingested yet waits for them up to
+        ``max_wait_ms``, and never past ``deadline`` (`time.monotonic`).
+        """
+        buffer = self.buffers.get(meter_id)
+        if buffer is None:
+            return None
+        start_ns, end_ns = to_ns(start_ts), to_ns(end_ts)
+        # Only a buffer that is being fed is worth waiting for
+        if self.max_wait > 0 and end_ns > buffer.watermark_ns > 0:
+            wait_until = time.monotonic() + self.max_wait
+            if deadline is not None:
+                wait_until = min(wait_until, deadline)
+            # Evicted windows are not coming back
+            if start_ns >= buffer.complete_from_ns:
+                buffer.wait_for(end_ns, wait_until - time.monotonic())
+        return buffer.summarize(start_ns, end_ns)
+
+    def _poll(self):
+        since = datetime.now(timezone.utc) - self.poll_lag
+        for buffer in self.buffers.values():
+            buffer.complete_from_ns = to_ns(since)
+        while not self._stop.is_set():
+            started = time.monotonic()
+            until = datetime.now(timezone.utc) - self.poll_lag
+            try:
+                readings = self.influx.get_meter_readings(
+                    [(since, until, meter_id) for meter_id in self.buffers]
+                )
+                for meter_id, buffer in self.buffers.items():
+                    if meter_id in readings:
+                        buffer.extend(*readings[meter_id], to_ns(until))
+                    else:
+                        buffer.extend(_NO_TIMES, _NO_VALUES, to_ns(until))
+                since = until
+            except Exception as e:
+                logger.error(f"Failed to poll flowmeter readings: {e}")
+            self._stop.wait(max(self.poll_interval - (time.monotonic() - started), 0))
@@ -0,0 +1,228 @@
+import itertools
+import os
+import queue
+import signal
+import struct
+import time
+from multiprocessing import Pipe
+from multiprocessing.connection import wait
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional
+
+import numpy as np
+
+from app.services.batch_predictor import BatchPredictor
+from app.services.model_loader import LoadedModel, warm_up
+from app.utils.config import config
+from app.utils.logger import logger
+
+# Request id and number of rows, answered with the request id and the number
+# of rows (-1 if the prediction failed)
+_REQUEST = struct.Struct("<QI")
+_REPLY = struct.Struct("<Qq")
+
+# Pool inherited by the processes forked by `app.serve`, see `shared_pool`
+_shared_pool: Optional["SharedMemoryInferencePool"] = None
+
+
+class SharedMemoryInferencePool:
+    """
+    Inference worker processes evaluating one model loaded before the fork.
+
+    The pool is created by a supervisor process, which then forks the
+    inference workers and the client processes (the mission consumer and the
+    HTTP workers). Every worker inherits the classifier copy-on-write, so the
+    model is parsed once for all processes.
+
+    Each (client, worker) pair owns a slot in one shared-memory block: an
+    input matrix of ``slot_rows`` feature rows and an output vector of class
+    indices. A client writes its rows into the slot and sends the worker only
+    the request id and the row count through the slot's pipe; the worker
+    predicts straight from shared memory and writes the class indices back.
+    Feature matrices and labels are never pickled. Slots are never shared
+    between client processes, so a crashed client cannot block the others.
+
+    Parameters
+    ----------
+    classifier : object
+        The validated classifier, see `load_classifier`.
+    version : str
+        Version of the model, see `model_version`.
+    path : str
+        The model file.
+    workers : int
+        Number of inference worker processes.
+    clients : int
+        Number of client processes.
+    slot_rows : int
+        Rows per request, larger matrices are sent in several requests.
+    timeout_s : float
+        Maximum time a client waits for a worker.
+    """
+
+    def __init__(
+        self,
+        classifier,
+        version: str,
+        path: str,
+        workers: int,
+        clients: int,
+        slot_rows: int = config.INFERENCE_SLOT_ROWS,
+        timeout_s: float = config.INFERENCE_TIMEOUT_S,
+    ):
+        self.classifier = classifier
+        self.version = version
+        self.path = path
+        self.workers = workers
+        self.clients = clients
+        self.slot_rows = slot_rows
+        self.timeout_s = timeout_s
+        self.feature_names: List[str] = list(classifier.feature_name_)
+        self.classes = np.asarray(classifier.classes_)
+
+        features = len(self.feature_names)
+        input_shape = (clients, workers, slot_rows, features)
+        output_shape = (clients, workers, slot_rows)
+        input_bytes = int(np.prod(input_shape)) * 8
+        self._memory = SharedMemory(
+            create=True, size=input_bytes + int(np.prod(output_shape)) * 8
+        )
+        self._inputs = np.ndarray(input_shape, dtype=np.float64, buffer=self._memory.buf)
+        self._outputs = np.ndarray(
+            output_shape, dtype=np.int64, buffer=self._memory.buf, offset=input_bytes
+        )
+        # [client][worker] -> (client end, worker end)
+        self._pipes = [[Pipe() for _ in range(workers)] for _ in range(clients)]
+
+        # Set in a client process by `bind`
+        self.client: Optional[int] = None
+        self._free: Optional[queue.Queue] = None
+        self._ids: Optional[itertools.count] = None
+
+    def close(self):
+        """Release the shared memory, from the supervisor once every process exited"""
+        self._inputs = self._outputs = None
+        self._memory.close()
+        self._memory.unlink()
+
+    # Client side
+    def bind(self, client: int):
+        """Make the current process client ``client`` of the pool"""
+        self.client = client
+        self._free = queue.Queue()
+        for worker in range(self.workers):
+            connection = self._pipes[client][worker][0]
+            # Replies to a previous process of this client, e.g. before a restart
+            while connection.poll():
+                connection.recv_bytes()
+            self._free.put(worker)
+        # Replies still being computed for the previous process must not match
+        # the ids of this one, so every process counts from a random base
+        self._ids = itertools.count(int.from_bytes(os.urandom(4), "little") << 32)
+
+    def attach(self, path: Optional[str] = None) -> LoadedModel:
+        """
+        The pool as a `LoadedModel`, a drop-in for `load_model`.
+
+        Predictions keep their micro-batching, each batch is evaluated by
+        one of the workers.
+        """
+        classifier = PooledClassifier(self)
+        return LoadedModel(
+            version=self.version,
+            path=self.path,
+            classifier=classifier,
+            predictor=BatchPredictor(classifier=classifier),
+        )
+
+    def predict_indices(self, matrix: np.ndarray) -> np.ndarray:
+        """Class indices of the rows of a matrix whose columns follow ``feature_names``"""
+        if self.client is None:
+            raise RuntimeError("The inference pool is not bound to this process")
+        indices = np.empty(len(matrix), dtype=np.int64)
+        for start in range(0, len(matrix), self.slot_rows):
+            chunk = matrix[start : start + self.slot_rows]
+            # Waits while every worker is busy with another thread of this process
+            worker = self._free.get()
+            try:
+                indices[start : start + len(chunk)] = self._request(worker, chunk)
+            finally:
+                self._free.put(worker)
+        return indices
+
+    def _request(self, worker: int, chunk: np.ndarray) -> np.ndarray:
+        connection = self._pipes[self.client][worker][0]
+        request_id = next(self._ids)
+        rows = len(chunk)
+        self._inputs[self.client, worker, :rows] = chunk
+        connection.send_bytes(_REQUEST.pack(request_id, rows))
+
+        deadline = time.monotonic() + self.timeout_s
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not connection.poll(remaining):
+                raise TimeoutError(f"Inference worker {worker} did not answer in time")
+            reply_id, status = _REPLY.unpack(connection.recv_bytes())
+            # Late answers to requests that timed out are skipped
+            if reply_id == request_id:
+                break
+        if status < 0:
+            raise RuntimeError(f"Inference worker {worker} failed to predict")
+        return self._outputs[self.client, worker, :rows].copy()
+
+    # Worker side
+    def serve(self, worker: int):
+        """Answer the requests of every client, runs in inference worker ``worker``"""
+        # Stopped by the supervisor once the API processes are drained
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        predictor = BatchPredictor(classifier=self.classifier)
+        # The model is first evaluated here, not in the supervisor before the fork
+        warm_up(predictor)
+        sorter = np.argsort(self.classes)
+        connections = {
+            self._pipes[client][worker][1]: client for client in range(self.clients)
+        }
+        logger.info("Inference worker %d ready (pid %d)", worker, os.getpid())
+        while True:
+            for connection in wait(list(connections)):
+                client = connections[connection]
+                request_id, rows = _REQUEST.unpack(connection.recv_bytes())
+                try:
+                    labels = predictor.predict_matrix(self._inputs[client, worker, :rows])
+                    self._outputs[client, worker, :rows] = sorter[
+                        np.searchsorted(self.classes, labels, sorter=sorter)
+                    ]
+                    status = rows
+                except Exception as e:
+                    logger.error(f"Prediction failed in inference worker {worker}: {e}")
+                    status = -1
+                connection.send_bytes(_REPLY.pack(request_id, status))
+
+
+class PooledClassifier:
+    """
+    Classifier facade sending predictions to a `SharedMemoryInferencePool`.
+
+    Exposes the attributes `BatchPredictor` relies on, like `NativeClassifier`.
+    """
+
+    def __init__(self, pool: SharedMemoryInferencePool):
+        self.pool = pool
+        self.feature_name_ = pool.feature_names
+        self.classes_ = pool.classes
+
+    def predict(self, matrix: np.ndarray) -> np.ndarray:
+        return self.classes_[self.pool.predict_indices(np.asarray(matrix, dtype=np.float64))]
+
+
+def share_pool(pool: SharedMemoryInferencePool, client: int):
+    """Bind the pool in a forked client process, before `app.main` is imported"""
+    global _shared_pool
+    pool.bind(client)
+    _shared_pool = pool
+
+
+def shared_pool() -> Optional[SharedMemoryInferencePool]:
+    """The pool of this process when it was started by `app.serve`, else None"""
+    return _shared_pool
@@ -0,0 +1,416 @@
+import bisect
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import BinaryIO, Callable, List, Optional, Tuple
+
+from app.utils.logger import logger
+from app.utils.metrics import Counter, Gauge, Histogram
+
+JOURNAL_RECORDS = Counter(
+    "journal_records_total",
+    "Journal records by outcome (appended, replayed, completed)",
+    ["outcome"],
+)
+JOURNAL_BACKLOG = Gauge(
+    "journal_backlog_records", "Journal records appended but not completed yet"
+)
+JOURNAL_FSYNC_SECONDS = Histogram(
+    "journal_fsync_seconds", "Duration of journal fsyncs"
+)
+
+# Payload length and CRC32 of every record
+_HEADER = struct.Struct("<II")
+_SEGMENT_PREFIX = "segment-"
+_SEGMENT_SUFFIX = ".log"
+_CHECKPOINT = "checkpoint"
+
+
+def _segment_name(first_seq: int) -> str:
+    return f"{_SEGMENT_PREFIX}{first_seq:020d}{_SEGMENT_SUFFIX}"
+
+
+def _read_record(file: BinaryIO) -> Optional[bytes]:
+    """The next record of a segment, None at its end or at a torn record"""
+    header = file.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None
+    length, crc = _HEADER.unpack(header)
+    payload = file.read(length)
+    if len(payload) < length or zlib.crc32(payload) != crc:
+        return None
+    return payload
+
+
+def _fsync_directory(path: str):
+    # Makes created, renamed and removed files survive a crash
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class WriteAheadJournal:
+    """
+    Append-only, segmented on-disk journal drained by a worker thread.
+
+    Records get consecutive sequence numbers and are appended to the active
+    segment file without waiting for the disk. A syncer thread fsyncs the
+    appended records in groups, whenever ``fsync_batch`` records are pending
+    or ``fsync_interval_ms`` has passed, and only synced records are handed
+    to the consumer by the drain thread. The consumer reports every finished
+    record with `complete`, possibly out of order; the highest sequence number
+    below which all records are complete is saved in a checkpoint file, and
+    segments holding only completed records are deleted.
+
+    On start, records after the checkpoint are replayed before new ones, so
+    records received but not finished before a crash or a shutdown are
+    processed again (at least once). Records appended within the last
+    ``fsync_interval_ms`` before a crash may be lost.
+
+    Parameters
+    ----------
+    directory : str
+        Directory holding the segments and the checkpoint, created if missing.
+    segment_bytes : int
+        Size after which a new segment is started.
+    fsync_interval_ms : float
+        Maximum time an appended record waits for its fsync.
+    fsync_batch : int
+        Number of pending records that triggers an immediate fsync.
+    checkpoint_interval_s : float
+        Minimum time between checkpoint writes.
+
+    Examples
+    --------
+    >>> journal = WriteAheadJournal("journal")
+    >>> journal.start(lambda seq, payload: journal.complete(seq))
+    >>> journal.append(b'{"mission": 1}')
+    >>> journal.close()
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 64 * 1024 * 1024,
+        fsync_interval_ms: float = 50,
+        fsync_batch: int = 256,
+        checkpoint_interval_s: float = 1.0,
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval_ms / 1000
+        self.fsync_batch = fsync_batch
+        self.checkpoint_interval = checkpoint_interval_s
+
+        self._condition = threading.Condition()
+        self._consumer: Optional[Callable[[int, bytes], None]] = None
+        self._running = False
+        self._draining = False
+        self._syncer: Optional[threading.Thread] = None
+        self._drainer: Optional[threading.Thread] = None
+
+        # First sequence numbers of the segments on disk, in order
+        self._segments: List[int] = []
+        self._writer: Optional[BinaryIO] = None
+        self._written_bytes = 0
+        self._next_seq = 1
+        self._unsynced = 0
+        self._durable = 0
+
+        self._reader: Optional[BinaryIO] = None
+        self._reader_segment: Optional[int] = None
+        self._read_seq = 1
+
+        # Everything up to the watermark is complete, `_completed` holds the rest
+        self._watermark = 0
+        self._completed = set()
+        self._saved_watermark = 0
+        self._next_checkpoint = 0.0
+
+        self._recover()
+        JOURNAL_BACKLOG.set_function(lambda: self.backlog)
+
+    @property
+    def backlog(self) -> int:
+        """Number of appended records not completed yet"""
+        return self._next_seq - 1 - self._watermark - len(self._completed)
+
+    def start(self, consumer: Callable[[int, bytes], None]):
+        """
+        Start the syncer and the drain thread.
+
+        Parameters
+        ----------
+        consumer : Callable[[int, bytes], None]
+            Called from the drain thread with the sequence number and payload
+            of every synced record, in order. It must eventually call
+            `complete` for the sequence number.
+        """
+        if self._running:
+            return
+        self._consumer = consumer
+        self._running = True
+        self._draining = True
+        self._syncer = threading.Thread(
+            target=self._sync_loop, name="journal-sync", daemon=True
+        )
+        self._syncer.start()
+        self._drainer = threading.Thread(
+            target=self._drain_loop, name="journal-drain", daemon=True
+        )
+        self._drainer.start()
+
+    def stop(self):
+        """Stop handing records to the consumer, appends are still accepted"""
+        with self._condition:
+            self._draining = False
+            self._condition.notify_all()
+        if self._drainer is not None:
+            self._drainer.join()
+            self._drainer = None
+
+    def close(self):
+        """Stop draining, sync the appended records and save the checkpoint"""
+        self.stop()
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._syncer is not None:
+            self._syncer.join()
+            self._syncer = None
+        else:
+            self._sync()
+            self._save_checkpoint()
+        with self._condition:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    def append(self, payload: bytes) -> int:
+        """
+        Append a record without waiting for the disk.
+
+        Returns
+        -------
+        int
+            Sequence number of the record.
+
+        Raises
+        ------
+        RuntimeError
+            If the journal is closed.
+        """
+        with self._condition:
+            if self._writer is None:
+                raise RuntimeError(f"The journal {self.directory} is closed")
+            if self._written_bytes >= self.segment_bytes:
+                self._roll_segment()
+            self._writer.write(_HEADER.pack(len(payload), zlib.crc32(payload)))
+            self._writer.write(payload)
+            self._written_bytes += _HEADER.size + len(payload)
+            seq = self._next_seq
+            self._next_seq += 1
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_batch:
+                self._condition.notify_all()
+        JOURNAL_RECORDS.labels("appended").inc()
+        return seq
+
+    def complete(self, seq: int):
+        """Mark a record as finished, it is not replayed after the next checkpoint"""
+        with self._condition:
+            if seq <= self._watermark:
+                return
+            self._completed.add(seq)
+            while self._watermark + 1 in self._completed:
+                self._watermark += 1
+                self._completed.remove(self._watermark)
+        JOURNAL_RECORDS.labels("completed").inc()
+
+    # Recovery
+    def _recover(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._segments = sorted(
+            int(name[len(_SEGMENT_PREFIX) : -len(_SEGMENT_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX)
+        )
+
+        checkpoint_path = os.path.join(self.directory, _CHECKPOINT)
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path, "r", encoding="utf-8") as file:
+                self._watermark = int(file.read().strip())
+        elif self._segments:
+            self._watermark = self._segments[0] - 1
+
+        next_seq = self._watermark + 1
+        if self._segments:
+            # Earlier segments were synced when they were rolled, only the last
+            # one may end with a torn record
+            last = self._segments[-1]
+            count = 0
+            with open(self._segment_path(last), "rb") as file:
+                while _read_record(file) is not None:
+                    count += 1
+            next_seq = max(next_seq, last + count)
+
+        self._next_seq = next_seq
+        self._durable = next_seq - 1
+        self._read_seq = self._watermark + 1
+        self._saved_watermark = self._watermark
+        # Never append behind a possibly torn record
+        self._open_segment()
+
+        if self._durable > self._watermark:
+            JOURNAL_RECORDS.labels("replayed").inc(self._durable - self._watermark)
+            logger.info(
+                f"Replaying {self._durable - self._watermark} unfinished records "
+                f"from {self.directory}"
+            )
+
+    # Writing
+    def _segment_path(self, first_seq: int) -> str:
+        return os.path.join(self.directory, _segment_name(first_seq))
+
+    def _open_segment(self):
+        # Only an existing segment without a single valid record has this name
+        self._writer = open(self._segment_path(self._next_seq), "wb")
+        self._written_bytes = 0
+        if not self._segments or self._segments[-1] != self._next_seq:
+            self._segments.append(self._next_seq)
+        _fsync_directory(self.directory)
+
+    def _roll_segment(self):
+        """Sync and close the active segment and start the next one, lock held"""
+        self._writer.flush()
+        with JOURNAL_FSYNC_SECONDS.time():
+            os.fsync(self._writer.fileno())
+        self._writer.close()
+        self._durable = self._next_seq - 1
+        self._unsynced = 0
+        self._open_segment()
+        self._condition.notify_all()
+
+    def _sync(self):
+        """Flush and fsync the appended records, then release them to the drain thread"""
+        with self._condition:
+            if not self._unsynced or self._writer is None:
+                return
+            self._writer.flush()
+            # The fsync runs without the lock, appends continue meanwhile
+            fd = os.dup(self._writer.fileno())
+            target = self._next_seq - 1
+            self._unsynced = 0
+        try:
+            with JOURNAL_FSYNC_SECONDS.time():
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        with self._condition:
+            if target > self._durable:
+                self._durable = target
+                self._condition.notify_all()
+
+    def _sync_loop(self):
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.fsync_interval
+                while (
+                    self._running
+                    and self._unsynced < self.fsync_batch
+                    and (remaining := deadline - time.monotonic()) > 0
+                ):
+                    self._condition.wait(remaining)
+                running = self._running
+            try:
+                self._sync()
+                if not running or time.monotonic() >= self._next_checkpoint:
+                    self._save_checkpoint()
+            except Exception as e:
+                logger.error(f"Failed to sync the journal: {e}")
+            if not running:
+                return
+
+    def _save_checkpoint(self):
+        """Atomically record the watermark and delete the completed segments"""
+        with self._condition:
+            watermark = self._watermark
+        self._next_checkpoint = time.monotonic() + self.checkpoint_interval
+        if watermark == self._saved_watermark:
+            return
+        path = os.path.join(self.directory, _CHECKPOINT)
+        with open(path + ".tmp", "w", encoding="utf-8") as file:
+            file.write(str(watermark))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path + ".tmp", path)
+        self._saved_watermark = watermark
+
+        with self._condition:
+            # A segment is done once the next one starts after the watermark
+            obsolete = []
+            while len(self._segments) > 1 and self._segments[1] <= watermark + 1:
+                obsolete.append(self._segments.pop(0))
+        for first_seq in obsolete:
+            os.remove(self._segment_path(first_seq))
+        _fsync_directory(self.directory)
+
+    # Draining
+    def _drain_loop(self):
+        while True:
+            record = self._read_next()
+            if record is None:
+                return
+            seq, payload = record
+            try:
+                self._consumer(seq, payload)
+            except Exception as e:
+                logger.error(f"Failed to hand over journal record {seq}: {e}")
+                self.complete(seq)
+
+    def _read_next(self) -> Optional[Tuple[int, bytes]]:
+        """The next synced record, None once draining stops"""
+        while True:
+            with self._condition:
+                while self._draining and self._read_seq > self._durable:
+                    self._condition.wait()
+                if not self._draining:
+                    return None
+                seq = self._read_seq
+                index = bisect.bisect_right(self._segments, seq) - 1
+                first_seq = self._segments[index]
+                next_segment = (
+                    self._segments[index + 1] if index + 1 < len(self._segments) else None
+                )
+            if first_seq != self._reader_segment:
+                self._open_reader(first_seq, seq)
+            payload = _read_record(self._reader)
+            if payload is not None:
+                self._read_seq = seq + 1
+                return seq, payload
+            # Only reached for a torn record left behind by a crash
+            skip_to = next_segment if next_segment is not None else self._durable + 1
+            logger.error(
+                f"Skipping unreadable journal records {seq} to {skip_to - 1} "
+                f"in {_segment_name(first_seq)}"
+            )
+            for skipped in range(seq, skip_to):
+                self.complete(skipped)
+            self._read_seq = skip_to
+
+    def _open_reader(self, first_seq: int, seq: int):
+        if self._reader is not None:
+            self._reader.close()
+        self._reader = open(self._segment_path(first_seq), "rb")
+        self._reader_segment = first_seq
+        # Only when resuming inside a segment after a restart
+        for _ in range(seq - first_seq):
+            if _read_record(self._reader) is None:
+                break
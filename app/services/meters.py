@@ -0,0 +1,60 @@
+from typing import Dict, List, Optional
+
+
+class ValveMeters:
+    """
+    Maps every valve to the flowmeter measuring its flow.
+
+    Parameters
+    ----------
+    meters : Optional[Dict[int, str]]
+        Flowmeter id per valve id.
+    default_meter : str
+        Flowmeter of the valves missing in ``meters``.
+
+    Examples
+    --------
+    >>> meters = ValveMeters({1: "0", 2: "1"})
+    >>> meters.meter_for(2)
+    '1'
+    >>> meters.meter_for(7)
+    '0'
+    """
+
+    def __init__(self, meters: Optional[Dict[int, str]] = None, default_meter: str = "0"):
+        self.meters = dict(meters or {})
+        self.default_meter = default_meter
+
+    @property
+    def meter_ids(self) -> List[str]:
+        """Every flowmeter in use, the default one first"""
+        meter_ids = [self.default_meter]
+        for meter_id in self.meters.values():
+            if meter_id not in meter_ids:
+                meter_ids.append(meter_id)
+        return meter_ids
+
+    def meter_for(self, valve_id: int) -> str:
+        """The flowmeter of a valve"""
+        return self.meters.get(valve_id, self.default_meter)
+
+
+def valve_meters_from_config(spec: str, default_meter: str = "0") -> ValveMeters:
+    """
+    Parse a ``valve:meter`` list such as ``"1:0,2:0,3:1"``.
+
+    Raises
+    ------
+    ValueError
+        If an entry is not a valve id and a meter id separated by a colon.
+    """
+    meters = {}
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        valve_id, separator, meter_id = entry.partition(":")
+        if not separator or not meter_id.strip():
+            raise ValueError(f"Invalid valve to meter mapping {entry!r}, expected valve:meter")
+        meters[int(valve_id)] = meter_id.strip()
+    return ValveMeters(meters, default_meter)
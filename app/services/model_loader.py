@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from app.models.flow_data import FlowClassifierFeatures
+from app.models.missions import EndUseType
+from app.services.batch_predictor import BatchPredictor
+from app.services.tree_predictor import TreePredictor
+from app.utils.config import config
+from app.utils.logger import logger
+
+
+class NativeClassifier:
+    """
+    Minimal classifier around a native ``lightgbm.Booster``.
+
+    The native model format does not store the class labels, they are read
+    from the ``<model>.classes.json`` file written by ``app.export_model``.
+    Exposes the attributes `BatchPredictor` and `TreePredictor` rely on.
+    """
+
+    def __init__(self, booster, classes: List):
+        self.booster_ = booster
+        self.classes_ = np.asarray(classes)
+        self.feature_name_ = booster.feature_name()
+
+
+@dataclass
+class LoadedModel:
+    """
+    A validated, warmed-up classifier ready to serve predictions.
+
+    Attributes
+    ----------
+    version : str
+        Identifies the model file, ``<file stem>-<content hash prefix>``.
+    path : str
+        The model file.
+    classifier : object
+        The classifier, see `load_classifier`.
+    predictor : BatchPredictor
+        Micro-batching front end of the classifier.
+    loaded_at : float
+        Unix time the model was loaded.
+    """
+
+    version: str
+    path: str
+    classifier: object
+    predictor: BatchPredictor
+    loaded_at: float = field(default_factory=time.time)
+
+
+def classes_path(model_path: str) -> str:
+    """Path of the class label file accompanying a native model"""
+    return f"{model_path}.classes.json"
+
+
+def load_classifier(
+    path: str,
+    backend: str = config.INFERENCE_BACKEND,
+    early_exit: bool = config.TREE_EARLY_EXIT,
+):
+    """
+    Loads a classifier from disk.
+
+    Supported formats, chosen by file extension:
+
+    * ``.pkl``: a pickled ``LGBMClassifier``.
+    * ``.txt``: a native LightGBM model, parsed by LightGBM's C++ loader
+      instead of being unpickled.
+    * ``.json``: a ``Booster.dump_model()`` with its class labels, compiled into
+      a `TreePredictor` without importing lightgbm at all.
+
+    Parameters
+    ----------
+    path : str
+        The model file.
+    backend : str
+        ``"tree"`` compiles ``.pkl`` and ``.txt`` models into a `TreePredictor`.
+    early_exit : bool
+        Early exit mode of the `TreePredictor`.
+    """
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as file:
+            exported = json.load(file)
+        return TreePredictor(
+            exported["model"], exported["classes"], early_exit=early_exit
+        )
+
+    if path.endswith(".txt"):
+        # Imported lazily, lightgbm pulls in scikit-learn and scipy
+        import lightgbm
+
+        with open(classes_path(path), "r", encoding="utf-8") as file:
+            classes = json.load(file)
+        classifier = NativeClassifier(lightgbm.Booster(model_file=path), classes)
+    else:
+        with open(path, "rb") as file:
+            classifier = pickle.load(file)
+
+    if backend == "tree":
+        return TreePredictor.from_classifier(classifier, early_exit=early_exit)
+    return classifier
+
+
+def model_version(path: str) -> str:
+    """Version of a model file, changes whenever its content changes"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}-{digest.hexdigest()[:12]}"
+
+
+def validate_classifier(classifier):
+    """
+    Checks that a classifier fits the service.
+
+    Raises
+    ------
+    ValueError
+        If its features differ from `FlowClassifierFeatures` or it predicts
+        labels that are not an `EndUseType`.
+    """
+    expected = set(FlowClassifierFeatures.model_fields)
+    features = set(classifier.feature_name_)
+    if features != expected:
+        raise ValueError(
+            f"Model features {sorted(features)} do not match {sorted(expected)}"
+        )
+    known = {end_use.value for end_use in EndUseType}
+    unknown = [label for label in classifier.classes_ if label not in known]
+    if unknown:
+        raise ValueError(f"Model predicts unknown end uses {unknown}")
+
+
+def load_model(path: str) -> LoadedModel:
+    """Loads, validates and warms up a model file"""
+    version = model_version(path)
+    classifier = load_classifier(path)
+    validate_classifier(classifier)
+    predictor = BatchPredictor(classifier=classifier)
+    warm_up(predictor)
+    return LoadedModel(
+        version=version, path=path, classifier=classifier, predictor=predictor
+    )
+
+
+def warm_up(predictor: BatchPredictor, rounds: int = config.MODEL_WARMUP_ROUNDS):
+    """Runs single-row and full-batch predictions so first requests hit warm code paths"""
+    rng = np.random.default_rng(0)
+    for _ in range(rounds):
+        batch = rng.uniform(0, 100, (predictor.max_batch_size, len(predictor.feature_names)))
+        predictor.predict_matrix(batch[:1])
+        predictor.predict_matrix(batch)
+
+
+class ModelLoader:
+    """
+    Loads and warms up the classifier in a background thread.
+
+    Parameters
+    ----------
+    path : str
+        The model file, see `load_classifier`.
+    on_ready : Callable[[LoadedModel], None]
+        Called with the loaded model before the loader reports readiness.
+    load : Callable[[str], LoadedModel]
+        Loads the model file, e.g. `SharedMemoryInferencePool.attach` to use
+        a model loaded by the supervisor process.
+
+    Attributes
+    ----------
+    ready : threading.Event
+        Set once the model is loaded, warmed up and handed to ``on_ready``.
+    error : Optional[Exception]
+        The exception that stopped the loading, if any.
+    load_seconds : Optional[float]
+        Duration of loading and warmup.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        on_ready: Callable[[LoadedModel], None],
+        load: Callable[[str], LoadedModel] = load_model,
+    ):
+        self.path = path
+        self.on_ready = on_ready
+        self.load = load
+        self.ready = threading.Event()
+        self.error: Optional[Exception] = None
+        self.load_seconds: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start loading in a daemon thread"""
+        self._thread = threading.Thread(
+            target=self._load, name="model-loader", daemon=True
+        )
+        self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the model is ready"""
+        return self.ready.wait(timeout)
+
+    def _load(self):
+        started = time.perf_counter()
+        try:
+            self.on_ready(self.load(self.path))
+        except Exception as e:
+            self.error = e
+            logger.error(f"Failed to load model {self.path}: {e}")
+            return
+        self.load_seconds = time.perf_counter() - started
+        self.ready.set()
+        logger.info("Model %s ready after %.2f s", self.path, self.load_seconds)
@@ -0,0 +1,170 @@
+import os
+import threading
+from typing import Callable, Optional, Tuple
+
+from app.services.model_loader import LoadedModel, classes_path, load_model, model_version
+from app.utils.config import config
+from app.utils.logger import logger
+
+MODEL_EXTENSIONS = (".pkl", ".txt", ".json")
+# Label file of a ``.txt`` model, written by app.export_model after the model
+CLASSES_SUFFIX = ".classes.json"
+
+
+class ModelRegistry:
+    """
+    Keeps track of the active model and replaces it at runtime.
+
+    New models are loaded, validated and warmed up by the calling thread (the
+    directory watcher or an admin request), so predictions keep running on
+    the active model meanwhile. ``on_swap`` then installs the new model with a
+    single reference assignment.
+
+    Parameters
+    ----------
+    on_swap : Callable[[LoadedModel], None]
+        Installs a model, see `WebSocketService.set_model`.
+    directory : Optional[str]
+        Directory watched for model files. The most recently modified
+        ``.pkl``, ``.txt`` or ``.json`` file is activated whenever it changes;
+        write new models to a temporary name and rename them into place. A
+        ``.txt`` model counts once its ``.classes.json`` file exists, as
+        modified when the later of the two was.
+    poll_interval_s : float
+        Interval between two directory scans.
+
+    Attributes
+    ----------
+    current : Optional[LoadedModel]
+        The active model.
+    """
+
+    def __init__(
+        self,
+        on_swap: Callable[[LoadedModel], None],
+        directory: Optional[str] = config.MODEL_DIR,
+        poll_interval_s: float = config.MODEL_POLL_INTERVAL_S,
+    ):
+        self.on_swap = on_swap
+        self.directory = directory
+        self.poll_interval_s = poll_interval_s
+        self.current: Optional[LoadedModel] = None
+
+        # Serializes swaps so the active model is always the last one installed
+        self._lock = threading.Lock()
+        self._seen: Optional[Tuple[str, int]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def install(self, model: LoadedModel):
+        """Make an already loaded model the active one"""
+        with self._lock:
+            self._swap(model)
+
+    def activate(self, path: Optional[str] = None) -> LoadedModel:
+        """
+        Loads a model file and makes it the active model.
+
+        Parameters
+        ----------
+        path : Optional[str]
+            The model file, defaults to the newest file of the watched directory.
+
+        Raises
+        ------
+        FileNotFoundError
+            If there is no model file.
+        ValueError
+            If the model does not pass `validate_classifier`.
+        """
+        with self._lock:
+            if path is None:
+                latest = self.latest()
+                if latest is None:
+                    raise FileNotFoundError(f"No model file in {self.directory}")
+                path = latest[0]
+            model = load_model(path)
+            self._swap(model)
+            return model
+
+    def contains(self, path: str) -> bool:
+        """Whether ``path`` is a file of the watched directory, symlinks resolved"""
+        if not self.directory:
+            return False
+        directory = os.path.realpath(self.directory)
+        path = os.path.realpath(os.path.join(directory, path))
+        return os.path.dirname(path) == directory
+
+    def latest(self) -> Optional[Tuple[str, int]]:
+        """Path and modification time of the newest model file of the directory"""
+        if not self.directory:
+            return None
+        mtimes = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(MODEL_EXTENSIONS):
+                    mtimes[entry.path] = entry.stat().st_mtime_ns
+        candidates = []
+        for path, mtime_ns in mtimes.items():
+            if path.endswith(CLASSES_SUFFIX):
+                continue
+            if path.endswith(".txt"):
+                # Not loadable before its labels are written
+                classes_mtime_ns = mtimes.get(classes_path(path))
+                if classes_mtime_ns is None:
+                    continue
+                mtime_ns = max(mtime_ns, classes_mtime_ns)
+            candidates.append((mtime_ns, path))
+        if not candidates:
+            return None
+        mtime_ns, path = max(candidates)
+        return path, mtime_ns
+
+    def start(self):
+        """Start watching the model directory in a daemon thread"""
+        if not self.directory or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._watch, name="model-registry", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching the model directory"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _swap(self, model: LoadedModel):
+        previous = self.current
+        self.on_swap(model)
+        self.current = model
+        logger.info(
+            "Activated model %s (previous: %s)",
+            model.version,
+            previous.version if previous is not None else None,
+        )
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval_s):
+            try:
+                latest = self.latest()
+            except OSError as e:
+                logger.error(f"Failed to scan model directory {self.directory}: {e}")
+                continue
+            if latest is None or latest == self._seen:
+                continue
+            # Remembered before loading, a broken file is retried once it changes
+            self._seen = latest
+            try:
+                if (
+                    self.current is not None
+                    and model_version(latest[0]) == self.current.version
+                ):
+                    # Touched or copied again without changing the content
+                    continue
+                self.activate(latest[0])
+            except Exception as e:
+                logger.error(f"Failed to activate model {latest[0]}: {e}")
@@ -0,0 +1,317 @@
+import queue
+import threading
+import time
+from enum import Enum
+from typing import Any, Callable, Hashable, List, Optional
+
+from app.utils.logger import logger
+from app.utils.metrics import Counter, Gauge, Histogram
+
+STAGE_SECONDS = Histogram(
+    "pipeline_stage_seconds",
+    "Time a pipeline stage spends in its handler per call",
+    ["stage"],
+)
+STAGE_ITEMS = Counter(
+    "pipeline_stage_items_total",
+    "Items handled by a pipeline stage by outcome (processed, failed, dropped)",
+    ["stage", "outcome"],
+)
+STAGE_QUEUE_DEPTH = Gauge(
+    "pipeline_stage_queue_depth", "Items waiting in a stage's input queue", ["stage"]
+)
+
+
+class OverflowPolicy(str, Enum):
+    """Behaviour of a stage when its input queue is full"""
+
+    BLOCK = "block"
+    DROP_NEWEST = "drop_newest"
+    DROP_OLDEST = "drop_oldest"
+
+
+_STOP = object()
+
+
+class Stage:
+    """
+    A processing stage with its own worker pool and bounded input queue.
+
+    Items put into the stage are handled by ``workers`` threads. Whatever the
+    handler returns (unless ``None``) is forwarded to the downstream stage, so
+    several stages chained together form a pipeline in which slow network I/O
+    of one mission overlaps with the processing of others.
+
+    Parameters
+    ----------
+    name : str
+        Name of the stage, used for thread names and log messages.
+    handler : Callable[[Any], Any]
+        Function applied to every item. Exceptions are logged and the item is
+        dropped.
+    workers : int
+        Number of worker threads.
+    queue_size : int
+        Capacity of the input queue.
+    overflow : OverflowPolicy
+        What ``put`` does when the queue is full: wait for free space, drop
+        the new item or evict the oldest queued item.
+    downstream : Optional[Stage]
+        Stage receiving the handler results.
+    batch_size : int
+        With a value above one, a worker takes every item already waiting (up
+        to ``batch_size``) and passes them to the handler as one list. The
+        handler then returns one result per item.
+    on_done : Optional[Callable[[Any], None]]
+        Called with every item that leaves the pipeline in this stage: handled
+        by the last stage, filtered out (``None`` result), failed or dropped.
+    key : Optional[Callable[[Any], Hashable]]
+        Splits the input queue into one lane per worker. Items with the same
+        key always go to the same lane, so they are handled one after the
+        other in the order they were put, while other keys proceed in
+        parallel. Each lane holds ``queue_size // workers`` items.
+
+    Attributes
+    ----------
+    dropped : int
+        Number of items discarded because of the overflow policy.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], Any],
+        workers: int = 1,
+        queue_size: int = 100,
+        overflow: OverflowPolicy = OverflowPolicy.BLOCK,
+        downstream: Optional["Stage"] = None,
+        batch_size: int = 1,
+        on_done: Optional[Callable[[Any], None]] = None,
+        key: Optional[Callable[[Any], Hashable]] = None,
+    ):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.overflow = OverflowPolicy(overflow)
+        self.downstream = downstream
+        self.batch_size = batch_size
+        self.on_done = on_done
+        self.key = key
+        self.dropped = 0
+
+        if key is None:
+            self._queues = [queue.Queue(maxsize=queue_size)]
+        else:
+            self._queues = [
+                queue.Queue(maxsize=max(queue_size // workers, 1)) for _ in range(workers)
+            ]
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        # Set by `stop`, items put from then on would queue behind a stop marker
+        self._stopping = False
+
+        self._seconds = STAGE_SECONDS.labels(name)
+        self._processed = STAGE_ITEMS.labels(name, "processed")
+        self._failed = STAGE_ITEMS.labels(name, "failed")
+        self._dropped = STAGE_ITEMS.labels(name, "dropped")
+        # Read at scrape time only
+        STAGE_QUEUE_DEPTH.labels(name).set_function(lambda: self.depth)
+
+    @property
+    def depth(self) -> int:
+        """Number of items waiting in the input queue"""
+        return sum(lane.qsize() for lane in self._queues)
+
+    def start(self):
+        """Start the worker threads"""
+        self._stopping = False
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._work,
+                args=(self._queues[index % len(self._queues)],),
+                name=f"{self.name}-{index}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Let the workers finish the queued items and stop them, later items are dropped"""
+        self._stopping = True
+        for index in range(len(self._threads)):
+            self._queues[index % len(self._queues)].put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        # Items of a put that raced with the stop markers
+        for lane in self._queues:
+            while True:
+                try:
+                    item = lane.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    self._count_drop(item, "stopped")
+
+    def put(self, item) -> bool:
+        """
+        Queue an item according to the overflow policy.
+
+        Returns
+        -------
+        bool
+            False if an item (the new one or the oldest queued one) was dropped.
+            Items put while the stage stops are always dropped.
+        """
+        if self._stopping:
+            self._count_drop(item, "stopping")
+            return False
+        lane = self._lane(item)
+        if self.overflow is OverflowPolicy.BLOCK:
+            lane.put(item)
+            return True
+
+        if self.overflow is OverflowPolicy.DROP_NEWEST:
+            try:
+                lane.put_nowait(item)
+                return True
+            except queue.Full:
+                self._count_drop(item)
+                return False
+
+        # DROP_OLDEST: make room by evicting from the head of the queue
+        accepted = True
+        while True:
+            try:
+                lane.put_nowait(item)
+                return accepted
+            except queue.Full:
+                try:
+                    evicted = lane.get_nowait()
+                except queue.Empty:
+                    continue
+                if evicted is _STOP:
+                    # A worker waits for its stop marker, it goes back behind
+                    # the queued items and the new item is dropped instead
+                    lane.put(_STOP)
+                    self._count_drop(item)
+                    return False
+                accepted = False
+                self._count_drop(evicted)
+
+    def _lane(self, item) -> queue.Queue:
+        if self.key is None:
+            return self._queues[0]
+        return self._queues[hash(self.key(item)) % len(self._queues)]
+
+    def _count_drop(self, item, reason: str = "queue full"):
+        with self._lock:
+            self.dropped += 1
+        self._dropped.inc()
+        logger.warning(f"{self.name} stage {reason}, dropped a mission")
+        self._done(item)
+
+    def _work(self, lane: queue.Queue):
+        while True:
+            item = lane.get()
+            if item is _STOP:
+                return
+            if self.batch_size > 1:
+                stop = self._work_batch(item, lane)
+                if stop:
+                    return
+                continue
+            started = time.perf_counter()
+            try:
+                result = self.handler(item)
+            except Exception as e:
+                self._failed.inc()
+                logger.error(f"Error in {self.name} stage: {e}")
+                self._done(item)
+                continue
+            finally:
+                self._seconds.observe(time.perf_counter() - started)
+            self._processed.inc()
+            self._forward(item, result)
+
+    def _work_batch(self, item, lane: queue.Queue) -> bool:
+        """Handle ``item`` together with the items already waiting, True on a stop marker"""
+        batch = [item]
+        stop = False
+        while len(batch) < self.batch_size:
+            try:
+                item = lane.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stop = True
+                break
+            batch.append(item)
+        started = time.perf_counter()
+        try:
+            results = self.handler(batch)
+        except Exception as e:
+            self._failed.inc(len(batch))
+            logger.error(f"Error in {self.name} stage: {e}")
+            for item in batch:
+                self._done(item)
+            return stop
+        finally:
+            self._seconds.observe(time.perf_counter() - started)
+        self._processed.inc(len(batch))
+        for item, result in zip(batch, results):
+            self._forward(item, result)
+        return stop
+
+    def _forward(self, item, result):
+        if result is not None and self.downstream is not None:
+            self.downstream.put(result)
+        else:
+            self._done(item)
+
+    def _done(self, item):
+        if self.on_done is None:
+            return
+        try:
+            self.on_done(item)
+        except Exception as e:
+            logger.error(f"Error completing an item of the {self.name} stage: {e}")
+
+
+class Pipeline:
+    """
+    A chain of stages, each feeding the next one.
+
+    Parameters
+    ----------
+    stages : List[Stage]
+        Stages in processing order. Their ``downstream`` attributes are
+        connected by the pipeline.
+    on_done : Optional[Callable[[Any], None]]
+        Set as the ``on_done`` callback of every stage, so it sees each item
+        once when it leaves the pipeline, whatever the outcome.
+    """
+
+    def __init__(
+        self, stages: List[Stage], on_done: Optional[Callable[[Any], None]] = None
+    ):
+        self.stages = stages
+        for stage, next_stage in zip(stages, stages[1:]):
+            stage.downstream = next_stage
+        if on_done is not None:
+            for stage in stages:
+                stage.on_done = on_done
+
+    def start(self):
+        """Start all stages, the last one first"""
+        for stage in reversed(self.stages):
+            stage.start()
+
+    def stop(self):
+        """Drain and stop all stages in processing order"""
+        for stage in self.stages:
+            stage.stop()
+
+    def put(self, item) -> bool:
+        """Feed an item into the first stage"""
+        return self.stages[0].put(item)
@@ -0,0 +1,232 @@
+import queue
+import threading
+import time
+from collections import deque
+from typing import Deque, List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.utils.config import config
+from app.utils.logger import logger
+from app.utils.metrics import Counter, Gauge, Histogram
+
+BACKEND_POST_SECONDS = Histogram(
+    "backend_post_seconds", "Duration of successful POST requests to the backend"
+)
+BACKEND_MISSIONS = Counter(
+    "backend_missions_total",
+    "Classified missions handed to the backend by outcome (sent, failed)",
+    ["outcome"],
+)
+BACKEND_QUEUE_DEPTH = Gauge(
+    "backend_queue_depth", "Classified missions waiting to be sent to the backend"
+)
+
+_STOP = object()
+
+
+class BackendPublisher:
+    """
+    Asynchronous publisher of classified missions to the backend.
+
+    Missions are queued by ``publish`` as already serialized JSON and sent by
+    dispatcher threads through a shared ``requests.Session`` whose connection
+    pool keeps the TCP connections to the backend alive. Failed sends are
+    retried with exponential backoff. With ``batch_size`` greater than one,
+    missions queued close together are grouped into a single JSON array
+    POSTed to the backend's batch endpoint.
+
+    Parameters
+    ----------
+    base_url : str
+        Base URL of the backend, e.g. ``http://localhost:5000``.
+    workers : int
+        Number of dispatcher threads.
+    pool_size : int
+        Maximum number of kept-alive connections.
+    queue_size : int
+        Capacity of the send queue. Missions published to a full queue are
+        dropped.
+    max_retries : int
+        Number of retries after a failed send.
+    retry_backoff : float
+        Delay in seconds before the first retry, doubled on every further one.
+    timeout : float
+        Timeout in seconds of a single request.
+    batch_size : int
+        Maximum number of missions per request. ``1`` disables batching.
+    batch_wait_ms : float
+        Maximum time a mission waits for companions in batch mode.
+
+    Attributes
+    ----------
+    sent : int
+        Number of successfully delivered missions.
+    failed : int
+        Number of missions given up after all retries or dropped.
+    latencies : Deque[float]
+        Durations in seconds of the most recent successful requests.
+    """
+
+    LAST_PATH = "/v1/missions/flow/last"
+    BATCH_PATH = "/v1/missions/flow/batch"
+
+    def __init__(
+        self,
+        base_url: str = f"http://{config.BACKEND_BASE}",
+        workers: int = config.BACKEND_WORKERS,
+        pool_size: int = config.BACKEND_POOL_SIZE,
+        queue_size: int = config.BACKEND_QUEUE_SIZE,
+        max_retries: int = config.BACKEND_MAX_RETRIES,
+        retry_backoff: float = config.BACKEND_RETRY_BACKOFF_S,
+        timeout: float = config.BACKEND_TIMEOUT_S,
+        batch_size: int = config.BACKEND_BATCH_SIZE,
+        batch_wait_ms: float = config.BACKEND_BATCH_WAIT_MS,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait_ms / 1000
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(
+            {"Content-Type": "application/json", "accept": "application/json"}
+        )
+
+        self.sent = 0
+        self.failed = 0
+        self.latencies: Deque[float] = deque(maxlen=1024)
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        BACKEND_QUEUE_DEPTH.set_function(self._queue.qsize)
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of missions waiting to be sent"""
+        return self._queue.qsize()
+
+    def start(self):
+        """Start the dispatcher threads"""
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._dispatch, name=f"publisher-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Send the queued missions, stop the dispatchers and close the pool"""
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.session.close()
+
+    def publish(self, payload: bytes) -> bool:
+        """
+        Queue a classified mission for delivery without waiting for the backend.
+
+        Parameters
+        ----------
+        payload : bytes
+            The JSON of a `ClassifiedFlowControlMission`, sent as is.
+
+        Returns
+        -------
+        bool
+            False if the send queue is full and the mission was dropped.
+        """
+        try:
+            self._queue.put_nowait(payload)
+            return True
+        except queue.Full:
+            self._count(failed=1)
+            logger.warning("Backend send queue full, dropped classified mission")
+            return False
+
+    def _dispatch(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stop = self.batch_size > 1 and self._fill_batch(batch)
+            self._send(batch)
+            if stop:
+                return
+
+    def _fill_batch(self, batch: List) -> bool:
+        """Collect queued missions into ``batch``, returns True on a stop marker"""
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=max(remaining, 0))
+            except queue.Empty:
+                return False
+            if item is _STOP:
+                return True
+            batch.append(item)
+        return False
+
+    def _send(self, batch: List[bytes]):
+        if self.batch_size > 1:
+            url = self.base_url + self.BATCH_PATH
+            body = b"[" + b",".join(batch) + b"]"
+        else:
+            url = self.base_url + self.LAST_PATH
+            body = batch[0]
+
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                response = self.session.post(url, data=body, timeout=self.timeout)
+                if response.status_code < 500:
+                    response.raise_for_status()
+                    latency = time.perf_counter() - start
+                    self.latencies.append(latency)
+                    BACKEND_POST_SECONDS.observe(latency)
+                    self._count(sent=len(batch))
+                    logger.debug(
+                        "Posted %d mission(s) to backend in %.1f ms",
+                        len(batch),
+                        latency * 1000,
+                    )
+                    return
+                error: Exception = requests.HTTPError(
+                    f"{response.status_code} Server Error", response=response
+                )
+            except requests.HTTPError as e:
+                # Client errors will not succeed on a retry
+                logger.error(f"Backend rejected mission: {e}")
+                self._count(failed=len(batch))
+                return
+            except requests.RequestException as e:
+                error = e
+
+            if attempt < self.max_retries:
+                delay = self.retry_backoff * 2**attempt
+                logger.warning(f"Backend POST failed ({error}), retrying in {delay}s")
+                time.sleep(delay)
+
+        logger.error(f"Failed to post mission to backend: {error}")
+        self._count(failed=len(batch))
+
+    def _count(self, sent: int = 0, failed: int = 0):
+        with self._lock:
+            self.sent += sent
+            self.failed += failed
+        if sent:
+            BACKEND_MISSIONS.labels("sent").inc(sent)
+        if failed:
+            BACKEND_MISSIONS.labels("failed").inc(failed)
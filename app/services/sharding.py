@@ -0,0 +1,132 @@
+import bisect
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+
+from app.models.missions import CompletedFlowControlMission
+from app.utils.influx_client import to_ns
+
+
+def mission_key(mission: CompletedFlowControlMission) -> str:
+    """Identifies a mission by its valve and start time, identical on every instance"""
+    return f"{mission.flow_control_mission.valve_id}:{to_ns(mission.start_ts)}"
+
+
+def _hash(value: str) -> int:
+    # Stable across processes, unlike the salted built-in hash()
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hashing of keys onto a set of members.
+
+    Every member is placed on the ring ``virtual_nodes`` times, so the keys
+    are spread evenly and adding or removing a member only moves the keys of
+    that member.
+
+    Parameters
+    ----------
+    members : Sequence[str]
+        Identifiers of all instances sharing the work.
+    virtual_nodes : int
+        Points per member on the ring.
+    """
+
+    def __init__(self, members: Sequence[str], virtual_nodes: int = 64):
+        if not members:
+            raise ValueError("A hash ring needs at least one member")
+        self.members = sorted(set(members))
+        points = sorted(
+            (_hash(f"{member}#{index}"), member)
+            for member in self.members
+            for index in range(virtual_nodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [member for _, member in points]
+
+    def owner(self, key: str) -> str:
+        """The member responsible for ``key``"""
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+
+class ShardFilter:
+    """
+    Decides which missions this instance processes.
+
+    Parameters
+    ----------
+    members : Sequence[str]
+        Identifiers of all instances consuming the mission stream.
+    member_id : str
+        Identifier of this instance, one of ``members``.
+    virtual_nodes : int
+        See `HashRing`.
+    """
+
+    def __init__(self, members: Sequence[str], member_id: str, virtual_nodes: int = 64):
+        if member_id not in members:
+            raise ValueError(f"Shard {member_id} is not one of the members {list(members)}")
+        self.member_id = member_id
+        self.ring = HashRing(members, virtual_nodes)
+
+    def owns(self, key: str) -> bool:
+        return self.ring.owner(key) == self.member_id
+
+
+def parse_members(members: str) -> List[str]:
+    """Member identifiers of a comma-separated list"""
+    return [member.strip() for member in members.split(",") if member.strip()]
+
+
+class ProcessedMissions:
+    """
+    Bounded LRU set of the keys of missions already taken on.
+
+    A key is claimed when its mission is parsed, so a redelivered copy is
+    skipped even while the first one is still in the pipeline. The least
+    recently claimed key is forgotten once ``capacity`` is reached.
+
+    Parameters
+    ----------
+    capacity : int
+        Number of keys remembered.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._keys: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def claim(self, key: str) -> bool:
+        """Remember ``key``, False if it was claimed already"""
+        with self._lock:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                return False
+            self._keys[key] = None
+            if len(self._keys) > self.capacity:
+                self._keys.popitem(last=False)
+            return True
+
+    def release(self, key: str):
+        """Forget ``key`` so a later delivery of the mission is processed again"""
+        with self._lock:
+            self._keys.pop(key, None)
+
+
+def shard_from_config(
+    members: str, member_id: Optional[str], virtual_nodes: int = 64
+) -> Optional[ShardFilter]:
+    """The shard filter of the configuration, None when sharding is off"""
+    member_list = parse_members(members)
+    if not member_list:
+        return None
+    if not member_id:
+        raise ValueError("SHARD_ID is required when SHARD_MEMBERS is set")
+    return ShardFilter(member_list, member_id, virtual_nodes)
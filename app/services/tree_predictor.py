@@ -0,0 +1,261 @@
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+# Missing value handling codes of LightGBM numerical splits
+_MISSING_NONE = 0
+_MISSING_ZERO = 1
+_MISSING_NAN = 2
+_MISSING_TYPES = {"None": _MISSING_NONE, "Zero": _MISSING_ZERO, "NaN": _MISSING_NAN}
+
+# LightGBM treats |x| <= kZeroThreshold as zero
+_ZERO_THRESHOLD = 1e-35
+
+# Safety margin so that summation order can never flip an early decision
+_EARLY_EXIT_EPSILON = 1e-9
+
+
+class TreePredictor:
+    """
+    Vectorized evaluator of a LightGBM tree ensemble.
+
+    The trees of ``Booster.dump_model()`` are flattened once into contiguous
+    NumPy arrays (split feature, threshold, left/right child, leaf value) and
+    whole batches are evaluated by traversing all trees of an iteration chunk
+    at the same time. The predictor exposes ``feature_name_``, ``classes_`` and
+    ``predict`` so it can replace an ``LGBMClassifier`` wherever the service
+    only needs class labels.
+
+    Parameters
+    ----------
+    model_dump : dict
+        Output of ``Booster.dump_model()``.
+    classes : Sequence
+        Class labels in the order of the model's output columns.
+    early_exit : bool
+        Stop evaluating further iterations for rows whose winning class can
+        no longer change, given the leaf value range of the remaining trees.
+    chunk_iterations : int
+        Number of boosting iterations evaluated between early exit checks.
+
+    Raises
+    ------
+    ValueError
+        If the model contains categorical or linear-tree splits, which are not
+        supported by the evaluator.
+
+    Examples
+    --------
+    >>> predictor = TreePredictor.from_classifier(lgbm)
+    >>> predictor.predict(matrix)
+    array(['Shower', 'Toilet'], dtype='<U13')
+    """
+
+    def __init__(
+        self,
+        model_dump: Dict,
+        classes: Sequence,
+        early_exit: bool = False,
+        chunk_iterations: int = 10,
+    ):
+        self.feature_name_: List[str] = list(model_dump["feature_names"])
+        self.classes_ = np.asarray(classes)
+        self.early_exit = early_exit
+        self.chunk_iterations = max(1, chunk_iterations)
+
+        self.num_class = model_dump["num_tree_per_iteration"]
+        trees = model_dump["tree_info"]
+        if len(trees) % self.num_class:
+            raise ValueError("Tree count is not a multiple of the trees per iteration")
+        self.num_iterations = len(trees) // self.num_class
+
+        self._flatten(trees)
+
+    @classmethod
+    def from_classifier(cls, classifier, **kwargs):
+        """Compile the trees of a fitted ``LGBMClassifier``."""
+        return cls(classifier.booster_.dump_model(), classifier.classes_, **kwargs)
+
+    @classmethod
+    def from_booster(cls, booster, classes: Sequence, **kwargs):
+        """Compile the trees of a native ``lightgbm.Booster``."""
+        return cls(booster.dump_model(), classes, **kwargs)
+
+    def _flatten(self, trees: List[Dict]):
+        features: List[int] = []
+        thresholds: List[float] = []
+        lefts: List[int] = []
+        rights: List[int] = []
+        default_lefts: List[bool] = []
+        missing_types: List[int] = []
+        values: List[float] = []
+        roots: List[int] = []
+        depths: List[int] = []
+
+        for tree in trees:
+            roots.append(len(features))
+            max_depth = 0
+            # Each entry is (node, its own index, depth); children are appended lazily
+            stack = [(tree["tree_structure"], len(features), 0)]
+            features.append(0)
+            thresholds.append(0.0)
+            lefts.append(0)
+            rights.append(0)
+            default_lefts.append(False)
+            missing_types.append(_MISSING_NONE)
+            values.append(0.0)
+            while stack:
+                node, index, depth = stack.pop()
+                if "leaf_value" in node:
+                    # Leaves point to themselves so the traversal can run a fixed depth
+                    lefts[index] = rights[index] = index
+                    values[index] = node["leaf_value"]
+                    max_depth = max(max_depth, depth)
+                    continue
+
+                if node["decision_type"] != "<=":
+                    raise ValueError(
+                        f"Unsupported decision type: {node['decision_type']}"
+                    )
+                features[index] = node["split_feature"]
+                thresholds[index] = node["threshold"]
+                default_lefts[index] = node["default_left"]
+                missing_types[index] = _MISSING_TYPES[node["missing_type"]]
+
+                for side, children in (("left_child", lefts), ("right_child", rights)):
+                    child_index = len(features)
+                    children[index] = child_index
+                    features.append(0)
+                    thresholds.append(0.0)
+                    lefts.append(0)
+                    rights.append(0)
+                    default_lefts.append(False)
+                    missing_types.append(_MISSING_NONE)
+                    values.append(0.0)
+                    stack.append((node[side], child_index, depth + 1))
+            depths.append(max_depth)
+
+        self._feature = np.asarray(features, dtype=np.intp)
+        self._threshold = np.asarray(thresholds, dtype=np.float64)
+        self._left = np.asarray(lefts, dtype=np.intp)
+        self._right = np.asarray(rights, dtype=np.intp)
+        self._default_left = np.asarray(default_lefts, dtype=bool)
+        self._missing_type = np.asarray(missing_types, dtype=np.int8)
+        self._value = np.asarray(values, dtype=np.float64)
+        self._roots = np.asarray(roots, dtype=np.intp).reshape(
+            self.num_iterations, self.num_class
+        )
+        self._depth = np.asarray(depths, dtype=np.intp).reshape(
+            self.num_iterations, self.num_class
+        )
+        self._has_zero_missing = bool((self._missing_type == _MISSING_ZERO).any())
+
+        # Range of the leaf values of each tree, used for the early exit bound
+        is_leaf = self._left == np.arange(len(features))
+        leaf_min = np.full(len(trees), np.inf)
+        leaf_max = np.full(len(trees), -np.inf)
+        tree_of_node = np.repeat(
+            np.arange(len(trees)), np.diff(np.append(roots, len(features)))
+        )
+        np.minimum.at(leaf_min, tree_of_node[is_leaf], self._value[is_leaf])
+        np.maximum.at(leaf_max, tree_of_node[is_leaf], self._value[is_leaf])
+        leaf_min = leaf_min.reshape(self.num_iterations, self.num_class)
+        leaf_max = leaf_max.reshape(self.num_iterations, self.num_class)
+        # Bounds of the contribution of all iterations from index i onwards
+        self._remaining_min = np.vstack(
+            [np.cumsum(leaf_min[::-1], axis=0)[::-1], np.zeros((1, self.num_class))]
+        )
+        self._remaining_max = np.vstack(
+            [np.cumsum(leaf_max[::-1], axis=0)[::-1], np.zeros((1, self.num_class))]
+        )
+
+    def predict(self, X) -> np.ndarray:
+        """Predict class labels for a matrix whose columns follow ``feature_name_``."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != len(self.feature_name_):
+            raise ValueError(
+                f"Expected a matrix with {len(self.feature_name_)} columns, got {X.shape}"
+            )
+        if self.early_exit:
+            scores = self._raw_scores_early_exit(X)
+        else:
+            scores = self._raw_scores(X, np.arange(len(X)), 0, self.num_iterations)
+        return self.classes_[self._class_index(scores)]
+
+    def raw_predict(self, X) -> np.ndarray:
+        """Sum of the leaf values per class, without the output transformation."""
+        X = np.asarray(X, dtype=np.float64)
+        return self._raw_scores(X, np.arange(len(X)), 0, self.num_iterations)
+
+    def _class_index(self, scores: np.ndarray) -> np.ndarray:
+        if self.num_class == 1:
+            # sigmoid(score) > 0.5 for the positive class
+            return (scores[:, 0] > 0).astype(np.intp)
+        return np.argmax(scores, axis=1)
+
+    def _raw_scores(
+        self, X: np.ndarray, rows: np.ndarray, start: int, stop: int
+    ) -> np.ndarray:
+        scores = np.zeros((len(rows), self.num_class))
+        self._accumulate(X, rows, start, stop, scores)
+        return scores
+
+    def _accumulate(
+        self, X: np.ndarray, rows: np.ndarray, start: int, stop: int, scores
+    ):
+        roots = self._roots[start:stop].ravel()
+        node = np.broadcast_to(roots, (len(rows), len(roots))).copy()
+        row_index = rows[:, None]
+        check_missing = self._has_zero_missing or np.isnan(X[rows]).any()
+
+        for _ in range(int(self._depth[start:stop].max(initial=0))):
+            values = X[row_index, self._feature[node]]
+            go_left = values <= self._threshold[node]
+            if check_missing:
+                go_left = self._missing_decision(values, node, go_left)
+            node = np.where(go_left, self._left[node], self._right[node])
+
+        leaf_values = self._value[node].reshape(len(rows), stop - start, self.num_class)
+        # Add iteration by iteration to keep LightGBM's summation order
+        for iteration in range(stop - start):
+            scores += leaf_values[:, iteration, :]
+
+    def _missing_decision(self, values, node, go_left):
+        missing_type = self._missing_type[node]
+        is_nan = np.isnan(values)
+        # NaN is converted to zero unless the split tracks NaN as missing
+        values = np.where(is_nan & (missing_type != _MISSING_NAN), 0.0, values)
+        missing = ((missing_type == _MISSING_ZERO) & (np.abs(values) <= _ZERO_THRESHOLD)) | (
+            (missing_type == _MISSING_NAN) & is_nan
+        )
+        go_left = np.where(is_nan, values <= self._threshold[node], go_left)
+        return np.where(missing, self._default_left[node], go_left)
+
+    def _raw_scores_early_exit(self, X: np.ndarray) -> np.ndarray:
+        scores = np.zeros((len(X), self.num_class))
+        active = np.arange(len(X))
+        for start in range(0, self.num_iterations, self.chunk_iterations):
+            stop = min(start + self.chunk_iterations, self.num_iterations)
+            partial = scores[active]
+            self._accumulate(X, active, start, stop, partial)
+            scores[active] = partial
+            if stop == self.num_iterations:
+                break
+            active = active[~self._decided(partial, stop)]
+            if not len(active):
+                break
+        return scores
+
+    def _decided(self, scores: np.ndarray, iteration: int) -> np.ndarray:
+        lowest = scores + self._remaining_min[iteration]
+        highest = scores + self._remaining_max[iteration]
+        if self.num_class == 1:
+            return (lowest[:, 0] > _EARLY_EXIT_EPSILON) | (
+                highest[:, 0] < -_EARLY_EXIT_EPSILON
+            )
+
+        leader = np.argmax(scores, axis=1)
+        rows = np.arange(len(scores))
+        rivals = highest.copy()
+        rivals[rows, leader] = -np.inf
+        return lowest[rows, leader] > rivals.max(axis=1) + _EARLY_EXIT_EPSILON
@@ -1,33 +1,244 @@
+import logging
 import threading
-import requests
-from typing import Optional
-import json
-from lightgbm import LGBMClassifier
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple, Union
 import websocket
-import pandas as pd
+from pydantic import TypeAdapter
 
-from app.models.flow_data import FlowClassifierFeatures, FlowDataSummary
+from app.models.flow_data import FeatureSource, FlowClassifierFeatures, FlowDataSummary
 from app.models.missions import (
     ClassifiedFlowControlMission,
     CompletedFlowControlMission,
     EndUseType,
 )
+from app.services.batch_predictor import BatchPredictor
+from app.services.feed import MissionFeed
+from app.services.flow_buffer import FlowmeterIngest
+from app.services.journal import WriteAheadJournal
+from app.services.meters import ValveMeters
+from app.services.model_loader import LoadedModel
+from app.services.pipeline import Pipeline, Stage
+from app.services.publisher import BackendPublisher
+from app.services.sharding import ProcessedMissions, ShardFilter, mission_key
 from app.utils.config import config
+from app.utils.flow_aggregation import summarize_trajectories
+from app.utils.hedging import DeadlineExceeded
 from app.utils.influx_client import InfluxConnector
 from app.utils.logger import logger
+from app.utils.metrics import Counter, Gauge, Histogram
+from app.utils.profiler import TraceRecorder, add_span
+
+MISSIONS = Counter(
+    "missions_total",
+    "Missions by outcome (received, not_owned, duplicate, expired, no_flow_data, "
+    "classified, published, late)",
+    ["outcome"],
+)
+MISSION_FEATURES = Counter(
+    "mission_features_total",
+    "Flow summaries of missions by source (flowmeter, trajectory)",
+    ["source"],
+)
+MISSION_SECONDS = Histogram(
+    "mission_seconds", "Time from receiving a mission to publishing its classification"
+)
+WS_RECONNECTS = Counter(
+    "websocket_reconnects_total", "Reconnections of the mission WebSocket"
+)
+WS_CONNECTED = Gauge(
+    "websocket_connected", "Whether the mission WebSocket is connected"
+)
+_RECEIVED = MISSIONS.labels("received")
+_NOT_OWNED = MISSIONS.labels("not_owned")
+_DUPLICATE = MISSIONS.labels("duplicate")
+_EXPIRED = MISSIONS.labels("expired")
+_NO_FLOW_DATA = MISSIONS.labels("no_flow_data")
+_CLASSIFIED = MISSIONS.labels("classified")
+_PUBLISHED = MISSIONS.labels("published")
+_LATE = MISSIONS.labels("late")
+
+# Built once: validating raw JSON straight into the model skips json.loads and
+# the intermediate dicts, dumping to bytes skips the str round trip
+_MISSION_ADAPTER = TypeAdapter(CompletedFlowControlMission)
+_CLASSIFIED_ADAPTER = TypeAdapter(ClassifiedFlowControlMission)
+
+
+def _valve_of(job: "MissionJob") -> int:
+    return job.mission.flow_control_mission.valve_id
+
+
+@dataclass
+class MissionJob:
+    """State of a single mission travelling through the processing pipeline"""
+
+    # Journal records are handed over as bytes, validated without decoding
+    message: Union[str, bytes]
+    # Completed in the journal once the mission leaves the pipeline
+    journal_seq: Optional[int] = None
+    # `time.monotonic` times of the receipt and of the end of the mission's budget
+    received_at: float = field(default_factory=time.monotonic)
+    deadline: Optional[float] = None
+    mission: Optional[CompletedFlowControlMission] = None
+    # Claimed in the processed missions, see `mission_key`
+    key: Optional[str] = None
+    # Whether this delivery holds the claim of ``key``, released unless published
+    claimed: bool = False
+    flow_features: Optional[FlowClassifierFeatures] = None
+    feature_source: Optional[FeatureSource] = None
+    classified_mission: Optional[ClassifiedFlowControlMission] = None
+    # JSON of the classified mission, serialized once for every consumer
+    payload: Optional[bytes] = None
+    # Timings of the mission while a trace capture runs, see `TraceRecorder`
+    trace: Optional[dict] = None
 
 
 class WebSocketService:
 
-    def __init__(self, influx: InfluxConnector, classifier: LGBMClassifier):
+    def __init__(
+        self,
+        influx: InfluxConnector,
+        model: Optional[LoadedModel] = None,
+        flow_buffer: Optional[FlowmeterIngest] = None,
+        shard: Optional[ShardFilter] = None,
+        dedup_capacity: int = config.DEDUP_CAPACITY,
+        journal: Optional[WriteAheadJournal] = None,
+        meters: Optional[ValveMeters] = None,
+        feed: Optional[MissionFeed] = None,
+        deadline_ms: float = config.MISSION_DEADLINE_MS,
+        deadline_policy: str = config.MISSION_DEADLINE_POLICY,
+        feature_source: str = config.FEATURE_SOURCE,
+        race_budget_ms: float = config.FEATURE_RACE_BUDGET_MS,
+    ):
         self.mission_ws: Optional[websocket.WebSocketApp] = None
         self.influx = influx
-        self.classifier = classifier
+        self.flow_buffer = flow_buffer
+        # Every valve defaults to flowmeter "0"
+        self.meters = meters if meters is not None else ValveMeters()
+        # Live subscribers of the classified missions
+        self.feed = feed
+        # Received missions are persisted here first and drained into the pipeline
+        self.journal = journal
+        # Missions of other shards are skipped, None processes every mission
+        self.shard = shard
+        self.processed = ProcessedMissions(dedup_capacity) if dedup_capacity > 0 else None
+        # End-to-end budget of every mission, missions out of time are skipped
+        # ("drop") or finished and counted ("late")
+        self.deadline = deadline_ms / 1000 if deadline_ms > 0 else None
+        self.deadline_policy = deadline_policy
+        # Flowmeter readings, trajectory estimates or the readings within a budget
+        self.feature_source = feature_source
+        self.race_budget = race_budget_ms / 1000
+        # Per-mission timings, captured on demand by /admin/profile
+        self.tracer = TraceRecorder()
+        # Replaced as a whole on reload, readers take one reference per prediction
+        self.model = model
+        self.publisher = BackendPublisher()
+        self.pipeline = self._build_pipeline()
+        self._running = False
+
+    @property
+    def ready(self) -> bool:
+        """Whether a model is available for predictions"""
+        return self.model is not None
+
+    @property
+    def predictor(self) -> Optional[BatchPredictor]:
+        """Micro-batching front end of the active model"""
+        return self.model.predictor if self.model is not None else None
+
+    def set_model(self, model: LoadedModel):
+        """
+        Atomically replace the model used for all further predictions.
+
+        Predictions already queued on the previous model are flushed by it,
+        predictions racing with the swap are computed inline by the retired
+        predictor, so no mission waits for the reload.
+        """
+        previous = self.model
+        if self._running:
+            model.predictor.start()
+        self.model = model
+        if previous is not None and previous is not model:
+            previous.predictor.stop()
 
     def start(self):
-        """Start WebSocket connections in daemon threads"""
+        """Start the processing pipeline and WebSocket connections in daemon threads"""
+        if self.model is None:
+            raise RuntimeError("A model must be set before starting the service")
+        self._running = True
+        if self.flow_buffer is not None:
+            self.flow_buffer.start()
+        self.model.predictor.start()
+        self.publisher.start()
+        self.pipeline.start()
+        if self.journal is not None:
+            # Replays the missions left unfinished by the previous run first
+            self.journal.start(self._on_journal_record)
         self._establish_connections()
 
+    def stop(self):
+        """Close the WebSocket and drain the missions already received"""
+        self._running = False
+        if self.mission_ws is not None:
+            self.mission_ws.close()
+        if self.journal is not None:
+            # Missions not yet drained stay in the journal for the next start
+            self.journal.stop()
+        self.pipeline.stop()
+        if self.journal is not None:
+            self.journal.close()
+        if self.model is not None:
+            self.model.predictor.stop()
+        self.publisher.stop()
+        if self.flow_buffer is not None:
+            self.flow_buffer.stop()
+
+    def _build_pipeline(self) -> Pipeline:
+        """Create the parse -> fetch summary -> classify -> publish/persist stages"""
+        # Missions of one valve stay in order, different valves run in parallel
+        lane_key = _valve_of if config.PIPELINE_VALVE_LANES else None
+        return Pipeline(
+            [
+                Stage(
+                    "parse",
+                    self._parse_message,
+                    workers=config.PIPELINE_PARSE_WORKERS,
+                    queue_size=config.PIPELINE_QUEUE_SIZE,
+                    # Bursts wait in the journal, dropping would lose the mission
+                    overflow=(
+                        config.PIPELINE_PARSE_OVERFLOW if self.journal is None else "block"
+                    ),
+                ),
+                Stage(
+                    "fetch",
+                    self._fetch_features,
+                    workers=config.PIPELINE_FETCH_WORKERS,
+                    queue_size=config.PIPELINE_QUEUE_SIZE,
+                    overflow=config.PIPELINE_FETCH_OVERFLOW,
+                    batch_size=config.PIPELINE_FETCH_BATCH_SIZE,
+                    key=lane_key,
+                ),
+                Stage(
+                    "classify",
+                    self._classify_mission,
+                    workers=config.PIPELINE_CLASSIFY_WORKERS,
+                    queue_size=config.PIPELINE_QUEUE_SIZE,
+                    overflow=config.PIPELINE_CLASSIFY_OVERFLOW,
+                    key=lane_key,
+                ),
+                Stage(
+                    "publish",
+                    self._publish_mission,
+                    workers=config.PIPELINE_PUBLISH_WORKERS,
+                    queue_size=config.PIPELINE_QUEUE_SIZE,
+                    overflow=config.PIPELINE_PUBLISH_OVERFLOW,
+                    key=lane_key,
+                ),
+            ],
+            on_done=self._on_job_done,
+        )
+
     def _establish_connections(self):
         """Create and start WebSocket connection threads"""
         mission_thread = threading.Thread(target=self._run_mission_ws)
@@ -36,7 +247,11 @@ class WebSocketService:
 
     def _run_mission_ws(self):
         """Run mission WebSocket connection"""
-        while True:
+        connected_before = False
+        while self._running:
+            if connected_before:
+                WS_RECONNECTS.inc()
+            connected_before = True
             try:
                 self.mission_ws = websocket.WebSocketApp(
                     f"ws://{config.BACKEND_BASE}/v1/missions/flow/completed",
@@ -49,10 +264,52 @@ class WebSocketService:
             except Exception as e:
                 logger.error(f"mission WS error: {e}")
                 threading.Event().wait(5)  # Wait before reconnecting
+            else:
+                # run_forever returns right away while the backend refuses connections
+                threading.Event().wait(1)
 
-    def get_flow_summary(self, mission):
+    def meter_of(self, mission: CompletedFlowControlMission) -> str:
+        # The flowmeter measuring the valve of the mission
+        return self.meters.meter_for(mission.flow_control_mission.valve_id)
+
+    def get_flow_summary(self, mission, deadline: Optional[float] = None):
+        meter_id = self.meter_of(mission)
+        # Answering from the in-memory flowmeter buffer when it holds the window
+        if self.flow_buffer is not None:
+            flow_summary = self.flow_buffer.summarize(
+                mission.start_ts, mission.end_ts, meter_id, deadline=deadline
+            )
+            if flow_summary is not None:
+                return flow_summary
         # Fetching the flow summary from Influx DB
-        return self.influx.get_flow_summary(mission.start_ts, mission.end_ts)
+        return self.influx.get_flow_summary(
+            mission.start_ts, mission.end_ts, meter_id, deadline=deadline
+        )
+
+    def get_flow_summaries(
+        self, missions: List[CompletedFlowControlMission], deadline: Optional[float] = None
+    ):
+        # Fetching the flow summaries of several waiting missions with one query,
+        # also when they were measured by different flowmeters
+        meter_ids = [self.meter_of(mission) for mission in missions]
+        flow_summaries = [
+            self.flow_buffer.summarize(
+                mission.start_ts, mission.end_ts, meter_id, deadline=deadline
+            )
+            if self.flow_buffer is not None
+            else None
+            for mission, meter_id in zip(missions, meter_ids)
+        ]
+        missing = [i for i, summary in enumerate(flow_summaries) if summary is None]
+        if missing:
+            fetched = self.influx.get_flow_summaries(
+                [missions[i] for i in missing],
+                meter_ids=[meter_ids[i] for i in missing],
+                deadline=deadline,
+            )
+            for i, flow_summary in zip(missing, fetched):
+                flow_summaries[i] = flow_summary
+        return flow_summaries
 
     def prepare_flow_features(
         self, flow_summary: FlowDataSummary, mission: CompletedFlowControlMission
@@ -81,65 +338,267 @@ class WebSocketService:
         )
         return flow_features
 
-    def predict(self, flow_dict):
-        # Converting the flow features dict to a DataFrame and running prediction
-        classifier_features = pd.DataFrame(flow_dict, index=[0])
-        sorted_columns = classifier_features[self.classifier.feature_name_]
-        prediction = self.classifier.predict(sorted_columns)
-        return prediction
+    def summarize_missions(
+        self, missions: List[CompletedFlowControlMission], deadline: Optional[float] = None
+    ) -> Tuple[List[Optional[FlowDataSummary]], List[Optional[FeatureSource]]]:
+        """
+        The flow summaries of missions and their sources, following ``feature_source``.
+
+        ``flowmeter`` summarizes the readings only, ``trajectory`` estimates every
+        summary from the flow trajectory without a query. ``race`` waits for the
+        readings at most ``race_budget`` (and never past ``deadline``) and
+        estimates the summaries that did not arrive in time, failed or have no
+        readings, so flowmeter slowdowns and outages never block a mission.
+        """
+        if not missions:
+            return [], []
+        if self.feature_source == "trajectory":
+            flow_summaries = summarize_trajectories(missions)
+            MISSION_FEATURES.labels(FeatureSource.TRAJECTORY.value).inc(len(missions))
+            return flow_summaries, [FeatureSource.TRAJECTORY] * len(missions)
+
+        if self.feature_source == "race":
+            budget = time.monotonic() + self.race_budget
+            deadline = min(deadline, budget) if deadline is not None else budget
+            try:
+                flow_summaries = self.get_flow_summaries(missions, deadline=deadline)
+            except Exception as e:
+                logger.warning(
+                    "No flowmeter data in time, estimating %d flow summaries from trajectories: %s",
+                    len(missions),
+                    e,
+                )
+                flow_summaries = [None] * len(missions)
+        else:
+            flow_summaries = self.get_flow_summaries(missions, deadline=deadline)
+
+        sources = [
+            FeatureSource.FLOWMETER if flow_summary is not None else None
+            for flow_summary in flow_summaries
+        ]
+        MISSION_FEATURES.labels(FeatureSource.FLOWMETER.value).inc(
+            len(sources) - sources.count(None)
+        )
+        missing = [i for i, flow_summary in enumerate(flow_summaries) if flow_summary is None]
+        if self.feature_source == "race" and missing:
+            estimates = summarize_trajectories([missions[i] for i in missing])
+            for i, estimate in zip(missing, estimates):
+                flow_summaries[i] = estimate
+                sources[i] = FeatureSource.TRAJECTORY
+            MISSION_FEATURES.labels(FeatureSource.TRAJECTORY.value).inc(len(missing))
+        return flow_summaries, sources
+
+    def features_for_missions(
+        self, missions: List[CompletedFlowControlMission]
+    ) -> Tuple[List[Optional[FlowClassifierFeatures]], List[Optional[FeatureSource]]]:
+        # Computing the classifier features of several missions and their sources,
+        # None if no flow data exists
+        flow_summaries, sources = self.summarize_missions(missions)
+        features = [
+            self.prepare_flow_features(flow_summary, mission)
+            if flow_summary is not None
+            else None
+            for flow_summary, mission in zip(flow_summaries, missions)
+        ]
+        return features, sources
+
+    def classify_features(
+        self, features: List[FlowClassifierFeatures]
+    ) -> Tuple[List[EndUseType], str]:
+        # Classifying a whole batch of feature vectors with one vectorized prediction
+        model = self.model
+        if not features:
+            return [], model.version
+        labels = model.predictor.predict_many(features)
+        return [EndUseType(label) for label in labels], model.version
+
+    def predict(self, flow_features: FlowClassifierFeatures):
+        # Queueing the features for the next micro-batch and waiting for its label
+        return self.predict_with_version(flow_features)[0]
+
+    def predict_with_version(self, flow_features: FlowClassifierFeatures):
+        # The label together with the version of the model that produced it
+        model = self.model
+        return model.predictor.predict(flow_features), model.version
 
     def handle_mission_classification(self, mission):
         # Main flow using the helper functions
         flow_summary = self.get_flow_summary(mission)
         flow_features = self.prepare_flow_features(flow_summary, mission)
-        prediction = self.predict(flow_features.model_dump())
+        prediction = self.predict(flow_features)
         # Do something with prediction, for example, return it, store it or send it via websocket
         return prediction, flow_features
 
-    def _on_mission_message(self, _ws, message: str) -> None:
-        """Handle mission messages"""
-        try:
-            mission = CompletedFlowControlMission(**json.loads(message))
-            logger.debug("Parsed mission: %s", {mission.model_dump_json(indent=2)})
-            prediction, flow_features = self.handle_mission_classification(mission)
-            logger.debug(f"Predicted end use: {prediction}")
-            end_use = EndUseType(prediction[0])
-            headers = {"Content-Type": "application/json", "accept": "application/json"}
-
-            classified_mission = ClassifiedFlowControlMission(
-                flow_control_mission=mission.flow_control_mission,
-                predicted_end_use=end_use,
-                features=flow_features,
-                end_ts=mission.end_ts,
-                start_ts=mission.start_ts,
+    def _on_mission_message(self, _ws, message: Union[str, bytes]) -> None:
+        """Hand mission messages over to the processing pipeline"""
+        _RECEIVED.inc()
+        if self.journal is not None:
+            # Binary frames are journaled as they are
+            self.journal.append(message.encode() if isinstance(message, str) else message)
+        else:
+            job = self._new_job(message)
+            started = time.perf_counter()
+            self.pipeline.put(job)
+            add_span(job.trace, "_on_mission_message", started)
+
+    def _on_journal_record(self, seq: int, payload: bytes) -> None:
+        """Feed a journaled mission into the pipeline, waiting while it is full"""
+        # The budget and the trace start when the record is drained, replays
+        # get a full budget
+        self.pipeline.put(self._new_job(payload, journal_seq=seq))
+
+    def _new_job(self, message: Union[str, bytes], journal_seq: Optional[int] = None):
+        job = MissionJob(message=message, journal_seq=journal_seq, trace=self.tracer.begin())
+        if self.deadline is not None:
+            job.deadline = job.received_at + self.deadline
+        return job
+
+    def _on_job_done(self, job: MissionJob) -> None:
+        if job.payload is None:
+            # Failed or skipped in a stage, a redelivery is processed again
+            self._release(job)
+        if self.journal is not None and job.journal_seq is not None:
+            self.journal.complete(job.journal_seq)
+        if job.trace is not None:
+            self.tracer.record(
+                job.trace,
+                valve_id=_valve_of(job) if job.mission is not None else None,
+                outcome="published" if job.payload is not None else "skipped",
+                feature_source=(
+                    job.feature_source.value if job.feature_source is not None else None
+                ),
             )
 
-            # Perform the POST request
-            self._post_to_backend(headers, classified_mission)
+    # Pipeline stages
+    def _parse_message(self, job: MissionJob) -> Optional[MissionJob]:
+        job.mission = _MISSION_ADAPTER.validate_json(job.message)
+        if self.shard is not None or self.processed is not None:
+            job.key = mission_key(job.mission)
+            if self.shard is not None and not self.shard.owns(job.key):
+                _NOT_OWNED.inc()
+                return None
+            if self.processed is not None:
+                if not self.processed.claim(job.key):
+                    _DUPLICATE.inc()
+                    logger.debug("Skipped redelivered mission %s", job.key)
+                    return None
+                job.claimed = True
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Parsed mission: %s", job.mission.model_dump_json(indent=2))
+        return job
 
-            self.influx.write_classified_end_use(end_use, mission, flow_features)
+    def _fetch_features(self, jobs: List[MissionJob]) -> List[Optional[MissionJob]]:
+        pending = jobs
+        deadline = None
+        if self.deadline_policy == "drop" and self.deadline is not None:
+            now = time.monotonic()
+            # Estimates from the trajectory need no time, only the flowmeter
+            # source gives up on missions out of time
+            if self.feature_source == "flowmeter":
+                pending = [job for job in jobs if job.deadline > now]
+                for job in jobs:
+                    if job.deadline <= now:
+                        self._expire(job)
+            # The batch waits as long as its most patient mission allows
+            deadline = max((job.deadline for job in pending), default=None)
+        if pending:
+            started = time.perf_counter()
+            try:
+                flow_summaries, sources = self.summarize_missions(
+                    [job.mission for job in pending], deadline=deadline
+                )
+            except DeadlineExceeded:
+                for job in pending:
+                    self._expire(job)
+                flow_summaries, sources = [], []
+            for job in pending:
+                add_span(job.trace, "get_flow_summary", started, batch=len(pending))
+            for job, flow_summary, source in zip(pending, flow_summaries, sources):
+                if flow_summary is not None:
+                    job.flow_features = self.prepare_flow_features(flow_summary, job.mission)
+                    job.feature_source = source
+                else:
+                    _NO_FLOW_DATA.inc()
+                    self._release(job)
+        return [job if job.flow_features is not None else None for job in jobs]
 
-        except Exception as e:
-            logger.error(f"Error processing mission message: {e}")
+    def _expire(self, job: MissionJob):
+        # Degrades to a skipped mission instead of holding up the valve's lane
+        _EXPIRED.inc()
+        logger.warning(
+            "Mission of valve %s exceeded its deadline of %.0f ms before its flow data arrived",
+            _valve_of(job),
+            self.deadline * 1000,
+        )
+        self._release(job)
 
-    def _post_to_backend(self, headers, classified_mission):
-        url = f"http://{config.BACKEND_BASE}/v1/missions/flow/last"
-        requests.post(
-            url,
-            headers=headers,
-            data=classified_mission.model_dump_json(),
-            timeout=0.5,
+    def _release(self, job: MissionJob):
+        # Retried when the mission is delivered again. Copies skipped as not
+        # owned or duplicate never held the claim and leave it alone.
+        if job.claimed:
+            job.claimed = False
+            self.processed.release(job.key)
+
+    def _classify_mission(self, job: MissionJob) -> MissionJob:
+        started = time.perf_counter()
+        prediction, model_version = self.predict_with_version(job.flow_features)
+        add_span(job.trace, "predict", started)
+        logger.debug("Predicted end use: %s (%s)", prediction, model_version)
+        # All parts are validated already, constructing skips a second validation
+        job.classified_mission = ClassifiedFlowControlMission.model_construct(
+            flow_control_mission=job.mission.flow_control_mission,
+            predicted_end_use=EndUseType(prediction),
+            features=job.flow_features,
+            end_ts=job.mission.end_ts,
+            start_ts=job.mission.start_ts,
+            model_version=model_version,
+            feature_source=job.feature_source,
         )
-        logger.debug(
-            "Posted mission to backend., %s", classified_mission.model_dump_json()
+        _CLASSIFIED.inc()
+        return job
+
+    def _publish_mission(self, job: MissionJob) -> None:
+        if job.deadline is not None and time.monotonic() > job.deadline:
+            _LATE.inc()
+        classified_mission = job.classified_mission
+        job.payload = _CLASSIFIED_ADAPTER.dump_json(classified_mission)
+
+        # Queue the POST request, it is sent by the publisher's dispatchers
+        started = time.perf_counter()
+        self._post_to_backend(job.payload)
+        add_span(job.trace, "_post_to_backend", started)
+        if self.feed is not None:
+            self.feed.publish(
+                job.payload,
+                job.mission.flow_control_mission.valve_id,
+                classified_mission.predicted_end_use,
+            )
+
+        started = time.perf_counter()
+        self.influx.write_classified_end_use(
+            classified_mission.predicted_end_use,
+            job.mission,
+            job.flow_features,
+            model_version=classified_mission.model_version,
+            feature_source=job.feature_source,
         )
+        add_span(job.trace, "write_classified_end_use", started)
+        _PUBLISHED.inc()
+        MISSION_SECONDS.observe(time.monotonic() - job.received_at)
+
+    def _post_to_backend(self, payload: bytes):
+        self.publisher.publish(payload)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Queued mission for backend: %s", payload.decode())
 
     # WebSocket event handlers
     def _on_mission_open(self, _ws):
+        WS_CONNECTED.set(1)
         logger.info("mission WebSocket opened")
 
     def _on_mission_error(self, _ws, error):
         logger.error(f"mission WebSocket error: {error}")
 
     def _on_mission_close(self, _ws, code, msg):
+        WS_CONNECTED.set(0)
         logger.info(f"mission WebSocket closed: {code} - {msg}")
@@ -1,7 +1,11 @@
-from pydantic import HttpUrl
+from typing import Literal, Optional
+
+from pydantic import HttpUrl, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
-from app.utils.logger import logger
+from app.utils.logger import configure_logging, logger
+
+OverflowPolicyName = Literal["block", "drop_newest", "drop_oldest"]
 
 
 def read_version():
@@ -13,21 +17,113 @@ def read_version():
 class Config(BaseSettings):
     """Holds configuration settings for the project."""
 
+    ADMIN_TOKEN: Optional[str] = None
     BACKEND_BASE: str
+    BACKEND_BATCH_SIZE: int = 1
+    BACKEND_BATCH_WAIT_MS: float = 20.0
+    BACKEND_MAX_RETRIES: int = 3
+    BACKEND_POOL_SIZE: int = 8
+    BACKEND_QUEUE_SIZE: int = 1024
+    BACKEND_RETRY_BACKOFF_S: float = 0.1
+    BACKEND_TIMEOUT_S: float = 0.5
+    BACKEND_WORKERS: int = 4
     DEBUG_LEVEL: str = "INFO"
+    DEDUP_CAPACITY: int = 65536
+    DEFAULT_METER_ID: str = "0"
+    FEATURE_RACE_BUDGET_MS: float = 100
+    FEATURE_SOURCE: Literal["flowmeter", "trajectory", "race"] = "flowmeter"
+    FEED_MAX_SUBSCRIBERS: int = 100
+    FEED_QUEUE_SIZE: int = 256
+    FEED_SLOW_POLICY: Literal["drop_oldest", "disconnect"] = "drop_oldest"
+    FLOW_AGGREGATION: Literal["server", "local"] = "server"
+    FLOW_AGGREGATION_VERIFY: bool = False
+    FLOW_BUFFER_CAPACITY: int = 65536
+    FLOW_BUFFER_ENABLED: bool = False
+    FLOW_BUFFER_MAX_AGE_S: float = 3600
+    FLOW_BUFFER_MAX_WAIT_MS: float = 1500
+    FLOW_BUFFER_POLL_INTERVAL_MS: float = 1000
+    FLOW_BUFFER_POLL_LAG_MS: float = 500
+    INFERENCE_BACKEND: Literal["lightgbm", "tree"] = "lightgbm"
+    INFERENCE_SLOT_ROWS: int = 1024
+    INFERENCE_TIMEOUT_S: float = 10.0
     INFLUXDB_BUCKET: str
+    INFLUXDB_HEDGE_MAX_RATIO: float = 0.1
+    INFLUXDB_HEDGE_MIN_DELAY_MS: float = 5.0
+    INFLUXDB_HEDGE_QUANTILE: float = 0.95
+    INFLUXDB_KEEPALIVE_IDLE_S: int = 30
     INFLUXDB_ORG: str
+    INFLUXDB_QUERY_POOL_SIZE: int = 16
+    INFLUXDB_SPILL_PATH: str = "influx_spill.lp"
+    INFLUXDB_TIMEOUT_MS: int = 250
     INFLUXDB_TOKEN: str
     INFLUXDB_URL: HttpUrl
+    INFLUXDB_WRITE_BATCH_SIZE: int = 500
+    INFLUXDB_WRITE_FLUSH_INTERVAL_MS: float = 1000
+    JOURNAL_CHECKPOINT_INTERVAL_S: float = 1.0
+    JOURNAL_DIR: str = "journal"
+    JOURNAL_ENABLED: bool = False
+    JOURNAL_FSYNC_BATCH: int = 256
+    JOURNAL_FSYNC_INTERVAL_MS: float = 50
+    JOURNAL_SEGMENT_BYTES: int = 64 * 1024 * 1024
+    LOG_FORMAT: Literal["text", "json"] = "text"
+    LOG_RATE_LIMIT_BURST: int = 5
+    LOG_RATE_LIMIT_INTERVAL_S: float = 10.0
+    MISSION_DEADLINE_MS: float = 2000
+    MISSION_DEADLINE_POLICY: Literal["drop", "late"] = "drop"
+    MODEL_DIR: Optional[str] = None
+    MODEL_PATH: str = "model.pkl"
+    MODEL_POLL_INTERVAL_S: float = 5.0
+    MODEL_WARMUP_ROUNDS: int = 3
+    PIPELINE_CLASSIFY_OVERFLOW: OverflowPolicyName = "block"
+    PIPELINE_CLASSIFY_WORKERS: int = 8
+    PIPELINE_FETCH_BATCH_SIZE: int = 16
+    PIPELINE_FETCH_OVERFLOW: OverflowPolicyName = "block"
+    PIPELINE_FETCH_WORKERS: int = 4
+    PIPELINE_PARSE_OVERFLOW: OverflowPolicyName = "drop_oldest"
+    PIPELINE_PARSE_WORKERS: int = 1
+    PIPELINE_PUBLISH_OVERFLOW: OverflowPolicyName = "block"
+    PIPELINE_PUBLISH_WORKERS: int = 4
+    PIPELINE_QUEUE_SIZE: int = 256
+    PIPELINE_VALVE_LANES: bool = True
+    PREDICT_BATCH_SIZE: int = 64
+    PREDICT_BATCH_WAIT_MS: float = 5.0
+    PROFILE_INTERVAL_MS: float = 10.0
+    PROFILE_MAX_SECONDS: float = 60.0
+    PROFILE_TRACE_DIR: str = "traces"
+    PROFILE_TRACE_MAX_MISSIONS: int = 100000
     PROJECT_NAME: str = "crewstand LightGBM Classifier"
+    SERVE_ROLE: Literal["all", "consumer", "http"] = "all"
+    SHARD_ID: Optional[str] = None
+    SHARD_MEMBERS: str = ""
+    SHARD_VIRTUAL_NODES: int = 64
+    STARTUP_BUDGET_S: float = 10.0
+    TREE_EARLY_EXIT: bool = False
+    VALVE_METERS: str = ""
     VERSION: str = read_version()
 
     model_config = SettingsConfigDict(env_file=".env.local")
 
+    @model_validator(mode="after")
+    def _check_valve_lanes(self) -> "Config":
+        # Parse workers would hand missions of one valve to its lane out of order
+        if self.PIPELINE_VALVE_LANES and self.PIPELINE_PARSE_WORKERS > 1:
+            raise ValueError("PIPELINE_VALVE_LANES needs PIPELINE_PARSE_WORKERS=1")
+        return self
+
 
 config = Config()
 
-logger.setLevel(config.DEBUG_LEVEL.upper())
-logger.info(
-    "Start project with current configuration \n %s", config.model_dump_json(indent=2)
+configure_logging(
+    config.DEBUG_LEVEL,
+    config.LOG_FORMAT,
+    config.LOG_RATE_LIMIT_BURST,
+    config.LOG_RATE_LIMIT_INTERVAL_S,
 )
+
+
+def log_config():
+    """Log the current configuration without secrets"""
+    logger.info(
+        "Start project with current configuration \n %s",
+        config.model_dump_json(indent=2, exclude={"ADMIN_TOKEN", "INFLUXDB_TOKEN"}),
+    )
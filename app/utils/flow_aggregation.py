@@ -0,0 +1,180 @@
+from datetime import datetime, timezone
+from typing import List, Sequence
+
+import numpy as np
+
+from app.models.flow_data import FlowDataSummary
+from app.models.missions import CompletedFlowControlMission
+
+# Window of the Flux `aggregateWindow(every: 10s, fn: mean)` used for the peak
+PEAK_WINDOW_NS = 10 * 1_000_000_000
+# Unit of the Flux `integral(unit: 1m)` used for the volume
+VOLUME_UNIT_NS = 60 * 1_000_000_000
+
+
+def summarize_readings(
+    timestamps: np.ndarray,
+    values: np.ndarray,
+    window_ns: int = PEAK_WINDOW_NS,
+    unit_ns: int = VOLUME_UNIT_NS,
+) -> FlowDataSummary:
+    """
+    Computes the flow summary of raw flowmeter readings in one vectorized pass.
+
+    The aggregation reproduces the server-side Flux query of
+    ``InfluxConnector.get_flow_summary``:
+
+    * Mean: arithmetic mean of all readings.
+    * Peak: maximum of the means of epoch-aligned ``window_ns`` windows.
+    * Volume: trapezoidal integral between consecutive readings in ``unit_ns``.
+
+    Parameters
+    ----------
+    timestamps : np.ndarray
+        Reading times in nanoseconds since the epoch, ascending.
+    values : np.ndarray
+        Flow rate readings.
+
+    Returns
+    -------
+    FlowDataSummary
+        The summary of the readings.
+
+    Raises
+    ------
+    ValueError
+        If there are no readings.
+    """
+    if len(values) == 0:
+        raise ValueError("No flowmeter readings in the requested range")
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+
+    # Running sums keep Flux's sequential summation order
+    mean = np.cumsum(values)[-1] / len(values)
+
+    window = timestamps // window_ns
+    starts = np.flatnonzero(np.diff(window, prepend=window[0] - 1))
+    counts = np.diff(np.append(starts, len(values)))
+    peak = np.max(np.add.reduceat(values, starts) / counts)
+
+    elapsed = np.diff(timestamps).astype(np.float64) / unit_ns
+    areas = 0.5 * (values[1:] + values[:-1]) * elapsed
+    volume = np.cumsum(areas)[-1] if len(areas) else 0.0
+
+    return FlowDataSummary(Volume=float(volume), Mean=float(mean), Peak=float(peak))
+
+
+def summarize_trajectories(
+    missions: Sequence[CompletedFlowControlMission],
+    window_ns: int = PEAK_WINDOW_NS,
+    unit_ns: int = VOLUME_UNIT_NS,
+) -> List[FlowDataSummary]:
+    """
+    Estimates the flow summaries of missions from their flow trajectories.
+
+    Every trajectory point holds its flow rate until its time, after the last
+    point the valve is closed. The summary of this step function follows
+    `summarize_readings` without waiting for any flowmeter reading:
+
+    * Mean: time-weighted mean flow rate over the mission window.
+    * Peak: maximum mean flow rate of the epoch-aligned ``window_ns`` windows.
+    * Volume: integral of the flow rate in ``unit_ns``.
+
+    All missions are estimated together in a few vectorized passes.
+
+    Parameters
+    ----------
+    missions : Sequence[CompletedFlowControlMission]
+        The missions to summarize. Missions without a positive time window
+        are summarized over their trajectory.
+
+    Returns
+    -------
+    List[FlowDataSummary]
+        One estimated summary per mission, in order.
+    """
+    if not missions:
+        return []
+    window = window_ns / 1e9
+    trajectories = [mission.flow_control_mission.flow_trajectory for mission in missions]
+    lengths = np.fromiter(map(len, trajectories), dtype=np.int64, count=len(missions))
+    points = np.array(
+        [point for trajectory in trajectories for point in trajectory], dtype=np.float64
+    )
+    ends, rates = points[:, 0], points[:, 1]
+    first = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    mission_of = np.repeat(np.arange(len(missions)), lengths)
+
+    durations = np.array(
+        [(mission.end_ts - mission.start_ts).total_seconds() for mission in missions]
+    )
+    durations = np.where(durations > 0, durations, ends[first + lengths - 1])
+    # Segments are clipped to the mission window
+    limits = durations[mission_of]
+    starts = np.empty_like(ends)
+    starts[1:] = ends[:-1]
+    starts[first] = 0.0
+    clipped_ends = np.minimum(ends, limits)
+    areas = rates * (clipped_ends - np.minimum(starts, limits))
+    integrals = np.add.reduceat(areas, first)
+
+    # The cumulative volume of all missions laid out on one time axis, so the
+    # volume of any window is a difference of two interpolations
+    offsets = np.concatenate(([0.0], np.cumsum(durations[:-1] + 1)))
+    cumulative = np.cumsum(areas)
+    knots_x = np.insert(offsets[mission_of] + clipped_ends, first, offsets)
+    knots_y = np.insert(cumulative, first, cumulative[first] - areas[first])
+
+    # Window boundaries: the mission start, the epoch-aligned cuts inside the
+    # mission and the mission end
+    start_s = np.array([_epoch_seconds(mission.start_ts) for mission in missions])
+    first_cut = window - np.mod(start_s, window)
+    cuts = np.maximum(np.ceil((durations - first_cut) / window), 0).astype(np.int64)
+    counts = cuts + 2
+    bounds_first = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    bound_of = np.repeat(np.arange(len(missions)), counts)
+    index = np.arange(counts.sum()) - bounds_first[bound_of]
+    relative = np.where(
+        index == 0,
+        0.0,
+        np.where(
+            index == counts[bound_of] - 1,
+            durations[bound_of],
+            first_cut[bound_of] + (index - 1) * window,
+        ),
+    )
+    bounds = offsets[bound_of] + relative
+    with np.errstate(divide="ignore", invalid="ignore"):
+        window_means = np.diff(np.interp(bounds, knots_x, knots_y)) / np.diff(bounds)
+        means = integrals / durations
+    # Pairs of the last boundary of a mission and the first of the next one
+    window_means[bounds_first[1:] - 1] = -np.inf
+    peaks = np.maximum.reduceat(np.nan_to_num(window_means, nan=-np.inf), bounds_first)
+
+    # A trajectory of a single point at time 0 has no duration
+    instant = durations <= 0
+    means = np.where(instant, rates[first], means)
+    peaks = np.where(instant, rates[first], peaks)
+    volumes = integrals * 1e9 / unit_ns
+    return [
+        FlowDataSummary(Volume=float(volume), Mean=float(mean), Peak=float(peak))
+        for volume, mean, peak in zip(volumes.tolist(), means.tolist(), peaks.tolist())
+    ]
+
+
+def _epoch_seconds(ts: datetime) -> float:
+    # Naive timestamps are taken as UTC, like `to_ns`
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+def summaries_match(
+    first: FlowDataSummary, second: FlowDataSummary, rel_tol: float = 1e-9
+) -> bool:
+    """Whether two flow summaries agree within a relative tolerance"""
+    return all(
+        np.isclose(getattr(first, name), getattr(second, name), rtol=rel_tol, atol=0)
+        for name in FlowDataSummary.model_fields
+    )
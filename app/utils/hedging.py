@@ -0,0 +1,214 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Optional, TypeVar
+
+import numpy as np
+
+from app.utils.metrics import Counter
+
+HEDGED_READS = Counter(
+    "influx_hedged_reads_total",
+    "Second requests sent for slow or failed InfluxDB reads by kind and outcome (sent, won)",
+    ["query", "outcome"],
+)
+DEADLINE_EXCEEDED = Counter(
+    "influx_deadline_exceeded_total",
+    "InfluxDB reads abandoned at the deadline of their caller by kind",
+    ["query"],
+)
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(TimeoutError):
+    """A read did not finish before the deadline of its caller"""
+
+
+class LatencyTracker:
+    """
+    Rolling quantile of the most recent durations of one kind of read.
+
+    Parameters
+    ----------
+    quantile : float
+        The tracked quantile, e.g. 0.95.
+    window : int
+        Number of recent durations the quantile is computed from.
+    min_samples : int
+        The quantile is unknown until this many durations were observed.
+    refresh : int
+        The quantile is recomputed after this many new observations.
+    """
+
+    def __init__(
+        self, quantile: float, window: int = 512, min_samples: int = 20, refresh: int = 16
+    ):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.refresh = refresh
+        self._durations: Deque[float] = deque(maxlen=window)
+        self._pending = 0
+        self._value: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> Optional[float]:
+        """The quantile in seconds, None while too few durations are known"""
+        return self._value
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._durations.append(seconds)
+            self._pending += 1
+            if len(self._durations) < self.min_samples or self._pending < self.refresh:
+                return
+            self._pending = 0
+            durations = np.fromiter(self._durations, dtype=np.float64)
+        self._value = float(np.quantile(durations, self.quantile))
+
+
+class HedgedReader:
+    """
+    Runs idempotent reads in a thread pool and hedges the slow ones.
+
+    When a read is still running after the tracked ``quantile`` of recent
+    reads of its kind, an identical second request is sent and whichever
+    answers first wins, so a rare slow query no longer sets the tail latency.
+    A read that fails is sent again right away instead. Hedges draw from a
+    token bucket that every read refills by ``max_ratio`` and that holds at
+    most ``max_burst`` tokens, so over any stretch of reads at most about
+    ``max_ratio`` of them are hedged. A long healthy period does not save up
+    budget for the next slowdown, which bounds the extra load on the server
+    exactly when it struggles. The losing request is not interrupted, its
+    result is discarded.
+
+    Parameters
+    ----------
+    workers : int
+        Threads running requests, at most the connection pool size of the client.
+    quantile : float
+        Reads slower than this quantile of recent reads are hedged.
+    min_delay_ms : float
+        Lower bound of the hedging delay.
+    max_ratio : float
+        Fraction of reads allowed to send a second request, 0 disables hedging.
+    max_burst : float
+        Hedges allowed back to back before the budget is used up.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        quantile: float = 0.95,
+        min_delay_ms: float = 5.0,
+        max_ratio: float = 0.1,
+        max_burst: float = 2.0,
+    ):
+        self.quantile = quantile
+        self.min_delay = min_delay_ms / 1000
+        self.max_ratio = max_ratio
+        self.max_burst = max_burst
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="influx-read")
+        self._trackers: Dict[str, LatencyTracker] = {}
+        # Hedges currently allowed, see `_may_hedge`
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+
+    def close(self):
+        """Stop the request threads, requests still running are abandoned"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def read(self, kind: str, request: Callable[[], T], deadline: Optional[float] = None) -> T:
+        """
+        Run ``request`` and return the first successful answer.
+
+        Parameters
+        ----------
+        kind : str
+            Reads of one kind share their latency statistics.
+        request : Callable[[], T]
+            The read, safe to run twice concurrently.
+        deadline : Optional[float]
+            `time.monotonic` time after which the read is abandoned, None waits
+            for the timeouts of the client.
+
+        Raises
+        ------
+        DeadlineExceeded
+            If no request answered before ``deadline``.
+        """
+        if deadline is not None and deadline <= time.monotonic():
+            DEADLINE_EXCEEDED.labels(kind).inc()
+            raise DeadlineExceeded(f"No time left for the {kind} query")
+        tracker = self._tracker(kind)
+        with self._lock:
+            self._tokens = min(self._tokens + self.max_ratio, self.max_burst)
+
+        hedge = None
+        pending = {self._submit(request, tracker)}
+        delay = tracker.value
+        hedge_at = time.monotonic() + max(delay, self.min_delay) if delay is not None else None
+        error: Optional[Exception] = None
+        while True:
+            timeout = None
+            if hedge is None and hedge_at is not None:
+                timeout = hedge_at
+            if deadline is not None:
+                timeout = min(timeout, deadline) if timeout is not None else deadline
+            if pending:
+                done, pending = wait(
+                    pending,
+                    timeout=max(timeout - time.monotonic(), 0) if timeout is not None else None,
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        error = e
+                        continue
+                    if future is hedge:
+                        HEDGED_READS.labels(kind, "won").inc()
+                    return result
+
+            if deadline is not None and time.monotonic() >= deadline:
+                DEADLINE_EXCEEDED.labels(kind).inc()
+                raise DeadlineExceeded(f"The {kind} query did not answer in time")
+            # Hedged once the first request is slow, retried at once when it failed
+            due = not pending or (hedge_at is not None and time.monotonic() >= hedge_at)
+            if hedge is None and due:
+                hedge_at = None
+                if self._may_hedge():
+                    hedge = self._submit(request, tracker)
+                    pending.add(hedge)
+                    HEDGED_READS.labels(kind, "sent").inc()
+            if not pending:
+                raise error
+
+    def _submit(self, request: Callable[[], T], tracker: LatencyTracker) -> Future:
+        started = time.perf_counter()
+        future = self._executor.submit(request)
+
+        def _observe(future: Future):
+            # Every successful request counts, also the discarded ones
+            if not future.cancelled() and future.exception() is None:
+                tracker.observe(time.perf_counter() - started)
+
+        future.add_done_callback(_observe)
+        return future
+
+    def _tracker(self, kind: str) -> LatencyTracker:
+        tracker = self._trackers.get(kind)
+        if tracker is None:
+            with self._lock:
+                tracker = self._trackers.setdefault(kind, LatencyTracker(self.quantile))
+        return tracker
+
+    def _may_hedge(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
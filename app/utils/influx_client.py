@@ -1,11 +1,68 @@
-from datetime import datetime
-from influxdb_client import InfluxDBClient, Point, WritePrecision
+import io
+import logging
+import socket
+import time
+import warnings
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from influxdb_client import Dialect, InfluxDBClient, Point, WritePrecision
 from influxdb_client.client.write_api import SYNCHRONOUS
+from urllib3.connection import HTTPConnection
 
-from app.models.flow_data import FlowClassifierFeatures, FlowDataSummary
+from app.models.flow_data import FeatureSource, FlowClassifierFeatures, FlowDataSummary
 from app.models.missions import CompletedFlowControlMission, EndUseType
 from app.utils.config import config
+from app.utils.flow_aggregation import summaries_match, summarize_readings
+from app.utils.hedging import HedgedReader
+from app.utils.influx_writer import BufferedInfluxWriter
 from app.utils.logger import logger
+from app.utils.metrics import Counter, Histogram
+
+CLASSIFICATION_MEASUREMENT = "Classification"
+
+INFLUX_QUERY_SECONDS = Histogram(
+    "influx_query_seconds",
+    "Duration of InfluxDB queries by kind (summary, readings)",
+    ["query"],
+)
+INFLUX_QUERY_FAILURES = Counter(
+    "influx_query_failures_total", "Failed InfluxDB queries by kind", ["query"]
+)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Plain CSV rows without annotations or header: ,result,table,<column>...
+_RAW_CSV_DIALECT = Dialect(header=False, annotations=[])
+
+_NO_READINGS = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+
+
+def _keepalive_options(idle_s: int) -> list:
+    """Socket options probing idle pooled connections, so dead ones fail fast"""
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    # Linux names, other platforms keep their system defaults
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle_s))
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(idle_s // 3, 1)))
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3))
+    return options
+
+
+def flux_time(ts: datetime) -> str:
+    """Format a timestamp as a Flux time literal, naive timestamps are taken as UTC"""
+    if ts.tzinfo is None:
+        return f"{ts.isoformat()}Z"
+    return ts.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def to_ns(ts: datetime) -> int:
+    """Nanoseconds since the epoch, naive timestamps are taken as UTC"""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return (ts - _EPOCH) // timedelta(microseconds=1) * 1000
 
 
 class InfluxConnector:
@@ -16,9 +73,16 @@ class InfluxConnector:
     bucket : str
         The InfluxDB bucket where data will be written.
     client : InfluxDBClient
-        The client instance used to interact with InfluxDB.
+        The client instance used to write data to InfluxDB.
+    query_client : InfluxDBClient
+        A separate client for reads, whose kept-alive connection pool is sized
+        for concurrent and hedged queries.
     write_api : WriteApi
         The API instance used to write data to InfluxDB.
+    reader : HedgedReader
+        Runs the queries, bounded by the deadline of the caller and hedged when slow.
+    writer : BufferedInfluxWriter
+        Batches points in the background and spills failed batches to disk.
 
     Methods
     __init__(
@@ -31,7 +95,9 @@ class InfluxConnector:
     write_pid(pid: PID, timestamp_ns: int)
         Writes PID controller data to InfluxDB.
     _write(point)
-        Writes a data point to InfluxDB and handles exceptions.
+        Queues a data point for the next batched write to InfluxDB.
+    close()
+        Flushes pending points and closes the client.
     """
 
     def __init__(
@@ -40,21 +106,63 @@ class InfluxConnector:
         token=config.INFLUXDB_TOKEN,
         org=config.INFLUXDB_ORG,
         bucket=config.INFLUXDB_BUCKET,
+        aggregation=config.FLOW_AGGREGATION,
     ):
 
         self.bucket = bucket
+        self.aggregation = aggregation
         self.client = InfluxDBClient(
             url=url,
             token=token,
             org=org,
             debug=(config.DEBUG_LEVEL == "DEBUG"),
-            timeout=250,
+            timeout=config.INFLUXDB_TIMEOUT_MS,
+        )
+        # Reads never wait for a connection busy with a batch write
+        self.query_client = InfluxDBClient(
+            url=url,
+            token=token,
+            org=org,
+            debug=(config.DEBUG_LEVEL == "DEBUG"),
+            timeout=config.INFLUXDB_TIMEOUT_MS,
+            connection_pool_maxsize=config.INFLUXDB_QUERY_POOL_SIZE,
+        )
+        # Applies to the connections the pool opens from now on
+        self.query_client.api_client.rest_client.pool_manager.connection_pool_kw[
+            "socket_options"
+        ] = _keepalive_options(config.INFLUXDB_KEEPALIVE_IDLE_S)
+        self.reader = HedgedReader(
+            workers=config.INFLUXDB_QUERY_POOL_SIZE,
+            quantile=config.INFLUXDB_HEDGE_QUANTILE,
+            min_delay_ms=config.INFLUXDB_HEDGE_MIN_DELAY_MS,
+            max_ratio=config.INFLUXDB_HEDGE_MAX_RATIO,
         )
 
         self.write_api = self.client.write_api(write_options=SYNCHRONOUS)
-        self.query_api = self.client.query_api()
+        self.query_api = self.query_client.query_api()
+        self.writer = BufferedInfluxWriter(
+            self.write_api,
+            bucket=self.bucket,
+            batch_size=config.INFLUXDB_WRITE_BATCH_SIZE,
+            flush_interval_ms=config.INFLUXDB_WRITE_FLUSH_INTERVAL_MS,
+            spill_path=config.INFLUXDB_SPILL_PATH,
+        )
+        self.writer.start()
 
-    def get_flow_summary(self, start_ts: datetime, end_ts: datetime):
+    def close(self):
+        """Flush pending points and close the InfluxDB clients"""
+        self.writer.close()
+        self.reader.close()
+        self.client.close()
+        self.query_client.close()
+
+    def get_flow_summary(
+        self,
+        start_ts: datetime,
+        end_ts: datetime,
+        meter_id: str = "0",
+        deadline: Optional[float] = None,
+    ):
         """
         Retrieves and calculates aggregated flow data characteristics
         from InfluxDB within a specified time range.
@@ -65,6 +173,10 @@ class InfluxConnector:
             The start of the time range from which to retrieve flow data.
         end_ts : datetime
             The end of the time range from which to retrieve flow data.
+        meter_id : str
+            The id of the flowmeter.
+        deadline : Optional[float]
+            `time.monotonic` time by which the summary is needed, see `HedgedReader`.
 
         Returns
         -------
@@ -77,14 +189,21 @@ class InfluxConnector:
         InfluxDBError
             If there is an issue with the query or the connection to the InfluxDB.
 
+        DeadlineExceeded
+            If InfluxDB did not answer before ``deadline``.
+
         ValueError
             If there are unexpected keys returned from the InfluxDB query.
 
         Notes
         -----
-        This method executes an InfluxDB query to obtain readings for a flowmeter identified by id "0"
+        This method executes an InfluxDB query to obtain readings for the flowmeter ``meter_id``
         and calculates various characteristics: total volume, mean flow rate, and peak flow rate.
 
+        With ``FLOW_AGGREGATION=server`` InfluxDB computes the characteristics, with ``local`` the raw
+        readings are streamed once and aggregated by `summarize_readings`. ``FLOW_AGGREGATION_VERIFY``
+        computes both and logs a warning when they disagree.
+
         The query uses Flux language and is designed to work against an InfluxDB v2.x server. It may
         require modifications for different InfluxDB versions or measurement structures.
 
@@ -100,11 +219,33 @@ class InfluxConnector:
 
         """
 
+        if self.aggregation == "local":
+            flow_summary = self.get_local_flow_summary(start_ts, end_ts, meter_id, deadline)
+        else:
+            flow_summary = self.get_server_flow_summary(start_ts, end_ts, meter_id, deadline)
+
+        if config.FLOW_AGGREGATION_VERIFY:
+            self.verify_flow_summary(start_ts, end_ts, flow_summary, meter_id)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Flow summary: %s", flow_summary.model_dump_json(indent=2))
+
+        return flow_summary
+
+    def get_server_flow_summary(
+        self,
+        start_ts: datetime,
+        end_ts: datetime,
+        meter_id: str = "0",
+        deadline: Optional[float] = None,
+    ):
+        """Aggregates the flow summary inside InfluxDB with one Flux query per characteristic"""
+
         query = f"""data = from(bucket: "{self.bucket}")
-                        |> range(start: {start_ts.isoformat()}Z, stop: {end_ts.isoformat()}Z)
+                        |> range(start: {flux_time(start_ts)}, stop: {flux_time(end_ts)})
                         |> filter(fn: (r) => r["_measurement"] == "flowmeter")
                         |> filter(fn: (r) => r["_field"] == "reading")
-                        |> filter(fn: (r) => r["id"] == "0")
+                        |> filter(fn: (r) => r["id"] == "{meter_id}")
 
                     flowMean = data
                         |> mean(column: "_value")
@@ -119,31 +260,401 @@ class InfluxConnector:
                         |> integral(unit: 1m, column: "_value")
                         |> yield(name: "Volume")"""
 
-        flow_tables = self.query_api.query(query)
-        flow_values = flow_tables.to_values(columns=["result", "_value"])
-        flow_summary = FlowDataSummary.from_influx_values(flow_values)
+        def _query():
+            try:
+                with INFLUX_QUERY_SECONDS.labels("summary").time():
+                    flow_tables = self.query_api.query(query)
+            except Exception:
+                INFLUX_QUERY_FAILURES.labels("summary").inc()
+                raise
+            return flow_tables.to_values(columns=["result", "_value"])
 
-        logger.debug("Flow summary: %s", flow_summary.model_dump_json(indent=2))
+        flow_values = self.reader.read("summary", _query, deadline)
+        return FlowDataSummary.from_influx_values(flow_values)
 
-        return flow_summary
+    def get_local_flow_summary(
+        self,
+        start_ts: datetime,
+        end_ts: datetime,
+        meter_id: str = "0",
+        deadline: Optional[float] = None,
+    ):
+        """Streams the raw readings once and aggregates them locally"""
+        timestamps, values = self.get_flow_readings(
+            start_ts, end_ts, meter_id=meter_id, deadline=deadline
+        )
+        return summarize_readings(timestamps, values)
+
+    def get_flow_summaries(
+        self,
+        missions: Sequence[CompletedFlowControlMission],
+        meter_ids: Optional[Sequence[str]] = None,
+        deadline: Optional[float] = None,
+    ) -> List[Optional[FlowDataSummary]]:
+        """
+        Retrieves the flow summaries of several missions with a single query.
+
+        The raw readings of the union of the mission time windows are streamed
+        once and split back into one window per mission, which is aggregated
+        locally like `get_local_flow_summary`. Missions measured by different
+        flowmeters are fetched with one grouped query, see `get_meter_readings`.
+
+        With ``FLOW_AGGREGATION=server`` the missions are aggregated inside
+        InfluxDB instead, see `get_server_flow_summaries`.
+
+        Parameters
+        ----------
+        missions : Sequence[CompletedFlowControlMission]
+            The missions to summarize.
+        meter_ids : Optional[Sequence[str]]
+            The flowmeter of every mission, meter "0" for all by default.
+        deadline : Optional[float]
+            `time.monotonic` time by which the summaries are needed.
+
+        Returns
+        -------
+        List[Optional[FlowDataSummary]]
+            One summary per mission, in the order of ``missions``. Missions without
+            readings get ``None``.
+        """
+        if not missions:
+            return []
+        if meter_ids is None:
+            meter_ids = ["0"] * len(missions)
+        windows = [(mission.start_ts, mission.end_ts) for mission in missions]
+        if self.aggregation == "server":
+            return self.get_server_flow_summaries(windows, meter_ids, deadline)
+        if len(set(meter_ids)) == 1:
+            readings = {
+                meter_ids[0]: self.get_flow_readings(
+                    windows=windows, meter_id=meter_ids[0], deadline=deadline
+                )
+            }
+        else:
+            readings = self.get_meter_readings(
+                [(start, stop, meter_id) for (start, stop), meter_id in zip(windows, meter_ids)],
+                deadline=deadline,
+            )
+
+        summaries: List[Optional[FlowDataSummary]] = []
+        for (start_ts, end_ts), meter_id in zip(windows, meter_ids):
+            timestamps, values = readings.get(meter_id, _NO_READINGS)
+            first, last = np.searchsorted(timestamps, [to_ns(start_ts), to_ns(end_ts)])
+            if first == last:
+                logger.error(
+                    f"No readings of flowmeter {meter_id} between {start_ts} and {end_ts}"
+                )
+                summaries.append(None)
+                continue
+            summaries.append(
+                summarize_readings(timestamps[first:last], values[first:last])
+            )
+        return summaries
+
+    def get_server_flow_summaries(
+        self,
+        windows: Sequence[Tuple[datetime, datetime]],
+        meter_ids: Sequence[str],
+        deadline: Optional[float] = None,
+    ) -> List[Optional[FlowDataSummary]]:
+        """
+        Aggregates the flow summaries of several windows inside InfluxDB with one query.
+
+        Every window is read like `get_server_flow_summary` and tagged with its
+        index, the union is grouped by window and aggregated per group, so each
+        summary equals the one of a query of its window alone. Windows without
+        readings get ``None``.
+        """
+        sources = []
+        for index, ((start_ts, end_ts), meter_id) in enumerate(zip(windows, meter_ids)):
+            sources.append(
+                f"""w{index} = from(bucket: "{self.bucket}")
+                        |> range(start: {flux_time(start_ts)}, stop: {flux_time(end_ts)})
+                        |> filter(fn: (r) => r["_measurement"] == "flowmeter")
+                        |> filter(fn: (r) => r["_field"] == "reading")
+                        |> filter(fn: (r) => r["id"] == "{meter_id}")
+                        |> set(key: "window", value: "{index}")"""
+            )
+        tables = ", ".join(f"w{index}" for index in range(len(windows)))
+        # The range bounds stay in the group key, aggregateWindow needs them
+        query = "\n\n".join(sources) + f"""
+
+                    data = union(tables: [{tables}])
+                        |> group(columns: ["window", "_start", "_stop"])
+
+                    flowMean = data
+                        |> mean(column: "_value")
+                        |> yield(name: "Mean")
+
+                    flowMax = data
+                        |> aggregateWindow(every: 10s, fn: mean)
+                        |> max(column: "_value")
+                        |> yield(name: "Peak")
+
+                    flowVolume = data
+                        |> integral(unit: 1m, column: "_value")
+                        |> yield(name: "Volume")"""
+
+        def _query():
+            try:
+                with INFLUX_QUERY_SECONDS.labels("summary").time():
+                    flow_tables = self.query_api.query(query)
+            except Exception:
+                INFLUX_QUERY_FAILURES.labels("summary").inc()
+                raise
+            return flow_tables.to_values(columns=["result", "window", "_value"])
+
+        values: Dict[int, List[Tuple[str, float]]] = {}
+        for result, window, value in self.reader.read("summary", _query, deadline):
+            values.setdefault(int(window), []).append((result, value))
+
+        summaries: List[Optional[FlowDataSummary]] = []
+        for index, ((start_ts, end_ts), meter_id) in enumerate(zip(windows, meter_ids)):
+            try:
+                summaries.append(FlowDataSummary.from_influx_values(values.get(index, [])))
+            except ValueError as e:
+                # No readings in the window (pydantic's ValidationError is a ValueError too)
+                logger.error(
+                    f"No readings of flowmeter {meter_id} between {start_ts} and {end_ts}: {e}"
+                )
+                summaries.append(None)
+        return summaries
+
+    def get_flow_readings(
+        self,
+        start_ts: Optional[datetime] = None,
+        end_ts: Optional[datetime] = None,
+        windows: Optional[Sequence[Tuple[datetime, datetime]]] = None,
+        meter_id: str = "0",
+        deadline: Optional[float] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Streams the raw flowmeter readings of a time range into NumPy arrays.
+
+        Parameters
+        ----------
+        start_ts, end_ts : datetime
+            The time range of the readings.
+        windows : Optional[Sequence[Tuple[datetime, datetime]]]
+            Several time ranges fetched in one query instead of ``start_ts`` and ``end_ts``.
+        meter_id : str
+            The id of the flowmeter.
+        deadline : Optional[float]
+            `time.monotonic` time by which the readings are needed.
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            Reading times in nanoseconds since the epoch and the readings, sorted by time.
+        """
+        if windows is None:
+            windows = [(start_ts, end_ts)]
+        range_start = min(start for start, _ in windows)
+        range_stop = max(stop for _, stop in windows)
+
+        window_filter = ""
+        if len(windows) > 1:
+            conditions = " or ".join(
+                f"(r._time >= {flux_time(start)} and r._time < {flux_time(stop)})"
+                for start, stop in windows
+            )
+            window_filter = f"|> filter(fn: (r) => {conditions})"
+
+        query = f"""from(bucket: "{self.bucket}")
+                    |> range(start: {flux_time(range_start)}, stop: {flux_time(range_stop)})
+                    |> filter(fn: (r) => r["_measurement"] == "flowmeter")
+                    |> filter(fn: (r) => r["_field"] == "reading")
+                    |> filter(fn: (r) => r["id"] == "{meter_id}")
+                    {window_filter}
+                    |> map(fn: (r) => ({{t: int(v: r._time), v: float(v: r._value)}}))
+                    |> keep(columns: ["t", "v"])"""
+
+        return self._stream_columns(query, ["t", "v"], deadline)
+
+    def get_meter_readings(
+        self,
+        windows: Sequence[Tuple[datetime, datetime, str]],
+        deadline: Optional[float] = None,
+    ) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Streams the raw readings of several flowmeters with one grouped query.
+
+        Parameters
+        ----------
+        windows : Sequence[Tuple[datetime, datetime, str]]
+            Time ranges and the flowmeter whose readings are needed in each.
+        deadline : Optional[float]
+            `time.monotonic` time by which the readings are needed.
+
+        Returns
+        -------
+        Dict[str, Tuple[np.ndarray, np.ndarray]]
+            Reading times in nanoseconds since the epoch and the readings, sorted
+            by time, per flowmeter. Flowmeters without readings are missing.
+        """
+        range_start = min(start for start, _, _ in windows)
+        range_stop = max(stop for _, stop, _ in windows)
+        meter_ids = sorted({meter_id for _, _, meter_id in windows})
+
+        # The plain id filter is pushed down to the storage engine
+        meter_filter = " or ".join(f'r["id"] == "{meter_id}"' for meter_id in meter_ids)
+        conditions = " or ".join(
+            f'(r.id == "{meter_id}" and '
+            f"r._time >= {flux_time(start)} and r._time < {flux_time(stop)})"
+            for start, stop, meter_id in windows
+        )
+
+        query = f"""from(bucket: "{self.bucket}")
+                    |> range(start: {flux_time(range_start)}, stop: {flux_time(range_stop)})
+                    |> filter(fn: (r) => r["_measurement"] == "flowmeter")
+                    |> filter(fn: (r) => r["_field"] == "reading")
+                    |> filter(fn: (r) => {meter_filter})
+                    |> filter(fn: (r) => {conditions})
+                    |> map(fn: (r) => ({{id: r.id, t: int(v: r._time), v: float(v: r._value)}}))
+                    |> keep(columns: ["id", "t", "v"])"""
+
+        rows = self._stream_rows(
+            query, [("id", "U64"), ("t", np.int64), ("v", np.float64)], "readings", deadline
+        )
+        readings = {}
+        for meter_id in np.unique(rows["id"]).tolist():
+            meter_rows = rows[rows["id"] == meter_id]
+            order = np.argsort(meter_rows["t"], kind="stable")
+            readings[meter_id] = (meter_rows["t"][order], meter_rows["v"][order])
+        return readings
+
+    def _stream_columns(
+        self, query: str, columns: list, deadline: Optional[float] = None
+    ) -> Tuple[np.ndarray, ...]:
+        """Parses the CSV response of a query returning int64 times followed by float columns"""
+        dtype = [(columns[0], np.int64)] + [(name, np.float64) for name in columns[1:]]
+        rows = self._stream_rows(query, dtype, "readings", deadline)
+        order = np.argsort(rows[columns[0]], kind="stable")
+        return tuple(rows[name][order] for name in columns)
+
+    def _stream_rows(
+        self, query: str, dtype: list, kind: str, deadline: Optional[float] = None
+    ) -> np.ndarray:
+        """Parses the headerless CSV response of a query into a structured array"""
+        return self.reader.read(
+            kind, lambda: self._read_rows(query, dtype, kind), deadline
+        )
+
+    def _read_rows(self, query: str, dtype: list, kind: str) -> np.ndarray:
+        started = time.perf_counter()
+        try:
+            response = self.query_api.query_raw(query, dialect=_RAW_CSV_DIALECT)
+            try:
+                with warnings.catch_warnings():
+                    # An empty response is a valid result, not worth a warning
+                    warnings.simplefilter("ignore", UserWarning)
+                    # Columns 0-2 are the annotation, result and table columns
+                    rows = np.loadtxt(
+                        io.TextIOWrapper(response, encoding="utf-8"),
+                        delimiter=",",
+                        usecols=range(3, 3 + len(dtype)),
+                        dtype=dtype,
+                        ndmin=1,
+                    )
+            finally:
+                response.release_conn()
+        except Exception:
+            INFLUX_QUERY_FAILURES.labels(kind).inc()
+            raise
+        # Includes streaming the response, the query runs while it is read
+        INFLUX_QUERY_SECONDS.labels(kind).observe(time.perf_counter() - started)
+        return rows
+
+    def verify_flow_summary(
+        self,
+        start_ts: datetime,
+        end_ts: datetime,
+        flow_summary: Optional[FlowDataSummary] = None,
+        meter_id: str = "0",
+    ) -> bool:
+        """Compares the server-side and the local aggregation of a time range"""
+        server = (
+            flow_summary
+            if flow_summary is not None and self.aggregation == "server"
+            else self.get_server_flow_summary(start_ts, end_ts, meter_id)
+        )
+        local = (
+            flow_summary
+            if flow_summary is not None and self.aggregation == "local"
+            else self.get_local_flow_summary(start_ts, end_ts, meter_id)
+        )
+        matches = summaries_match(server, local)
+        if not matches:
+            logger.warning(
+                "Local flow summary %s differs from InfluxDB %s", local, server
+            )
+        return matches
 
     def write_classified_end_use(
         self,
         end_use: EndUseType,
         mission: CompletedFlowControlMission,
         flow_features: FlowClassifierFeatures,
+        model_version: Optional[str] = None,
+        feature_source: Optional[FeatureSource] = None,
     ):
+        flow_control_mission = mission.flow_control_mission
+        point = self.classification_point(
+            end_use=end_use,
+            start_ts=mission.start_ts,
+            flow_features=flow_features.model_dump(),
+            valve_id=flow_control_mission.valve_id,
+            actual_end_use=flow_control_mission.actual_end_use,
+            end_ts=mission.end_ts,
+            duration_scaling_factor=flow_control_mission.duration_scaling_factor,
+            model_version=model_version,
+            feature_source=feature_source.value if feature_source is not None else None,
+        )
+        self._write(point)
+
+    @staticmethod
+    def classification_point(
+        end_use: EndUseType,
+        start_ts: datetime,
+        flow_features: dict,
+        valve_id: Optional[int] = None,
+        actual_end_use: Optional[EndUseType] = None,
+        end_ts: Optional[datetime] = None,
+        duration_scaling_factor: Optional[int] = None,
+        model_version: Optional[str] = None,
+        feature_source: Optional[str] = None,
+    ) -> Point:
+        """
+        Builds a point of the "Classification" schema.
+
+        Only low-cardinality dimensions (valve id, predicted and actual end use)
+        are stored as tags. The float-valued classifier features are fields, so
+        every classification adds a point to an existing series instead of
+        creating a new one. The model version and the feature source are fields
+        too, so re-classifying a mission with another model or recomputed
+        features overwrites its point instead of adding a second one.
+        """
         point = (
-            Point("Classification")
+            Point(CLASSIFICATION_MEASUREMENT)
+            .tag("predicted_end_use", end_use.value)
             .field("end_use", end_use.value)
-            .time(mission.start_ts, WritePrecision.NS)
+            .time(start_ts, WritePrecision.NS)
         )
-        for key, value in flow_features.model_dump().items():
-            point.tag(key, value)
-        self._write(point)
+        if valve_id is not None:
+            point.tag("valve_id", str(valve_id))
+        if actual_end_use is not None:
+            point.tag("actual_end_use", actual_end_use.value)
+        for key, value in flow_features.items():
+            point.field(key, float(value))
+        if end_ts is not None:
+            point.field("end_ts_ns", to_ns(end_ts))
+        if duration_scaling_factor is not None:
+            point.field("duration_scaling_factor", duration_scaling_factor)
+        if model_version is not None:
+            point.field("model_version", model_version)
+        if feature_source is not None:
+            point.field("feature_source", feature_source)
+        return point
 
     def _write(self, point):
-        try:
-            self.write_api.write(bucket=self.bucket, record=point)
-        except Exception as e:
-            logger.error(f"Failed to write to InfluxDB: {e}")
+        self.writer.write(point)
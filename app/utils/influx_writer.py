@@ -0,0 +1,238 @@
+import os
+import threading
+import time
+from typing import List, Optional
+
+from influxdb_client import WritePrecision
+
+from app.utils.logger import logger
+from app.utils.metrics import Counter, Gauge, Histogram
+
+INFLUX_WRITE_SECONDS = Histogram(
+    "influx_write_seconds", "Duration of batch writes to InfluxDB"
+)
+INFLUX_POINTS = Counter(
+    "influx_points_total",
+    "Points handed to InfluxDB by outcome (written, spilled)",
+    ["outcome"],
+)
+INFLUX_PENDING_POINTS = Gauge(
+    "influx_pending_points", "Points buffered for the next InfluxDB write"
+)
+
+
+class BufferedInfluxWriter:
+    """
+    Background batching writer with a local spill file.
+
+    Points are converted to line protocol and buffered in memory. A flusher
+    thread writes the buffer in one request whenever ``batch_size`` lines are
+    pending or ``flush_interval_ms`` has passed. Without `start`, full batches
+    are written by the calling thread and the rest on `flush` or `close`. Batches that cannot be written
+    are appended to ``spill_path`` and replayed, oldest first, once a write
+    succeeds again, so an InfluxDB outage does not lose classification points.
+
+    Parameters
+    ----------
+    write_api : WriteApi
+        A synchronous InfluxDB write API, only used from the flusher thread.
+    bucket : str
+        Destination bucket.
+    batch_size : int
+        Number of buffered lines that triggers an immediate flush.
+    flush_interval_ms : float
+        Maximum time a line stays in the buffer.
+    spill_path : str
+        Append-only file receiving the line protocol of failed batches.
+    replay_interval_s : float
+        Minimum time between replay attempts while no new points arrive.
+
+    Examples
+    --------
+    >>> writer = BufferedInfluxWriter(client.write_api(write_options=SYNCHRONOUS), "bucket")
+    >>> writer.start()
+    >>> writer.write(Point("Classification").field("end_use", "Shower"))
+    >>> writer.close()
+    """
+
+    def __init__(
+        self,
+        write_api,
+        bucket: str,
+        batch_size: int = 500,
+        flush_interval_ms: float = 1000,
+        spill_path: str = "influx_spill.lp",
+        replay_interval_s: float = 5.0,
+    ):
+        self.write_api = write_api
+        self.bucket = bucket
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.spill_path = spill_path
+        self.replay_interval = replay_interval_s
+
+        self._buffer: List[str] = []
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._spill_lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._next_replay = 0.0
+        INFLUX_PENDING_POINTS.set_function(lambda: self.pending)
+
+    @property
+    def pending(self) -> int:
+        """Number of buffered lines not yet handed to InfluxDB"""
+        return len(self._buffer)
+
+    def start(self):
+        """Start the flusher thread"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name="influx-writer", daemon=True
+        )
+        self._thread.start()
+
+    def close(self):
+        """Flush the buffer and stop the flusher thread"""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        else:
+            self.flush()
+
+    def write(self, point) -> bool:
+        """
+        Buffer a point (or a line protocol string) for the next batch.
+
+        Returns
+        -------
+        bool
+            False if the point completed a batch that the calling thread
+            spilled instead of writing, only possible without `start`.
+        """
+        line = point if isinstance(point, str) else point.to_line_protocol()
+        if not line:
+            return True
+        with self._condition:
+            self._buffer.append(line)
+            full = len(self._buffer) >= self.batch_size
+            if full:
+                self._condition.notify_all()
+        if full and not self._running:
+            # Without the flusher thread, batches are written by the caller
+            return self.flush()
+        return True
+
+    def flush(self) -> bool:
+        """
+        Write the buffered lines now, spilling them to disk on failure.
+
+        Returns
+        -------
+        bool
+            False if the buffered lines were spilled instead of written.
+        """
+        with self._condition:
+            lines, self._buffer = self._buffer, []
+        if lines:
+            if not self._write_lines(lines):
+                return False
+            self._replay_spill()
+        elif time.monotonic() >= self._next_replay:
+            self._replay_spill()
+        return True
+
+    def _run(self):
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.flush_interval
+                while (
+                    self._running
+                    and len(self._buffer) < self.batch_size
+                    and (remaining := deadline - time.monotonic()) > 0
+                ):
+                    self._condition.wait(remaining)
+                running = self._running
+            self.flush()
+            if not running:
+                return
+
+    def _write_lines(self, lines: List[str], spill: bool = True) -> bool:
+        try:
+            with INFLUX_WRITE_SECONDS.time():
+                self.write_api.write(
+                    bucket=self.bucket,
+                    record="\n".join(lines),
+                    write_precision=WritePrecision.NS,
+                )
+            INFLUX_POINTS.labels("written").inc(len(lines))
+            logger.debug("Wrote %d points to InfluxDB", len(lines))
+            return True
+        except Exception as e:
+            logger.error(f"Failed to write to InfluxDB: {e}")
+            if spill:
+                self._spill(lines)
+            return False
+
+    def _spill(self, lines: List[str]):
+        with self._spill_lock:
+            with open(self.spill_path, "a", encoding="utf-8") as file:
+                file.write("\n".join(lines) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+        INFLUX_POINTS.labels("spilled").inc(len(lines))
+        logger.warning(f"Spilled {len(lines)} points to {self.spill_path}")
+
+    def _replay_spill(self):
+        """Write the spilled batches back once InfluxDB accepts writes again"""
+        if not self._replay_lock.acquire(blocking=False):
+            # Another thread is replaying, the spill file stays in order
+            return
+        try:
+            self._replay()
+        finally:
+            self._replay_lock.release()
+
+    def _replay(self):
+        replay_path = self.spill_path + ".replay"
+        with self._spill_lock:
+            if not os.path.exists(self.spill_path):
+                if not os.path.exists(replay_path):
+                    return
+            elif os.path.exists(replay_path):
+                # A previous replay was interrupted, its lines come first
+                with open(replay_path, "a", encoding="utf-8") as replay, open(
+                    self.spill_path, "r", encoding="utf-8"
+                ) as spill:
+                    replay.writelines(spill)
+                os.remove(self.spill_path)
+            else:
+                os.replace(self.spill_path, replay_path)
+
+        with open(replay_path, "r", encoding="utf-8") as file:
+            lines = [line.rstrip("\n") for line in file if line.strip()]
+
+        for start in range(0, len(lines), self.batch_size):
+            if not self._write_lines(lines[start : start + self.batch_size], spill=False):
+                # The rest stays in the replay file, ahead of the batches spilled
+                # since, and is replayed first next time
+                self._rewrite(replay_path, lines[start:])
+                self._next_replay = time.monotonic() + self.replay_interval
+                return
+        logger.info(f"Replayed {len(lines)} spilled points to InfluxDB")
+        os.remove(replay_path)
+
+    @staticmethod
+    def _rewrite(path: str, lines: List[str]):
+        # Replaces the file atomically, a crash leaves the old or the new lines
+        with open(path + ".tmp", "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path + ".tmp", path)
@@ -1,4 +1,12 @@
+import atexit
+import json
 import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
 
 
 class CustomFormatter(logging.Formatter):
@@ -25,6 +33,13 @@ class CustomFormatter(logging.Formatter):
         logging.CRITICAL: bold_red + line_format + reset,
     }
 
+    def __init__(self):
+        super().__init__(self.line_format)
+        # Built once instead of for every record
+        self._formatters = {
+            level: logging.Formatter(log_fmt) for level, log_fmt in self.FORMATS.items()
+        }
+
     def format(self, record):
         """
         This function formats a log message based on its level
@@ -34,22 +49,130 @@ class CustomFormatter(logging.Formatter):
         Returns:
             str: The formatted log message.
         """
-        log_fmt = self.FORMATS.get(record.levelno)
-        formatter = logging.Formatter(log_fmt)
+        formatter = self._formatters.get(record.levelno)
+        if formatter is None:
+            return super().format(record)
         return formatter.format(record)
 
 
+class JsonFormatter(logging.Formatter):
+    """Formats records as single-line JSON objects for log shipping"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most ``burst`` identical records through per ``interval_s``.
+
+    Records are identical when they have the same level and message template.
+    The first record after a window with suppressed records reports how many
+    were dropped. Records below ``min_level`` are never limited.
+    """
+
+    def __init__(self, burst: int = 5, interval_s: float = 10.0, min_level: int = logging.WARNING):
+        super().__init__()
+        self.burst = burst
+        self.interval_s = interval_s
+        self.min_level = min_level
+        # (level, template) -> [window start, records in window, suppressed]
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.burst <= 0 or record.levelno < self.min_level:
+            return True
+        key = (record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval_s:
+                suppressed = window[2] if window is not None else 0
+                if len(self._windows) > 1024:
+                    self._windows.clear()
+                self._windows[key] = [now, 1, 0]
+            elif window[1] < self.burst:
+                window[1] += 1
+                return True
+            else:
+                window[2] += 1
+                return False
+        if suppressed:
+            record.msg = f"{record.msg} (suppressed {suppressed} similar messages)"
+        return True
+
+
+class _HandoffHandler(QueueHandler):
+    """
+    Hands records to the writer thread.
+
+    Only the message is merged with its arguments on the calling thread, so
+    later changes of the arguments do not alter it. Formatting and writing
+    happen on the writer thread.
+    """
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+_queue: queue.SimpleQueue = queue.SimpleQueue()
+_handoff = _HandoffHandler(_queue)
+_rate_limit = RateLimitFilter()
+_handoff.addFilter(_rate_limit)
+
+# Writes to the console on a dedicated thread
+ch = logging.StreamHandler()
+ch.setFormatter(CustomFormatter())
+_listener = QueueListener(_queue, ch, respect_handler_level=True)
+_listener.start()
+atexit.register(_listener.stop)
+
+
+def _restart_listener():
+    # Only the forking thread survives a fork, the child needs its own writer
+    _listener._thread = None
+    _listener.start()
+
+
+os.register_at_fork(after_in_child=_restart_listener)
+
 # Create the main logger
 logger = logging.getLogger()
+logger.addHandler(_handoff)
 
-# Create a stream handler, which displays logs in the console
-ch = logging.StreamHandler()
 
-# Set the custom formatter for the stream handler
-ch.setFormatter(CustomFormatter())
+def configure_logging(
+    level: str = "INFO",
+    log_format: str = "text",
+    rate_limit_burst: int = 5,
+    rate_limit_interval_s: float = 10.0,
+) -> None:
+    """
+    Applies the logging settings.
 
-# Add the stream handler to the logger
-logger.addHandler(ch)
+    Args:
+        level (str): Minimum level of the records.
+        log_format (str): ``text`` for colored console output, ``json`` for JSON lines.
+        rate_limit_burst (int): Identical warnings and errors let through per interval,
+            0 disables the rate limit.
+        rate_limit_interval_s (float): Length of the rate limit interval in seconds.
+    """
+    logger.setLevel(level.upper())
+    ch.setFormatter(JsonFormatter() if log_format == "json" else CustomFormatter())
+    _rate_limit.burst = rate_limit_burst
+    _rate_limit.interval_s = rate_limit_interval_s
 
 
 def not_implemented_warning() -> None:
@@ -0,0 +1,166 @@
+import collections
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from types import CodeType, FrameType
+from typing import Counter, Dict, List, Optional
+
+from app.utils.config import config
+
+# Workers of one pool are merged, e.g. fetch-0 and fetch-3 into fetch
+_WORKER_SUFFIX = re.compile(r"[-_]\d+$")
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler of every thread of the running process.
+
+    The stacks of all threads are sampled every ``interval_ms`` from the
+    thread calling `profile`, without tracing hooks, so the service runs at
+    full speed between two samples. Waiting threads are sampled too, which
+    shows where missions queue up and not only where CPU time is spent.
+    """
+
+    def __init__(self, interval_ms: float = config.PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self._labels: Dict[CodeType, str] = {}
+
+    def profile(self, seconds: float, interval_ms: Optional[float] = None) -> Counter[str]:
+        """
+        Sample for ``seconds``, blocking the calling thread.
+
+        Returns
+        -------
+        Counter[str]
+            Samples per collapsed stack: the thread name followed by the
+            frames from the outermost to the innermost, separated by ``;``.
+        """
+        interval = interval_ms / 1000 if interval_ms is not None else self.interval
+        own = threading.get_ident()
+        stacks: Counter[str] = collections.Counter()
+        deadline = time.monotonic() + seconds
+        next_sample = time.monotonic()
+        while next_sample < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    stacks[self._collapse(names.get(ident, "thread"), frame)] += 1
+            next_sample += interval
+            time.sleep(max(next_sample - time.monotonic(), 0))
+        return stacks
+
+    def _collapse(self, thread_name: str, frame: Optional[FrameType]) -> str:
+        labels: List[str] = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        labels.append(_WORKER_SUFFIX.sub("", thread_name))
+        return ";".join(reversed(labels))
+
+    def _label(self, code: CodeType) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = os.path.basename(code.co_filename)
+            # Semicolons separate the frames of a collapsed stack
+            label = f"{code.co_qualname} ({filename}:{code.co_firstlineno})".replace(";", ":")
+            self._labels[code] = label
+        return label
+
+
+def collapsed(stacks: Counter[str]) -> str:
+    """Render stacks in the collapsed format of flamegraph.pl and speedscope"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def add_span(trace: Optional[dict], name: str, started: float, **attributes):
+    """Append the span of ``name`` since ``started`` (`time.perf_counter`) to a trace"""
+    if trace is None:
+        return
+    now = time.perf_counter()
+    trace["spans"].append(
+        {
+            "name": name,
+            "start_ms": round((started - trace["t0"]) * 1000, 3),
+            "duration_ms": round((now - started) * 1000, 3),
+            **attributes,
+        }
+    )
+
+
+class TraceRecorder:
+    """
+    Collects the timings of individual missions while a capture runs.
+
+    Outside of a capture `begin` returns None and tracing costs one clock
+    read per mission. Traces are kept in memory and written to a JSON lines
+    file when the capture finishes.
+
+    Parameters
+    ----------
+    max_traces : int
+        Traces kept per capture, later missions are not traced.
+    """
+
+    def __init__(self, max_traces: int = config.PROFILE_TRACE_MAX_MISSIONS):
+        self.max_traces = max_traces
+        self._until = 0.0
+        self._traces: List[dict] = []
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return time.monotonic() < self._until
+
+    def start(self, seconds: float):
+        """Trace the missions received during the next ``seconds``"""
+        with self._lock:
+            self._traces = []
+            self._until = time.monotonic() + seconds
+
+    def begin(self) -> Optional[dict]:
+        """A new trace of a mission received now, None outside of a capture"""
+        if not self.active:
+            return None
+        return {
+            "received_at": datetime.now(timezone.utc).isoformat(),
+            "t0": time.perf_counter(),
+            "spans": [],
+        }
+
+    def record(self, trace: dict, **fields):
+        """Keep a finished trace, ``fields`` describe the mission"""
+        trace["total_ms"] = round((time.perf_counter() - trace["t0"]) * 1000, 3)
+        trace.update(fields)
+        with self._lock:
+            # Missions finishing after the capture are left out
+            if self.active and len(self._traces) < self.max_traces:
+                self._traces.append(trace)
+
+    def finish(self, directory: str = config.PROFILE_TRACE_DIR) -> Optional[str]:
+        """
+        End the capture and write its traces.
+
+        Returns
+        -------
+        Optional[str]
+            The written file, None if no mission was traced.
+        """
+        with self._lock:
+            self._until = 0.0
+            traces, self._traces = self._traces, []
+        if not traces:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        path = os.path.join(directory, f"trace-{stamp}-{os.getpid()}.jsonl")
+        with open(path, "w", encoding="utf-8") as file:
+            for trace in traces:
+                # Spans may be added by several threads
+                trace["spans"].sort(key=lambda span: span["start_ms"])
+                trace.pop("t0")
+                file.write(json.dumps(trace) + "\n")
+        return path
@@ -0,0 +1,266 @@
+"""
+In-process stand-ins for InfluxDB and the backend used by the benchmarks.
+
+The fake InfluxDB answers the Flux queries of `InfluxConnector` from a
+deterministic synthetic flowmeter signal, the stub backend serves the mission
+WebSocket and records when each classified mission is posted back.
+"""
+
+import asyncio
+import io
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+
+from app.utils.flow_aggregation import summarize_readings
+from app.utils.influx_client import to_ns
+
+_RANGE = re.compile(r"range\(start: ([^\s,]+), stop: ([^\s)]+)\)")
+_WINDOW = re.compile(r"r\._time >= (\S+) and r\._time < ([^\s)]+)\)")
+_METER_WINDOW = re.compile(
+    r'r\.id == "([^"]+)" and r\._time >= (\S+) and r\._time < ([^\s)]+)\)'
+)
+
+
+def _parse_ns(literal: str) -> int:
+    return to_ns(datetime.fromisoformat(literal))
+
+
+def mission_key(mission: dict) -> Tuple[int, int]:
+    """Identifies a mission by its valve and start time in nanoseconds"""
+    return (
+        mission["flow_control_mission"]["valve_id"],
+        to_ns(datetime.fromisoformat(mission["start_ts"])),
+    )
+
+
+class FakeInflux:
+    """
+    Fake of the InfluxDB query and write APIs.
+
+    Readings are generated every ``interval_s`` from a smooth periodic signal,
+    so the flow summaries differ between missions but are reproducible.
+
+    Parameters
+    ----------
+    query_latency_ms : float
+        Added to every query, emulating the round trip to InfluxDB.
+    write_latency_ms : float
+        Added to every batch write.
+    interval_s : float
+        Interval between two synthetic flowmeter readings.
+    slow_ratio : float
+        Fraction of queries taking ``slow_latency_ms`` instead, the tail latency
+        of a loaded server.
+    slow_latency_ms : float
+        Latency of the slow queries.
+    """
+
+    def __init__(
+        self,
+        query_latency_ms: float = 5.0,
+        write_latency_ms: float = 2.0,
+        interval_s: float = 1.0,
+        slow_ratio: float = 0.0,
+        slow_latency_ms: float = 200.0,
+    ):
+        self.query_latency = query_latency_ms / 1000
+        self.write_latency = write_latency_ms / 1000
+        self.slow_ratio = slow_ratio
+        self.slow_latency = slow_latency_ms / 1000
+        self._random = random.Random(0)
+        self.interval_ns = int(interval_s * 1e9)
+        self.queries = 0
+        self.points_written = 0
+        self._lock = threading.Lock()
+
+    def readings(self, start_ns: int, stop_ns: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Synthetic readings of ``start_ns <= t < stop_ns``"""
+        first = -(-start_ns // self.interval_ns) * self.interval_ns
+        timestamps = np.arange(first, stop_ns, self.interval_ns, dtype=np.int64)
+        seconds = timestamps / 1e9
+        values = 6 + 4 * np.sin(seconds / 37) + 2 * np.sin(seconds / 5.3)
+        return timestamps, values
+
+    def _windows(self, query: str) -> List[Tuple[int, int]]:
+        windows = _WINDOW.findall(query) or _RANGE.findall(query)
+        return [(_parse_ns(start), _parse_ns(stop)) for start, stop in windows]
+
+    def _count_query(self):
+        with self._lock:
+            self.queries += 1
+            slow = self._random.random() < self.slow_ratio
+        time.sleep(self.slow_latency if slow else self.query_latency)
+
+    # QueryApi
+    def query(self, query: str):
+        """Server-side aggregation of `InfluxConnector.get_server_flow_summary(ies)`"""
+        self._count_query()
+        windows = self._windows(query)
+        values = []
+        for index, (start_ns, stop_ns) in enumerate(windows):
+            summary = summarize_readings(*self.readings(start_ns, stop_ns))
+            for name in ("Mean", "Peak", "Volume"):
+                # The grouped query tags every row with the index of its window
+                tag = [str(index)] if "union(" in query else []
+                values.append([name, *tag, getattr(summary, name)])
+        return _Tables(values)
+
+    def query_raw(self, query: str, dialect=None):
+        """Raw readings of `InfluxConnector.get_flow_readings` as headerless CSV"""
+        self._count_query()
+        lines = []
+        # Grouped query of `InfluxConnector.get_meter_readings`, every meter reads the same signal
+        meter_windows = _METER_WINDOW.findall(query)
+        for meter_id, start, stop in meter_windows:
+            timestamps, values = self.readings(_parse_ns(start), _parse_ns(stop))
+            lines.extend(
+                f",_result,0,{meter_id},{t},{v!r}" for t, v in zip(timestamps, values.tolist())
+            )
+        for start_ns, stop_ns in [] if meter_windows else self._windows(query):
+            timestamps, values = self.readings(start_ns, stop_ns)
+            lines.extend(f",_result,0,{t},{v!r}" for t, v in zip(timestamps, values.tolist()))
+        return _Response(("\n".join(lines) + "\n").encode() if lines else b"")
+
+    # WriteApi
+    def write(self, bucket: str, record, write_precision=None, **kwargs):
+        """Accepts line protocol like the synchronous write API"""
+        count = record.count("\n") + 1 if isinstance(record, str) else len(record)
+        time.sleep(self.write_latency)
+        with self._lock:
+            self.points_written += count
+
+
+class _Tables:
+    def __init__(self, values: List[list]):
+        self._values = values
+
+    def to_values(self, columns=None) -> List[list]:
+        return self._values
+
+
+class _Response(io.BytesIO):
+    def release_conn(self):
+        pass
+
+
+class StubBackend:
+    """
+    Local backend serving the mission WebSocket and receiving classified missions.
+
+    Every mission is sent to all connected services, like the real backend
+    does for every replica.
+
+    Parameters
+    ----------
+    port : int
+        Port to listen on.
+    host : str
+        Interface to listen on.
+    post_latency_ms : float
+        Delay before answering a POST, emulating the backend's processing.
+
+    Attributes
+    ----------
+    sent_at : Dict[Tuple[int, int], float]
+        ``time.perf_counter()`` at which each mission was sent, by `mission_key`.
+    received_at : Dict[Tuple[int, int], float]
+        ``time.perf_counter()`` at which each classified mission was first posted back.
+    deliveries : Dict[Tuple[int, int], int]
+        How often each classified mission was posted back.
+    """
+
+    def __init__(self, port: int, host: str = "127.0.0.1", post_latency_ms: float = 0.0):
+        self.host = host
+        self.port = port
+        self.post_latency = post_latency_ms / 1000
+        self.sent_at: Dict[Tuple[int, int], float] = {}
+        self.received_at: Dict[Tuple[int, int], float] = {}
+        self.deliveries: Dict[Tuple[int, int], int] = {}
+        self.all_received = threading.Event()
+        self.connected = threading.Event()
+        self.expected = 0
+
+        self._sockets: List[WebSocket] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.app = self._build_app()
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.websocket("/v1/missions/flow/completed")
+        async def missions(websocket: WebSocket):
+            await websocket.accept()
+            self._loop = asyncio.get_running_loop()
+            self._sockets.append(websocket)
+            self.connected.set()
+            try:
+                while True:
+                    await websocket.receive_text()
+            except WebSocketDisconnect:
+                self._sockets.remove(websocket)
+                if not self._sockets:
+                    self.connected.clear()
+
+        @app.post("/v1/missions/flow/last")
+        async def last(request: Request):
+            self._record([json.loads(await request.body())])
+            if self.post_latency:
+                await asyncio.sleep(self.post_latency)
+            return {}
+
+        @app.post("/v1/missions/flow/batch")
+        async def batch(request: Request):
+            self._record(json.loads(await request.body()))
+            if self.post_latency:
+                await asyncio.sleep(self.post_latency)
+            return {}
+
+        return app
+
+    def _record(self, missions: List[dict]):
+        now = time.perf_counter()
+        with self._lock:
+            for mission in missions:
+                key = mission_key(mission)
+                self.received_at.setdefault(key, now)
+                self.deliveries[key] = self.deliveries.get(key, 0) + 1
+            if self.expected and len(self.received_at) >= self.expected:
+                self.all_received.set()
+
+    def start(self):
+        """Serve in a daemon thread and wait until the port is bound"""
+        self._server = uvicorn.Server(
+            uvicorn.Config(self.app, host=self.host, port=self.port, log_level="warning")
+        )
+        self._thread = threading.Thread(target=self._server.run, name="stub-backend", daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join()
+
+    @property
+    def connections(self) -> int:
+        """Number of connected services"""
+        return len(self._sockets)
+
+    def send(self, message: str, key: Tuple[int, int]):
+        """Push a mission to every connected service"""
+        self.sent_at.setdefault(key, time.perf_counter())
+        for socket in list(self._sockets):
+            asyncio.run_coroutine_threadsafe(socket.send_text(message), self._loop)
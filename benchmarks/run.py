@@ -0,0 +1,292 @@
+"""
+End-to-end benchmark of the mission pipeline.
+
+Runs `WebSocketService` in-process against a local stub backend (mission
+WebSocket and POST endpoints) and a fake InfluxDB, feeds it a generated or a
+recorded mission stream and reports the end-to-end latency from sending a
+mission to receiving its classification, the throughput, the per-stage
+breakdown from the service metrics and the peak RSS of the process (which
+includes the stub backend).
+
+Service settings are read from the environment as usual, e.g.
+``PIPELINE_FETCH_BATCH_SIZE=32 FLOW_AGGREGATION=local python -m benchmarks.run``.
+
+Usage:
+    python -m benchmarks.run --model model.pkl --count 2000 --rate 200
+    python -m benchmarks.run --replay traffic.jsonl --speed 10 --output result.json
+    python -m benchmarks.run --baseline main.json --max-regression 10
+"""
+
+import argparse
+import json
+import math
+import os
+import resource
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _configure_environment(port: int, spill_dir: str):
+    # Must happen before the app modules read their configuration
+    os.environ["BACKEND_BASE"] = f"127.0.0.1:{port}"
+    os.environ["INFLUXDB_SPILL_PATH"] = os.path.join(spill_dir, "influx_spill.lp")
+    os.environ["JOURNAL_DIR"] = os.path.join(spill_dir, "journal")
+    for key, value in {
+        "INFLUXDB_URL": "http://127.0.0.1:8086",
+        "INFLUXDB_TOKEN": "benchmark",
+        "INFLUXDB_ORG": "benchmark",
+        "INFLUXDB_BUCKET": "benchmark",
+    }.items():
+        os.environ.setdefault(key, value)
+
+
+def histogram_quantile(quantile: float, bounds, counts) -> float:
+    """Quantile estimated from bucket counts by linear interpolation, like PromQL"""
+    total = sum(counts)
+    if not total:
+        return math.nan
+    rank = quantile * total
+    cumulative = 0
+    lower = 0.0
+    for upper, count in zip(list(bounds) + [math.inf], counts):
+        if cumulative + count >= rank:
+            if math.isinf(upper):
+                return lower
+            return lower + (upper - lower) * (rank - cumulative) / count
+        cumulative += count
+        lower = upper
+    return lower
+
+
+def collect_metrics() -> Dict[str, Dict]:
+    """Histograms and counters of the service metrics registry"""
+    from app.utils.metrics import REGISTRY
+
+    histograms = {}
+    counters = {}
+    for metric in REGISTRY.collect():
+        for labels, child in metric.children():
+            name = metric.name + (
+                "{" + ",".join(f"{k}={v}" for k, v in zip(metric.labelnames, labels)) + "}"
+                if labels
+                else ""
+            )
+            if metric.kind == "histogram":
+                counts, total = child.snapshot()
+                count = sum(counts)
+                # Durations are reported in milliseconds, other values as they are
+                scale = 1000 if metric.name.endswith("_seconds") else 1
+                if count:
+                    histograms[name] = {
+                        "count": count,
+                        "mean": total / count * scale,
+                        "p95": histogram_quantile(0.95, metric.buckets, counts) * scale,
+                    }
+            elif metric.kind == "counter" and child.value:
+                counters[name] = child.value
+    return {"histograms": histograms, "counters": counters}
+
+
+def summarize(latencies: List[float], sent: int, completed: int, duration: float) -> Dict:
+    """Headline numbers; ``latencies`` excludes the warmup missions"""
+    import numpy as np
+
+    values = np.asarray(latencies) * 1000
+    return {
+        "sent": sent,
+        "completed": completed,
+        "missing": sent - completed,
+        "duration_s": duration,
+        "throughput_per_s": completed / duration if duration else 0.0,
+        "latency_ms": {
+            name: float(np.percentile(values, q)) if len(values) else math.nan
+            for name, q in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))
+        },
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def print_report(result: Dict, baseline: Optional[Dict] = None):
+    missions = result["missions"]
+    print(
+        f"\nMissions: {missions['completed']}/{missions['sent']} completed "
+        f"in {missions['duration_s']:.2f} s ({missions['throughput_per_s']:.1f}/s)"
+    )
+    print("End-to-end latency (ms): " + ", ".join(
+        f"{name} {value:.2f}" for name, value in missions["latency_ms"].items()
+    ))
+    print(f"Peak RSS: {missions['peak_rss_mb']:.1f} MB")
+
+    print(f"\n{'histogram (durations in ms)':<64}{'count':>8}{'mean':>10}{'p95':>10}")
+    for name, stats in result["metrics"]["histograms"].items():
+        print(f"{name:<64}{stats['count']:>8}{stats['mean']:>10.2f}{stats['p95']:>10.2f}")
+    print(f"\n{'counter':<64}{'value':>8}")
+    for name, value in result["metrics"]["counters"].items():
+        print(f"{name:<64}{value:>8.0f}")
+
+    if baseline is not None:
+        print(f"\n{'vs baseline':<24}{'baseline':>12}{'current':>12}{'change':>10}")
+        for name, current, previous in _compared(result, baseline):
+            change = (current - previous) / previous * 100 if previous else math.nan
+            print(f"{name:<24}{previous:>12.2f}{current:>12.2f}{change:>9.1f}%")
+
+
+def _compared(result: Dict, baseline: Dict):
+    """(name, current, baseline) of the headline numbers, lower is better"""
+    current, previous = result["missions"], baseline["missions"]
+    for name in ("p50", "p95", "p99"):
+        yield f"latency {name} ms", current["latency_ms"][name], previous["latency_ms"][name]
+    yield "peak RSS MB", current["peak_rss_mb"], previous["peak_rss_mb"]
+    # Inverted so that a positive change is a regression like for the others
+    yield (
+        "1/throughput ms",
+        1000 / max(current["throughput_per_s"], 1e-9),
+        1000 / max(previous["throughput_per_s"], 1e-9),
+    )
+
+
+def regressions(result: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """Headline numbers that got worse than the baseline by more than ``max_regression`` %"""
+    return [
+        name
+        for name, current, previous in _compared(result, baseline)
+        if previous and (current - previous) / previous * 100 > max_regression
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the mission pipeline end to end")
+    parser.add_argument("--model", default=None, help="Model file, defaults to MODEL_PATH")
+    parser.add_argument("--replay", help="Recorded stream, see benchmarks.traffic")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed factor")
+    parser.add_argument("--count", type=int, default=1000, help="Generated missions")
+    parser.add_argument("--rate", type=float, default=100, help="Generated missions per second")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warmup", type=int, default=50, help="Missions excluded from the latency")
+    parser.add_argument("--influx-query-ms", type=float, default=5.0, help="Fake query latency")
+    parser.add_argument("--influx-write-ms", type=float, default=2.0, help="Fake write latency")
+    parser.add_argument(
+        "--influx-slow-ratio", type=float, default=0.0, help="Fraction of slow fake queries"
+    )
+    parser.add_argument(
+        "--influx-slow-ms", type=float, default=200.0, help="Latency of the slow fake queries"
+    )
+    parser.add_argument("--backend-post-ms", type=float, default=0.0, help="Stub POST latency")
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="Write the result as JSON")
+    parser.add_argument("--baseline", help="Result JSON of a previous run to compare with")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        help="Exit with status 1 if a headline number is worse than the baseline by this %%",
+    )
+    args = parser.parse_args()
+
+    port = _free_port()
+    spill_dir = tempfile.mkdtemp(prefix="benchmark-")
+    _configure_environment(port, spill_dir)
+
+    from benchmarks.fakes import FakeInflux, StubBackend, mission_key
+    from benchmarks.traffic import load_stream, synthetic_stream
+    from app.services.journal import WriteAheadJournal
+    from app.services.meters import valve_meters_from_config
+    from app.services.model_loader import load_model
+    from app.services.websocket_service import WebSocketService
+    from app.utils.config import config
+    from app.utils.influx_client import InfluxConnector
+
+    if args.replay:
+        stream = load_stream(args.replay)
+    else:
+        stream = synthetic_stream(args.count, args.rate, seed=args.seed)
+    keys = [mission_key(json.loads(message)) for _, message in stream]
+
+    backend = StubBackend(port=port, post_latency_ms=args.backend_post_ms)
+    backend.expected = len(set(keys))
+    backend.start()
+
+    fake = FakeInflux(
+        args.influx_query_ms,
+        args.influx_write_ms,
+        slow_ratio=args.influx_slow_ratio,
+        slow_latency_ms=args.influx_slow_ms,
+    )
+    influx = InfluxConnector()
+    influx.query_api = fake
+    influx.write_api = fake
+    influx.writer.write_api = fake
+
+    journal = (
+        WriteAheadJournal(
+            config.JOURNAL_DIR,
+            segment_bytes=config.JOURNAL_SEGMENT_BYTES,
+            fsync_interval_ms=config.JOURNAL_FSYNC_INTERVAL_MS,
+            fsync_batch=config.JOURNAL_FSYNC_BATCH,
+        )
+        if config.JOURNAL_ENABLED
+        else None
+    )
+    meters = valve_meters_from_config(config.VALVE_METERS, config.DEFAULT_METER_ID)
+    service = WebSocketService(influx=influx, journal=journal, meters=meters)
+    service.set_model(load_model(args.model or config.MODEL_PATH))
+    service.start()
+    if not backend.connected.wait(10):
+        sys.exit("The service did not connect to the stub backend")
+
+    began = time.perf_counter()
+    for (offset, message), key in zip(stream, keys):
+        delay = began + offset / args.speed - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        backend.send(message, key)
+    backend.all_received.wait(args.drain_timeout)
+    duration = max(backend.received_at.values(), default=began) - began
+
+    service.stop()
+    influx.close()
+    backend.stop()
+
+    measured = keys[args.warmup :] if len(keys) > args.warmup else keys
+    latencies = [
+        backend.received_at[key] - backend.sent_at[key]
+        for key in measured
+        if key in backend.received_at
+    ]
+    result = {
+        "settings": {
+            **vars(args),
+            **config.model_dump(mode="json", exclude={"INFLUXDB_TOKEN"}),
+        },
+        "missions": summarize(
+            latencies, len(set(keys)), len(backend.received_at), duration
+        ),
+        "metrics": collect_metrics(),
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+    print_report(result, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(result, file, indent=2)
+
+    if baseline is not None and args.max_regression is not None:
+        failed = regressions(result, baseline, args.max_regression)
+        if failed:
+            sys.exit(f"Regressed by more than {args.max_regression}%: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
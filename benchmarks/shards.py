@@ -0,0 +1,121 @@
+"""
+Sharded mission consumption with several local instances.
+
+Starts ``--members`` instances of `WebSocketService` in-process, each with its
+own shard of a common hash ring, against one stub backend that sends every
+mission to all of them. A fraction of the missions is sent a second time,
+like after a reconnect. Checks that every mission is classified exactly once
+and reports how the missions spread over the shards and how many keys move
+when another member joins.
+
+Usage:
+    python -m benchmarks.shards --members 3 --count 1000 --rate 200 --redeliver 0.2
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.run import _configure_environment, _free_port
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several sharded instances locally")
+    parser.add_argument("--members", type=int, default=3, help="Number of instances")
+    parser.add_argument("--model", default=None, help="Model file, defaults to MODEL_PATH")
+    parser.add_argument("--count", type=int, default=1000, help="Generated missions")
+    parser.add_argument("--rate", type=float, default=200, help="Generated missions per second")
+    parser.add_argument("--redeliver", type=float, default=0.2, help="Fraction sent twice")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--influx-query-ms", type=float, default=5.0, help="Fake query latency")
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    port = _free_port()
+    _configure_environment(port, tempfile.mkdtemp(prefix="shards-"))
+
+    from benchmarks.fakes import FakeInflux, StubBackend, mission_key
+    from benchmarks.traffic import synthetic_stream
+    from app.services.model_loader import load_model
+    from app.services.sharding import HashRing, ShardFilter
+    from app.services.websocket_service import WebSocketService
+    from app.utils.config import config
+    from app.utils.influx_client import InfluxConnector
+
+    stream = synthetic_stream(args.count, args.rate, seed=args.seed)
+    keys = [mission_key(json.loads(message)) for _, message in stream]
+    rng = random.Random(args.seed)
+    redelivered = [
+        (message, key) for (_, message), key in zip(stream, keys) if rng.random() < args.redeliver
+    ]
+
+    backend = StubBackend(port=port)
+    backend.expected = len(set(keys))
+    backend.start()
+
+    members = [f"shard-{index}" for index in range(args.members)]
+    services = []
+    for member in members:
+        influx = InfluxConnector()
+        fake = FakeInflux(args.influx_query_ms)
+        influx.query_api = fake
+        influx.write_api = fake
+        influx.writer.write_api = fake
+        service = WebSocketService(
+            influx=influx, shard=ShardFilter(members, member, config.SHARD_VIRTUAL_NODES)
+        )
+        service.set_model(load_model(args.model or config.MODEL_PATH))
+        service.start()
+        services.append(service)
+
+    deadline = time.monotonic() + 10
+    while backend.connections < len(services):
+        if time.monotonic() > deadline:
+            sys.exit("Not all instances connected to the stub backend")
+        time.sleep(0.05)
+
+    began = time.perf_counter()
+    for (offset, message), key in zip(stream, keys):
+        delay = began + offset - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        backend.send(message, key)
+    # Redeliveries, e.g. the backend resending missions after a reconnect
+    for message, key in redelivered:
+        backend.send(message, key)
+    backend.all_received.wait(args.drain_timeout)
+    # Give duplicates, if any, the time to arrive as well
+    time.sleep(1)
+
+    for service in services:
+        service.stop()
+        service.influx.close()
+    backend.stop()
+
+    missing = len(set(keys)) - len(backend.received_at)
+    duplicated = sum(1 for count in backend.deliveries.values() if count > 1)
+    print(f"\nMissions: {len(set(keys))} sent, {len(redelivered)} redelivered")
+    print(f"Classified: {len(backend.received_at)}, missing {missing}, duplicated {duplicated}")
+    print(f"\n{'member':<16}{'missions':>10}{'share':>10}")
+    for member, service in zip(members, services):
+        owned = len(service.processed) if service.processed is not None else 0
+        print(f"{member:<16}{owned:>10}{owned / max(len(set(keys)), 1):>10.1%}")
+
+    ring = HashRing(members, config.SHARD_VIRTUAL_NODES)
+    grown = HashRing(members + [f"shard-{len(members)}"], config.SHARD_VIRTUAL_NODES)
+    names = [f"{valve}:{start_ns}" for valve, start_ns in set(keys)]
+    moved = sum(1 for name in names if ring.owner(name) != grown.owner(name))
+    print(
+        f"\nKeys moved when adding a member: {moved / max(len(names), 1):.1%} "
+        f"(ideal {1 / (len(members) + 1):.1%})"
+    )
+
+    if missing or duplicated:
+        sys.exit("Missions were lost or classified more than once")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Mission streams for the benchmarks.
+
+A stream is a list of ``(offset_s, message)`` pairs: the mission JSON as the
+backend sends it and its send time relative to the first mission. Streams are
+either generated or recorded from a running backend and stored as JSON lines.
+
+Record the traffic of a backend for ten minutes:
+    python -m benchmarks.traffic --url ws://backend:5000 --duration 600 --output traffic.jsonl
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple
+
+import websocket
+
+Stream = List[Tuple[float, str]]
+
+
+def synthetic_stream(count: int, rate: float, seed: int = 0, valves: int = 8) -> Stream:
+    """
+    Generates ``count`` missions arriving as a Poisson process of ``rate`` per second.
+
+    Every mission gets a distinct start time so it can be matched with its
+    classification.
+    """
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    stream = []
+    offset = 0.0
+    for index in range(count):
+        duration = rng.uniform(5, 240)
+        # Missions never overlap in simulated time, so their keys are unique
+        start_ts = start + timedelta(seconds=index * 300)
+        flow_rate = rng.uniform(1, 12)
+        mission = {
+            "flow_control_mission": {
+                "valve_id": rng.randrange(1, valves + 1),
+                "flow_trajectory": [[duration / 2, flow_rate], [duration, flow_rate / 2]],
+                "duration_scaling_factor": rng.choice([1, 2, 4]),
+            },
+            "start_ts": start_ts.isoformat(),
+            "end_ts": (start_ts + timedelta(seconds=duration)).isoformat(),
+        }
+        stream.append((offset, json.dumps(mission)))
+        offset += rng.expovariate(rate)
+    return stream
+
+
+def load_stream(path: str) -> Stream:
+    """Reads a stream written by `save_stream`"""
+    with open(path, "r", encoding="utf-8") as file:
+        return [
+            (record["offset_s"], record["message"])
+            for record in map(json.loads, file)
+        ]
+
+
+def save_stream(path: str, stream: Stream):
+    """Writes a stream as JSON lines"""
+    with open(path, "w", encoding="utf-8") as file:
+        for offset, message in stream:
+            file.write(json.dumps({"offset_s": offset, "message": message}) + "\n")
+
+
+def record_stream(url: str, duration_s: float) -> Stream:
+    """Records the missions a backend sends during ``duration_s`` seconds"""
+    stream: Stream = []
+    began = None
+
+    def on_message(_ws, message):
+        nonlocal began
+        now = time.monotonic()
+        if began is None:
+            began = now
+        stream.append((now - began, message))
+
+    ws = websocket.WebSocketApp(
+        f"{url.rstrip('/')}/v1/missions/flow/completed", on_message=on_message
+    )
+    timer = threading.Timer(duration_s, ws.close)
+    timer.start()
+    ws.run_forever()
+    timer.cancel()
+    return stream
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record the mission stream of a backend")
+    parser.add_argument("--url", required=True, help="ws://host:port of the backend")
+    parser.add_argument("--duration", type=float, default=600, help="Seconds to record")
+    parser.add_argument("--output", default="traffic.jsonl")
+    args = parser.parse_args()
+
+    stream = record_stream(args.url, args.duration)
+    save_stream(args.output, stream)
+    print(f"Recorded {len(stream)} missions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import os
+import sys
+
+# The settings are read when `app.utils.config` is imported
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+for key, value in {
+    "BACKEND_BASE": "127.0.0.1:9",
+    "INFLUXDB_URL": "http://127.0.0.1:8086",
+    "INFLUXDB_TOKEN": "test",
+    "INFLUXDB_ORG": "test",
+    "INFLUXDB_BUCKET": "test",
+}.items():
+    os.environ.setdefault(key, value)
@@ -0,0 +1,118 @@
+"""In-memory stand-ins for InfluxDB and the backend used by the tests"""
+
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Sequence, Tuple
+
+from app.utils.influx_client import to_ns
+
+_PREDICATE_TAG = re.compile(r'(\w+)="([^"]*)"')
+
+
+def _split_line(line: str) -> Tuple[str, Dict[str, str], int]:
+    # measurement,tag=value,... fields timestamp, test points have no escaped spaces
+    key, _, rest = line.partition(" ")
+    measurement, *tags = key.split(",")
+    return measurement, dict(tag.split("=", 1) for tag in tags), int(rest.rsplit(" ", 1)[1])
+
+
+class FakeBucket:
+    """
+    Points of one bucket by series, with the write and delete semantics of InfluxDB.
+
+    ``fail_writes`` makes the next writes raise, like an unreachable server.
+    """
+
+    def __init__(self):
+        self.lines: List[str] = []
+        self.writes = 0
+        self.fail_writes = 0
+
+    # WriteApi
+    def write(self, bucket: str, record: str, write_precision=None, **kwargs):
+        self.writes += 1
+        if self.fail_writes:
+            self.fail_writes -= 1
+            raise ConnectionError("InfluxDB is unavailable")
+        for line in record.split("\n"):
+            measurement, tags, time_ns = _split_line(line)
+            series = (measurement, tuple(sorted(tags.items())), time_ns)
+            # A point replaces the point of its series at the same time
+            self.lines = [old for old in self.lines if self._key(old) != series]
+            self.lines.append(line)
+
+    # DeleteApi
+    def delete_api(self):
+        return self
+
+    def delete(self, start, stop, predicate: str, bucket: str, **kwargs):
+        """Removes the points of every series having the tags of the predicate"""
+        wanted = dict(_PREDICATE_TAG.findall(predicate))
+        measurement = wanted.pop("_measurement")
+        self.lines = [
+            line
+            for line in self.lines
+            if not self._matches(line, measurement, wanted, to_ns(start), to_ns(stop))
+        ]
+
+    def points(self) -> List[Tuple[Dict[str, str], int]]:
+        """Tags and time of the stored points"""
+        return [_split_line(line)[1:] for line in self.lines]
+
+    @staticmethod
+    def _key(line: str):
+        measurement, tags, time_ns = _split_line(line)
+        return measurement, tuple(sorted(tags.items())), time_ns
+
+    @staticmethod
+    def _matches(line: str, measurement: str, wanted: Dict[str, str], start: int, stop: int):
+        name, tags, time_ns = _split_line(line)
+        return (
+            name == measurement
+            and start <= time_ns <= stop
+            # A missing tag has the empty value
+            and all(tags.get(tag, "") == value for tag, value in wanted.items())
+        )
+
+
+class StubServer:
+    """
+    Local HTTP server recording the POST requests it receives.
+
+    ``statuses`` are answered in turn, 200 once they are used up.
+    """
+
+    def __init__(self, statuses: Sequence[int] = ()):
+        self.statuses = list(statuses)
+        self.requests: List[Tuple[str, bytes, float]] = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                with stub._lock:
+                    stub.requests.append((self.path, body, time.monotonic()))
+                    status = stub.statuses.pop(0) if stub.statuses else 200
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+        )
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routes.api import api_router
+from app.services.model_registry import ModelRegistry
+from app.utils.config import config
+
+TOKEN = {"Authorization": "Bearer secret"}
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    directory = tmp_path / "models"
+    directory.mkdir()
+    return directory
+
+
+@pytest.fixture
+def client(model_dir, monkeypatch):
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "secret")
+    app = FastAPI()
+    app.include_router(api_router)
+    app.state.ws_service = SimpleNamespace(ready=True)
+    app.state.inference_pool = None
+    app.state.model_registry = ModelRegistry(
+        on_swap=lambda model: None, directory=str(model_dir)
+    )
+    return TestClient(app)
+
+
+def test_admin_routes_are_disabled_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(config, "ADMIN_TOKEN", None)
+    assert client.post("/admin/models/reload", headers=TOKEN).status_code == 403
+    assert client.post("/admin/profile", headers=TOKEN).status_code == 403
+
+
+def test_admin_routes_require_the_token(client):
+    assert client.post("/admin/models/reload").status_code == 401
+    wrong = {"Authorization": "Bearer guess"}
+    assert client.post("/admin/models/reload", headers=wrong).status_code == 401
+    assert client.post("/admin/profile", headers=wrong).status_code == 401
+
+
+def test_reload_refuses_files_outside_the_model_directory(client, tmp_path):
+    outside = tmp_path / "payload.pkl"
+    outside.write_bytes(b"not a model")
+    for path in [str(outside), "../payload.pkl"]:
+        response = client.post("/admin/models/reload", json={"path": path}, headers=TOKEN)
+        assert response.status_code == 403
+
+
+def test_reload_of_an_invalid_model_is_unprocessable(client, model_dir):
+    (model_dir / "broken.pkl").write_bytes(b"not a model")
+    response = client.post("/admin/models/reload", json={"path": "broken.pkl"}, headers=TOKEN)
+    assert response.status_code == 422
@@ -0,0 +1,106 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Optional
+
+import numpy as np
+import pytest
+
+from app.backfill import FEATURE_NAMES, LEGACY_VERSION_COLUMN, write_chunk
+from app.models.missions import EndUseType
+from app.utils.influx_client import InfluxConnector, to_ns
+from app.utils.influx_writer import BufferedInfluxWriter
+from tests.fakes import FakeBucket
+
+START = datetime(2025, 4, 1, 12, tzinfo=timezone.utc)
+SERIES = {"predicted_end_use": "Shower", "valve_id": "1"}
+
+
+def store(bucket: FakeBucket, end_use: str, model_version: Optional[str] = None) -> dict:
+    """Writes a classification of valve 1 and returns it as read back by `read_chunk`"""
+    features = {name: 1.0 for name in FEATURE_NAMES}
+    point = InfluxConnector.classification_point(
+        end_use=EndUseType(end_use),
+        start_ts=START,
+        flow_features=features,
+        valve_id=1,
+        model_version=model_version,
+    )
+    bucket.write("test", point.to_line_protocol())
+    return {
+        "_time": START,
+        "predicted_end_use": end_use,
+        "valve_id": "1",
+        "model_version": model_version,
+        **features,
+    }
+
+
+def store_legacy(bucket: FakeBucket, end_use: str, model_version: str) -> dict:
+    """Writes a classification holding its model version as a tag, as older releases did"""
+    row = store(bucket, end_use)
+    line = bucket.lines.pop()
+    key, _, rest = line.partition(" ")
+    bucket.write("test", f"{key},model_version={model_version} {rest}")
+    row[LEGACY_VERSION_COLUMN] = model_version
+    return row
+
+
+def backfill(bucket: FakeBucket, rows, labels) -> int:
+    influx = SimpleNamespace(client=bucket, bucket="test")
+    writer = BufferedInfluxWriter(bucket, "test")
+    return write_chunk(influx, writer, rows, np.array(labels), "v2")
+
+
+def test_unversioned_point_is_overwritten():
+    bucket = FakeBucket()
+    row = store(bucket, "Shower")
+
+    assert backfill(bucket, [row], ["Shower"]) == 0
+
+    assert bucket.points() == [(SERIES, to_ns(START))]
+    assert 'model_version="v2"' in bucket.lines[0]
+
+
+def test_legacy_version_tag_is_replaced():
+    bucket = FakeBucket()
+    row = store_legacy(bucket, "Shower", "v1")
+
+    assert backfill(bucket, [row], ["Shower"]) == 0
+
+    assert bucket.points() == [(SERIES, to_ns(START))]
+
+
+def test_changed_prediction_replaces_the_old_series():
+    bucket = FakeBucket()
+    row = store(bucket, "Shower", model_version="v1")
+
+    assert backfill(bucket, [row], ["Toilet"]) == 1
+
+    new = {"predicted_end_use": "Toilet", "valve_id": "1"}
+    assert bucket.points() == [(new, to_ns(START))]
+
+
+def test_new_model_version_overwrites_the_point():
+    bucket = FakeBucket()
+    row = store(bucket, "Shower", model_version="v1")
+
+    assert backfill(bucket, [row], ["Shower"]) == 0
+
+    assert bucket.points() == [(SERIES, to_ns(START))]
+    assert 'model_version="v2"' in bucket.lines[0]
+
+
+def test_spilled_batch_fails_the_chunk_before_deleting(tmp_path):
+    bucket = FakeBucket()
+    rows = [store(bucket, "Shower", model_version="v1")]
+    bucket.fail_writes = 1
+    influx = SimpleNamespace(client=bucket, bucket="test")
+    writer = BufferedInfluxWriter(
+        bucket, "test", batch_size=1, spill_path=str(tmp_path / "spill.lp")
+    )
+
+    with pytest.raises(RuntimeError):
+        write_chunk(influx, writer, rows, np.array(["Toilet"]), "v2")
+
+    # The spilled point may be replayed meanwhile, the old one is not deleted
+    assert (SERIES, to_ns(START)) in bucket.points()
@@ -0,0 +1,11 @@
+import pytest
+from pydantic import ValidationError
+
+from app.utils.config import Config
+
+
+def test_valve_lanes_need_a_single_parse_worker():
+    with pytest.raises(ValidationError, match="PIPELINE_PARSE_WORKERS=1"):
+        Config(PIPELINE_VALVE_LANES=True, PIPELINE_PARSE_WORKERS=2)
+
+    assert Config(PIPELINE_VALVE_LANES=False, PIPELINE_PARSE_WORKERS=2).PIPELINE_PARSE_WORKERS == 2
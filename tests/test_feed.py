@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.models.missions import EndUseType
+from app.routes.api import api_router
+from app.services.feed import MissionFeed
+
+
+def publish(feed: MissionFeed, *missions):
+    for index, (valve_id, end_use) in enumerate(missions):
+        feed.publish(f'{{"mission": {index}}}'.encode(), valve_id, end_use)
+
+
+async def received(subscription) -> list:
+    """The queued messages, None once the subscription is closed"""
+    messages = []
+    while True:
+        try:
+            message = await asyncio.wait_for(subscription.get(), 0.05)
+        except asyncio.TimeoutError:
+            return messages
+        messages.append(message.text if message is not None else None)
+        if message is None:
+            return messages
+
+
+def test_slow_subscriber_loses_its_oldest_messages():
+    async def run():
+        feed = MissionFeed(queue_size=2, policy="drop_oldest", max_subscribers=10)
+        subscription = feed.subscribe()
+        publish(feed, *[(1, EndUseType.SHOWER)] * 3)
+        return subscription, await received(subscription)
+
+    subscription, messages = asyncio.run(run())
+
+    assert messages == ['{"mission": 1}', '{"mission": 2}']
+    assert subscription.dropped == 1
+
+
+def test_slow_subscriber_is_removed_under_disconnect():
+    async def run():
+        feed = MissionFeed(queue_size=2, policy="disconnect", max_subscribers=1)
+        slow = feed.subscribe()
+        publish(feed, *[(1, EndUseType.SHOWER)] * 3)
+        # Its place is free again
+        return await received(slow), feed.subscribe()
+
+    messages, replacement = asyncio.run(run())
+
+    assert messages == [None]
+    assert replacement is not None
+
+
+def test_subscriber_limit_is_enforced():
+    async def run():
+        feed = MissionFeed(queue_size=2, policy="drop_oldest", max_subscribers=2)
+        first, second = feed.subscribe(), feed.subscribe()
+        refused = feed.subscribe()
+        feed.unsubscribe(first)
+        return second, refused, feed.subscribe()
+
+    second, refused, after_unsubscribe = asyncio.run(run())
+
+    assert second is not None
+    assert refused is None
+    assert after_unsubscribe is not None
+
+
+def test_subscribers_receive_the_missions_of_their_valves_and_end_uses():
+    async def run():
+        feed = MissionFeed(queue_size=10, policy="drop_oldest", max_subscribers=10)
+        subscription = feed.subscribe(valve_ids=[1, 3], end_uses=[EndUseType.SHOWER])
+        everything = feed.subscribe()
+        publish(
+            feed,
+            (1, EndUseType.SHOWER),
+            (2, EndUseType.SHOWER),
+            (1, EndUseType.TOILET),
+            (3, EndUseType.SHOWER),
+        )
+        return await received(subscription), await received(everything)
+
+    filtered, everything = asyncio.run(run())
+
+    assert filtered == ['{"mission": 0}', '{"mission": 3}']
+    assert len(everything) == 4
+
+
+def test_websocket_beyond_the_limit_is_closed():
+    app = FastAPI()
+    app.include_router(api_router)
+    app.state.feed = MissionFeed(queue_size=2, policy="drop_oldest", max_subscribers=1)
+    client = TestClient(app)
+
+    with client.websocket_connect("/missions/classified/ws?valve_id=1"):
+        with pytest.raises(WebSocketDisconnect) as refused:
+            with client.websocket_connect("/missions/classified/ws"):
+                pass
+        assert refused.value.code == 1013
@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from app.models.missions import CompletedFlowControlMission, FlowControlMission, TrajectoryPoint
+from app.utils.flow_aggregation import summarize_readings, summarize_trajectories
+from app.utils.influx_client import to_ns
+
+# Epoch-aligned to the 10 s windows of aggregateWindow
+BASE_S = 1_700_000_000
+SECOND = 1_000_000_000
+
+
+def at(*seconds: float) -> np.ndarray:
+    return np.array([int((BASE_S + s) * SECOND) for s in seconds], dtype=np.int64)
+
+
+def test_summary_matches_the_flux_query():
+    # Results of the Flux query of `InfluxConnector.get_server_flow_summary`
+    # over these readings:
+    #   mean()                                   35 / 6
+    #   aggregateWindow(every: 10s, fn: mean)    6, 7, (empty), 3  ->  max() 7
+    #   integral(unit: 1m)                       (15 + 28 + 15 + 42 + 97.5) / 60
+    timestamps = at(2, 5, 9, 12, 18, 31)
+    values = np.array([4.0, 6.0, 8.0, 2.0, 12.0, 3.0])
+
+    summary = summarize_readings(timestamps, values)
+
+    assert summary.Mean == pytest.approx(35 / 6)
+    assert summary.Peak == pytest.approx(7.0)
+    assert summary.Volume == pytest.approx(197.5 / 60)
+
+
+def test_peak_windows_are_aligned_to_the_epoch_not_the_first_reading():
+    # A window starting at the first reading would average all of them to 3,
+    # the epoch-aligned windows hold (9) and (1, 1, 1)
+    timestamps = at(9, 11, 13, 15)
+    values = np.array([9.0, 1.0, 1.0, 1.0])
+
+    assert summarize_readings(timestamps, values).Peak == pytest.approx(9.0)
+
+
+def test_single_reading():
+    # integral() of a single point is 0
+    summary = summarize_readings(at(4), np.array([5.0]))
+
+    assert (summary.Mean, summary.Peak, summary.Volume) == (5.0, 5.0, 0.0)
+
+
+def test_no_readings():
+    with pytest.raises(ValueError):
+        summarize_readings(at(), np.array([]))
+
+
+def readings_of(mission: CompletedFlowControlMission, interval_ns: int):
+    """Dense flowmeter readings of the step function a trajectory describes"""
+    start_ns = to_ns(mission.start_ts)
+    offsets = np.arange(0, to_ns(mission.end_ts) - start_ns, interval_ns)
+    ends, rates = np.array(mission.flow_control_mission.flow_trajectory).T
+    # A point holds its rate until its time, the valve is closed after the last one
+    segment = np.searchsorted(ends * SECOND, offsets, side="right")
+    values = np.append(rates, 0.0)[segment]
+    return start_ns + offsets, values
+
+
+def test_trajectory_estimates_match_densely_sampled_readings():
+    trajectories = [
+        [TrajectoryPoint(10, 6.0), TrajectoryPoint(20, 8.0), TrajectoryPoint(45, 2.0)],
+        [TrajectoryPoint(3.5, 1.0), TrajectoryPoint(31, 12.0)],
+        # The valve closes before the mission ends
+        [TrajectoryPoint(12, 4.0)],
+    ]
+    missions = [
+        CompletedFlowControlMission(
+            flow_control_mission=FlowControlMission(valve_id=1, flow_trajectory=trajectory),
+            # Not aligned to the 10 s peak windows
+            start_ts=datetime.fromtimestamp(BASE_S + 100 * index + 3.25, tz=timezone.utc),
+            end_ts=datetime.fromtimestamp(BASE_S + 100 * index + 3.25 + 40, tz=timezone.utc),
+        )
+        for index, trajectory in enumerate(trajectories)
+    ]
+
+    estimates = summarize_trajectories(missions)
+
+    for mission, estimate in zip(missions, estimates):
+        expected = summarize_readings(*readings_of(mission, 1_000_000))
+        for name in ("Volume", "Mean", "Peak"):
+            assert getattr(estimate, name) == pytest.approx(getattr(expected, name), rel=1e-3)
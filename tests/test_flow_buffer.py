@@ -0,0 +1,78 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from app.services.flow_buffer import FlowmeterIngest, FlowRingBuffer
+from app.utils.flow_aggregation import summaries_match, summarize_readings
+
+SECOND = 1_000_000_000
+
+
+def to_datetime(ns: int) -> datetime:
+    return datetime.fromtimestamp(int(ns) / 1e9, tz=timezone.utc)
+
+
+def readings(count: int, first_s: int = 1_700_000_000):
+    timestamps = (first_s + np.arange(count)) * SECOND
+    values = 6 + 4 * np.sin(np.arange(count) / 7)
+    return timestamps.astype(np.int64), values
+
+
+@pytest.mark.parametrize("count", [40, 100, 257])
+def test_summaries_match_the_readings_across_the_ring_wrap(count):
+    buffer = FlowRingBuffer(capacity=64, max_age_ns=3600 * SECOND)
+    timestamps, values = readings(count)
+    # Appended in uneven chunks, so the ring wraps in the middle of windows
+    for start in range(0, count, 13):
+        buffer.extend(timestamps[start : start + 13], values[start : start + 13], 0)
+    buffer.watermark_ns = int(timestamps[-1]) + SECOND
+
+    kept = min(count, 64)
+    for offset, length in [(0, kept), (3, 20), (kept - 25, 25), (kept // 2, 1)]:
+        first = count - kept + offset
+        start_ns, end_ns = int(timestamps[first]), int(timestamps[first]) + length * SECOND
+        expected = summarize_readings(timestamps[first : first + length], values[first : first + length])
+        assert summaries_match(buffer.summarize(start_ns, end_ns), expected)
+
+
+def test_evicted_or_unwritten_windows_are_not_summarized():
+    buffer = FlowRingBuffer(capacity=64, max_age_ns=3600 * SECOND)
+    timestamps, values = readings(100)
+    buffer.extend(timestamps, values, int(timestamps[-1]))
+
+    assert buffer.summarize(int(timestamps[10]), int(timestamps[50])) is None
+    assert buffer.summarize(int(timestamps[90]), int(timestamps[-1]) + SECOND) is None
+    assert buffer.summarize(int(timestamps[90]), int(timestamps[-1])) is not None
+
+
+def push_later(ingest: FlowmeterIngest, timestamps, values, delay_s: float):
+    timer = threading.Timer(delay_s, ingest.push, args=("0", timestamps, values))
+    timer.start()
+    return timer
+
+
+def test_live_window_waits_for_its_readings():
+    ingest = FlowmeterIngest(meter_ids=["0"], max_wait_ms=2000)
+    timestamps, values = readings(60)
+    ingest.push("0", timestamps[:30], values[:30])
+    start, end = to_datetime(timestamps[10]), to_datetime(timestamps[50])
+
+    timer = push_later(ingest, timestamps[30:], values[30:], 0.1)
+    summary = ingest.summarize(start, end)
+    timer.join()
+
+    assert summaries_match(summary, summarize_readings(timestamps[10:50], values[10:50]))
+
+
+def test_live_window_falls_back_at_the_deadline():
+    ingest = FlowmeterIngest(meter_ids=["0"], max_wait_ms=2000)
+    timestamps, values = readings(60)
+    ingest.push("0", timestamps[:30], values[:30])
+    start, end = to_datetime(timestamps[10]), to_datetime(timestamps[50])
+
+    began = time.monotonic()
+    assert ingest.summarize(start, end, deadline=began + 0.1) is None
+    assert time.monotonic() - began < 1
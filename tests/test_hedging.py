@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+from app.utils.hedging import DeadlineExceeded, HedgedReader
+
+
+class FlakyRequest:
+    """A read whose first attempt fails, so only a hedge can answer it"""
+
+    def __init__(self):
+        self.attempts = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.attempts += 1
+            attempt = self.attempts
+        if attempt == 1:
+            raise ConnectionError("InfluxDB is unavailable")
+        return attempt
+
+
+def test_healthy_reads_do_not_save_up_hedges():
+    reader = HedgedReader(workers=4, max_ratio=0.1)
+    try:
+        for _ in range(1000):
+            reader.read("summary", lambda: 1)
+
+        hedged = 0
+        for _ in range(50):
+            try:
+                reader.read("summary", FlakyRequest())
+                hedged += 1
+            except ConnectionError:
+                pass
+    finally:
+        reader.close()
+
+    # The burst plus a tenth of the failing reads, not the budget of the healthy ones
+    assert hedged <= 2 + 0.1 * 50
+
+
+def test_failed_read_is_sent_again():
+    reader = HedgedReader(workers=2, max_ratio=1.0)
+    try:
+        assert reader.read("summary", FlakyRequest()) == 2
+    finally:
+        reader.close()
+
+
+def test_read_without_time_left_is_abandoned():
+    reader = HedgedReader(workers=1)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            reader.read("summary", lambda: 1, deadline=0.0)
+    finally:
+        reader.close()
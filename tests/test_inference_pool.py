@@ -0,0 +1,120 @@
+import multiprocessing
+import time
+
+import numpy as np
+import pytest
+
+from app.services.inference_pool import SharedMemoryInferencePool
+
+_FORK = multiprocessing.get_context("fork")
+
+
+class SlowClassifier:
+    """Toilet for a negative level, a batch starting with a negative delay answers that late"""
+
+    feature_name_ = ["level", "delay"]
+    classes_ = np.array(["Shower", "Toilet"])
+
+    def predict(self, matrix: np.ndarray) -> np.ndarray:
+        labels = np.where(matrix[:, 0] < 0, "Toilet", "Shower")
+        # The warm-up rows are positive
+        if matrix[0, 1] < 0:
+            time.sleep(-matrix[0, 1])
+        return labels
+
+
+@pytest.fixture
+def pool():
+    pool = SharedMemoryInferencePool(
+        SlowClassifier(),
+        version="test",
+        path="test",
+        workers=1,
+        clients=1,
+        slot_rows=2,
+        timeout_s=0.3,
+    )
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def start_worker(pool):
+    """Forks inference worker 0 of the pool, like the supervisor of `app.serve`"""
+
+    def start() -> multiprocessing.Process:
+        process = _FORK.Process(target=pool.serve, args=(0,), daemon=True)
+        process.start()
+        workers.append(process)
+        return process
+
+    workers = []
+    yield start
+    for process in workers:
+        process.kill()
+        process.join()
+
+
+def test_rows_are_predicted_by_a_worker_in_slot_sized_chunks(pool, start_worker):
+    pool.bind(0)
+    start_worker()
+    matrix = np.array([[1, 0], [-1, 0], [-2, 0], [3, 0], [-5, 0]], dtype=np.float64)
+
+    indices = pool.predict_indices(matrix)
+
+    assert pool.classes[indices].tolist() == ["Shower", "Toilet", "Toilet", "Shower", "Toilet"]
+
+
+def test_late_reply_of_a_timed_out_request_is_skipped(pool, start_worker):
+    pool.bind(0)
+    start_worker()
+
+    with pytest.raises(TimeoutError):
+        pool.predict_indices(np.array([[-1, -0.5]]))
+    # The worker was released, its late Toilet reply is not taken for this one
+    assert pool.classes[pool.predict_indices(np.array([[1, 0]]))].tolist() == ["Shower"]
+
+
+def _predict(pool: SharedMemoryInferencePool, rows: list, timeout_s: float = 5):
+    # A client process of its own, making its first requests
+    pool.bind(0)
+    pool.timeout_s = timeout_s
+    try:
+        pool.predict_indices(np.array(rows, dtype=np.float64))
+    except TimeoutError:
+        raise SystemExit(1)
+
+
+def in_client(pool: SharedMemoryInferencePool, *args) -> int:
+    process = _FORK.Process(target=_predict, args=(pool, *args))
+    process.start()
+    process.join()
+    return process.exitcode
+
+
+def test_restarted_client_skips_replies_to_its_predecessor(pool, start_worker):
+    start_worker()
+    # Once the worker is warmed up, the previous process of the client gives up
+    # on a slow request and exits
+    assert in_client(pool, [[1, 0]]) == 0
+    assert in_client(pool, [[-1, -0.5]], 0.3) == 1
+
+    # This process takes its place while the slow reply is still being computed
+    pool.bind(0)
+    pool.timeout_s = 5
+
+    assert pool.classes[pool.predict_indices(np.array([[1, -0.2]]))].tolist() == ["Shower"]
+
+
+def test_restarted_worker_serves_the_same_slots(pool, start_worker):
+    pool.bind(0)
+    worker = start_worker()
+    assert pool.classes[pool.predict_indices(np.array([[-1, 0]]))].tolist() == ["Toilet"]
+
+    worker.kill()
+    worker.join()
+    with pytest.raises(TimeoutError):
+        pool.predict_indices(np.array([[1, 0]]))
+    start_worker()
+
+    assert pool.classes[pool.predict_indices(np.array([[1, 0]]))].tolist() == ["Shower"]
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models.missions import CompletedFlowControlMission, FlowControlMission
+from app.utils.flow_aggregation import summaries_match
+from app.utils.influx_client import InfluxConnector
+from benchmarks.fakes import FakeInflux
+
+START = datetime(2025, 4, 1, 12, tzinfo=timezone.utc)
+
+
+def missions(count: int):
+    return [
+        CompletedFlowControlMission(
+            flow_control_mission=FlowControlMission.model_construct(valve_id=1),
+            start_ts=START + timedelta(minutes=index),
+            end_ts=START + timedelta(minutes=index, seconds=45),
+        )
+        for index in range(count)
+    ]
+
+
+@pytest.fixture
+def connector():
+    def connect(aggregation: str):
+        influx = InfluxConnector(aggregation=aggregation)
+        influx.query_api = fake = FakeInflux(query_latency_ms=0)
+        connected.append(influx)
+        return influx, fake
+
+    connected = []
+    yield connect
+    for influx in connected:
+        influx.close()
+
+
+@pytest.mark.parametrize("aggregation", ["server", "local"])
+def test_batches_follow_the_configured_aggregation(connector, aggregation):
+    influx, fake = connector(aggregation)
+
+    summaries = influx.get_flow_summaries(missions(3))
+
+    # One query per batch either way
+    assert fake.queries == 1
+    for mission, summary in zip(missions(3), summaries):
+        # The server-side aggregation of the fake, one query per mission
+        expected = influx.get_server_flow_summary(mission.start_ts, mission.end_ts)
+        assert summaries_match(summary, expected)
@@ -0,0 +1,46 @@
+from app.utils.influx_writer import BufferedInfluxWriter
+from tests.fakes import FakeBucket
+
+
+def _batch(name: str, time_ns: int):
+    return [f"m,batch={name} v=1 {time_ns}", f"m,batch={name} v=2 {time_ns + 1}"]
+
+
+class _SpillingDuringReplay(FakeBucket):
+    """Rejects batch ``b`` once, while another thread spills batch ``d``"""
+
+    def __init__(self):
+        super().__init__()
+        self.writer = None
+        self.rejected = False
+
+    def write(self, bucket: str, record: str, write_precision=None, **kwargs):
+        if "batch=b" in record and not (self.fail_writes or self.rejected):
+            self.rejected = True
+            self.writer._spill(_batch("d", 40))
+            raise ConnectionError("InfluxDB is unavailable")
+        super().write(bucket, record, write_precision, **kwargs)
+
+
+def test_partly_failed_replay_keeps_the_spill_order(tmp_path):
+    bucket = _SpillingDuringReplay()
+    writer = BufferedInfluxWriter(
+        bucket, "bucket", batch_size=2, spill_path=str(tmp_path / "spill.lp"), replay_interval_s=0
+    )
+    bucket.writer = writer
+
+    bucket.fail_writes = 2
+    for name, time_ns in (("a", 10), ("b", 20)):
+        first, last = _batch(name, time_ns)
+        writer.write(first)
+        assert not writer.write(last)
+    # Replays a, fails on b while d is spilled
+    for line in _batch("c", 30):
+        writer.write(line)
+    for line in _batch("e", 50):
+        writer.write(line)
+
+    batches = [tags["batch"] for tags, _ in bucket.points()]
+    assert batches == ["c", "c", "a", "a", "e", "e", "b", "b", "d", "d"]
+    assert not (tmp_path / "spill.lp").exists()
+    assert not (tmp_path / "spill.lp.replay").exists()
@@ -0,0 +1,117 @@
+import os
+import threading
+from typing import List, Tuple
+
+import pytest
+
+from app.services.journal import WriteAheadJournal
+
+
+class Consumer:
+    """Records the drained records and completes those not in ``unfinished``"""
+
+    def __init__(self, journal: WriteAheadJournal, expected: int, unfinished=()):
+        self.journal = journal
+        self.expected = expected
+        self.unfinished = set(unfinished)
+        self.records: List[Tuple[int, bytes]] = []
+        self.done = threading.Event()
+
+    def __call__(self, seq: int, payload: bytes):
+        self.records.append((seq, payload))
+        if payload not in self.unfinished:
+            self.journal.complete(seq)
+        if len(self.records) >= self.expected:
+            self.done.set()
+
+
+def open_journal(directory, **kwargs) -> WriteAheadJournal:
+    return WriteAheadJournal(str(directory), fsync_interval_ms=1, **kwargs)
+
+
+def drain(journal: WriteAheadJournal, expected: int, unfinished=()) -> List[Tuple[int, bytes]]:
+    consumer = Consumer(journal, expected, unfinished)
+    journal.start(consumer)
+    assert consumer.done.wait(5)
+    return consumer.records
+
+
+def segments(directory) -> List[str]:
+    return sorted(name for name in os.listdir(directory) if name.startswith("segment-"))
+
+
+def test_unfinished_records_are_replayed_on_start(tmp_path):
+    journal = open_journal(tmp_path)
+    for payload in (b"a", b"b", b"c"):
+        journal.append(payload)
+    drain(journal, 3, unfinished={b"b"})
+    journal.close()
+
+    journal = open_journal(tmp_path)
+    assert journal.backlog == 2
+    # Records after the first unfinished one come again, at least once
+    assert drain(journal, 2) == [(2, b"b"), (3, b"c")]
+    journal.append(b"d")
+    journal.close()
+
+    journal = open_journal(tmp_path)
+    assert journal.backlog == 1
+    journal.close()
+
+
+def test_completed_records_are_not_replayed(tmp_path):
+    journal = open_journal(tmp_path)
+    for payload in (b"a", b"b"):
+        journal.append(payload)
+    drain(journal, 2)
+    journal.close()
+
+    with open(tmp_path / "checkpoint", encoding="utf-8") as file:
+        assert file.read() == "2"
+    journal = open_journal(tmp_path)
+    assert journal.backlog == 0
+    assert journal.append(b"c") == 3
+    journal.close()
+
+
+@pytest.mark.parametrize("tail", [b"\x05\x00", b"\x03\x00\x00\x00\x00\x00\x00\x00xyz"])
+def test_torn_or_corrupt_tail_record_is_dropped(tmp_path, tail):
+    journal = open_journal(tmp_path)
+    for payload in (b"a", b"b"):
+        journal.append(payload)
+    journal.close()
+    # A record cut off by a crash, or one whose CRC does not match
+    (segment,) = segments(tmp_path)
+    with open(tmp_path / segment, "ab") as file:
+        file.write(tail)
+
+    journal = open_journal(tmp_path)
+    assert journal.backlog == 2
+    # New records never follow the bad one in its segment
+    assert journal.append(b"c") == 3
+    assert drain(journal, 3) == [(1, b"a"), (2, b"b"), (3, b"c")]
+    journal.close()
+
+
+def test_completed_segments_are_deleted(tmp_path):
+    # Every record fills a segment
+    journal = open_journal(tmp_path, segment_bytes=1, checkpoint_interval_s=0)
+    for payload in (b"a", b"b", b"c", b"d"):
+        journal.append(payload)
+    assert len(segments(tmp_path)) == 4
+    drain(journal, 4, unfinished={b"c"})
+    journal.close()
+
+    # Segments before the unfinished record are gone
+    assert segments(tmp_path) == [
+        "segment-00000000000000000003.log",
+        "segment-00000000000000000004.log",
+    ]
+
+
+def test_append_after_close_is_rejected(tmp_path):
+    journal = open_journal(tmp_path)
+    journal.close()
+
+    with pytest.raises(RuntimeError, match="closed"):
+        journal.append(b"a")
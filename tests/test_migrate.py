@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.migrate import FEATURE_NAMES, migrate_chunk
+from app.models.missions import EndUseType
+from app.utils.influx_client import InfluxConnector, to_ns
+from app.utils.influx_writer import BufferedInfluxWriter
+from tests.fakes import FakeBucket
+
+START = datetime(2025, 4, 1, tzinfo=timezone.utc)
+STOP = START + timedelta(days=1)
+
+
+class LegacyRecord:
+    """A legacy point as streamed by `legacy_query`, its features are tags"""
+
+    def __init__(self, time: datetime, volume: float):
+        self.time = time
+        self.values = {name: str(volume) for name in FEATURE_NAMES}
+
+    def get_time(self) -> datetime:
+        return self.time
+
+    def get_value(self) -> str:
+        return "Shower"
+
+    def line(self) -> str:
+        tags = ",".join(f"{name}={value}" for name, value in self.values.items())
+        return f'Classification,{tags} end_use="Shower" {to_ns(self.time)}'
+
+
+class FakeClient:
+    def __init__(self, bucket: FakeBucket, records):
+        self.bucket = bucket
+        self.records = records
+        self.deletes = 0
+
+    def query_api(self):
+        return self
+
+    def query_stream(self, query: str):
+        # Every chunk of these tests covers all records
+        return iter(self.records)
+
+    def delete_api(self):
+        return self
+
+    def delete(self, **kwargs):
+        self.deletes += 1
+        self.bucket.delete(**kwargs)
+
+
+def legacy_bucket(*times: datetime):
+    bucket = FakeBucket()
+    records = [LegacyRecord(time, index + 1.0) for index, time in enumerate(times)]
+    for record in records:
+        bucket.write("test", record.line())
+    return bucket, records
+
+
+def migrate(bucket: FakeBucket, records, writer: BufferedInfluxWriter) -> FakeClient:
+    client = FakeClient(bucket, records)
+    assert migrate_chunk(client, "test", START, STOP, writer, delete_legacy=True) == len(records)
+    return client
+
+
+def test_chunk_is_deleted_with_one_request_once_written(tmp_path):
+    bucket, records = legacy_bucket(START, START + timedelta(hours=1))
+    # Written by the service in the new schema meanwhile
+    current = InfluxConnector.classification_point(
+        EndUseType.TOILET, START + timedelta(hours=2), {name: 1.0 for name in FEATURE_NAMES}
+    )
+    bucket.write("test", current.to_line_protocol())
+    # The first point of the next chunk
+    bucket.write("test", LegacyRecord(STOP, 9.0).line())
+    writer = BufferedInfluxWriter(bucket, "test", spill_path=str(tmp_path / "spill.lp"))
+
+    client = migrate(bucket, records, writer)
+
+    assert client.deletes == 1
+    points = sorted((time_ns, tags.get("predicted_end_use")) for tags, time_ns in bucket.points())
+    assert points == [
+        (to_ns(START), "Shower"),
+        (to_ns(START + timedelta(hours=1)), "Shower"),
+        (to_ns(START + timedelta(hours=2)), "Toilet"),
+        (to_ns(STOP), None),
+    ]
+
+
+def test_failed_write_keeps_the_legacy_points(tmp_path):
+    bucket, records = legacy_bucket(START, START + timedelta(hours=1))
+    bucket.fail_writes = 1
+    writer = BufferedInfluxWriter(
+        bucket, "test", batch_size=1, spill_path=str(tmp_path / "spill.lp")
+    )
+
+    with pytest.raises(RuntimeError):
+        migrate(bucket, records, writer)
+
+    assert sum("Volume" in tags for tags, _ in bucket.points()) == 2
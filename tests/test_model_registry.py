@@ -0,0 +1,29 @@
+import os
+
+from app.services.model_registry import ModelRegistry
+
+
+def touch(path, mtime_s: int):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("{}")
+    os.utime(path, (mtime_s, mtime_s))
+
+
+def test_latest_pairs_native_models_with_their_labels(tmp_path):
+    registry = ModelRegistry(on_swap=lambda model: None, directory=str(tmp_path))
+    touch(tmp_path / "old.pkl", 100)
+    touch(tmp_path / "model.txt", 200)
+
+    # The labels are not written yet
+    assert registry.latest() == (str(tmp_path / "old.pkl"), 100 * 10**9)
+
+    touch(tmp_path / "model.txt.classes.json", 300)
+    assert registry.latest() == (str(tmp_path / "model.txt"), 300 * 10**9)
+
+
+def test_latest_ignores_label_files(tmp_path):
+    registry = ModelRegistry(on_swap=lambda model: None, directory=str(tmp_path))
+    touch(tmp_path / "model.json", 100)
+    touch(tmp_path / "stray.txt.classes.json", 200)
+
+    assert registry.latest() == (str(tmp_path / "model.json"), 100 * 10**9)
@@ -0,0 +1,52 @@
+import threading
+import time
+
+from app.services.pipeline import Stage
+
+
+def wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.005)
+
+
+def test_items_put_while_stopping_are_dropped():
+    release = threading.Event()
+    handled = []
+    done = []
+
+    def handle(item):
+        release.wait()
+        handled.append(item)
+
+    stage = Stage("test", handle, queue_size=2, overflow="drop_oldest", on_done=done.append)
+    stage.start()
+    stage.put("a")
+    wait_until(lambda: stage.depth == 0)
+    stage.put("b")
+    stopping = threading.Thread(target=stage.stop, daemon=True)
+    stopping.start()
+    # The stop marker of the worker is queued behind "b"
+    wait_until(lambda: stage.depth == 2)
+
+    # Neither queued behind the marker nor evicting it
+    assert not stage.put("c")
+    assert not stage.put("d")
+    release.set()
+    stopping.join(5)
+
+    assert not stopping.is_alive()
+    assert handled == ["a", "b"]
+    # Dropped "c" and "d", then the handled items leave the pipeline
+    assert done == ["c", "d", "a", "b"]
+    assert stage.dropped == 2
+
+
+def test_blocking_put_while_stopping_does_not_wait():
+    stage = Stage("test", lambda item: None, queue_size=1, on_done=lambda item: None)
+    stage.start()
+    stage.stop()
+
+    assert not stage.put("a")
+    assert stage.depth == 0
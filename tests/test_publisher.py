@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from app.services.publisher import BackendPublisher
+from tests.fakes import StubServer
+
+
+def publisher(stub: StubServer, **options) -> BackendPublisher:
+    options = {"workers": 1, "max_retries": 3, "retry_backoff": 0.05, **options}
+    return BackendPublisher(base_url=stub.url, timeout=2, **options)
+
+
+def test_server_errors_are_retried_with_backoff():
+    with StubServer(statuses=[503, 502]) as stub:
+        sender = publisher(stub)
+        sender.start()
+        assert sender.publish(b'{"id": 1}')
+        sender.stop()
+
+    assert (sender.sent, sender.failed) == (1, 0)
+    assert [path for path, _, _ in stub.requests] == [BackendPublisher.LAST_PATH] * 3
+    times = [at for _, _, at in stub.requests]
+    # 0.05 s before the first retry, doubled before the second
+    assert times[1] - times[0] >= 0.05
+    assert times[2] - times[1] >= 0.1
+
+
+def test_missions_are_given_up_after_the_last_retry():
+    with StubServer(statuses=[500] * 10) as stub:
+        sender = publisher(stub, max_retries=2, retry_backoff=0.01)
+        sender.start()
+        sender.publish(b'{"id": 1}')
+        sender.stop()
+
+    assert (sender.sent, sender.failed) == (0, 1)
+    assert len(stub.requests) == 3
+
+
+def test_client_errors_are_not_retried():
+    with StubServer(statuses=[422]) as stub:
+        sender = publisher(stub)
+        sender.start()
+        sender.publish(b'{"id": 1}')
+        sender.stop()
+
+    assert (sender.sent, sender.failed) == (0, 1)
+    assert len(stub.requests) == 1
+
+
+def test_batches_are_posted_as_one_array():
+    with StubServer() as stub:
+        sender = publisher(stub, batch_size=3, batch_wait_ms=1000)
+        for index in range(3):
+            sender.publish(json.dumps({"id": index}).encode())
+        sender.start()
+        sender.stop()
+
+    assert sender.sent == 3
+    (path, body, _), = stub.requests
+    assert path == BackendPublisher.BATCH_PATH
+    assert json.loads(body) == [{"id": 0}, {"id": 1}, {"id": 2}]
+
+
+@pytest.mark.parametrize("batch_size", [1, 2])
+def test_full_queue_drops_new_missions(batch_size):
+    with StubServer() as stub:
+        sender = publisher(stub, queue_size=2, batch_size=batch_size)
+        assert sender.publish(b'{"id": 0}')
+        assert sender.publish(b'{"id": 1}')
+        assert not sender.publish(b'{"id": 2}')
+        sender.start()
+        sender.stop()
+
+    assert (sender.sent, sender.failed) == (2, 1)
+    bodies = b"".join(body for _, body, _ in stub.requests)
+    assert b'"id": 2' not in bodies
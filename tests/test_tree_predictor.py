@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+from lightgbm import LGBMClassifier
+
+from app.services.tree_predictor import TreePredictor
+
+FEATURES = ["Volume", "Mean", "Peak", "Duration"]
+
+
+def training_data(classes: list, rows: int = 600):
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(0, 2, (rows, len(FEATURES)))
+    labels = np.asarray(classes)[
+        (np.digitize(matrix[:, 0] + matrix[:, 1], [-1, 1]) + (matrix[:, 2] > 1)) % len(classes)
+    ]
+    # Missing and zero readings, so the trees learn NaN and zero missing-value splits
+    matrix[rng.random(matrix.shape) < 0.1] = np.nan
+    matrix[rng.random(matrix.shape) < 0.1] = 0.0
+    return pd.DataFrame(matrix, columns=FEATURES), labels
+
+
+def evaluation_matrix() -> np.ndarray:
+    rng = np.random.default_rng(1)
+    matrix = rng.normal(0, 2, (500, len(FEATURES)))
+    matrix[rng.random(matrix.shape) < 0.15] = np.nan
+    matrix[rng.random(matrix.shape) < 0.15] = 0.0
+    # Values LightGBM treats as zero, and rows without a single reading
+    matrix[:10, 0] = 1e-40
+    matrix[10:20] = np.nan
+    return matrix
+
+
+@pytest.mark.parametrize("classes", [["Shower", "Toilet"], ["Shower", "Toilet", "Faucet"]])
+@pytest.mark.parametrize("zero_as_missing", [False, True])
+@pytest.mark.parametrize("early_exit", [False, True])
+def test_predictions_match_lightgbm(classes, zero_as_missing, early_exit):
+    frame, labels = training_data(classes)
+    model = LGBMClassifier(
+        n_estimators=40,
+        num_leaves=15,
+        min_child_samples=5,
+        zero_as_missing=zero_as_missing,
+        verbose=-1,
+    ).fit(frame, labels)
+    matrix = evaluation_matrix()
+
+    predictor = TreePredictor.from_classifier(model, early_exit=early_exit, chunk_iterations=4)
+
+    expected = model.predict(pd.DataFrame(matrix, columns=FEATURES))
+    np.testing.assert_array_equal(predictor.predict(matrix), expected)
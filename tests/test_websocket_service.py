@@ -0,0 +1,177 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app.models.flow_data import FeatureSource, FlowDataSummary
+from app.models.missions import EndUseType
+from app.services.journal import WriteAheadJournal
+from app.services.websocket_service import _MISSION_ADAPTER, WebSocketService
+from app.utils.flow_aggregation import summarize_trajectories
+from app.utils.hedging import HedgedReader
+
+START = datetime(2025, 4, 1, 12, tzinfo=timezone.utc)
+SUMMARY = FlowDataSummary(Volume=3.0, Mean=6.0, Peak=8.0)
+
+
+class FakeConnector:
+    """The parts of `InfluxConnector` the pipeline uses, failing the first ``failures`` fetches"""
+
+    def __init__(self, failures: int = 0, readings: bool = True):
+        self.failures = failures
+        self.readings = readings
+        self.written = []
+        self.sources = []
+        self.done = threading.Event()
+
+    def _fetch(self):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("InfluxDB is unavailable")
+
+    def get_flow_summary(self, start_ts, end_ts, meter_id="0", deadline=None):
+        self._fetch()
+        if not self.readings:
+            # Like `summarize_readings` and `FlowDataSummary.from_influx_values`
+            raise ValueError("No flowmeter readings in the requested range")
+        return SUMMARY
+
+    def get_flow_summaries(self, missions, meter_ids=None, deadline=None):
+        self._fetch()
+        return [SUMMARY if self.readings else None for _ in missions]
+
+    def write_classified_end_use(self, end_use, mission, flow_features, **kwargs):
+        self.written.append((mission.flow_control_mission.valve_id, end_use))
+        self.sources.append(kwargs.get("feature_source"))
+        self.done.set()
+
+
+class SlowConnector(FakeConnector):
+    """Reads through a `HedgedReader` that answers long after any budget"""
+
+    def __init__(self):
+        super().__init__()
+        self.reader = HedgedReader(workers=1)
+
+    def get_flow_summaries(self, missions, meter_ids=None, deadline=None):
+        def _query():
+            time.sleep(2)
+            return [SUMMARY for _ in missions]
+
+        return self.reader.read("summary", _query, deadline)
+
+
+class FakePredictor:
+    def predict(self, flow_features):
+        return "Shower"
+
+
+def mission_message(valve_id: int = 1) -> str:
+    return json.dumps(
+        {
+            "flow_control_mission": {
+                "valve_id": valve_id,
+                "flow_trajectory": [[10, 6.0], [20, 8.0]],
+                "duration_scaling_factor": 1,
+            },
+            "start_ts": START.isoformat(),
+            "end_ts": (START + timedelta(seconds=20)).isoformat(),
+        }
+    )
+
+
+def make_service(influx: FakeConnector, **kwargs) -> WebSocketService:
+    model = SimpleNamespace(predictor=FakePredictor(), version="test")
+    return WebSocketService(influx=influx, model=model, **kwargs)
+
+
+def test_failed_fetch_releases_the_mission_for_redelivery():
+    influx = FakeConnector(failures=1)
+    service = make_service(influx)
+    service.pipeline.start()
+    try:
+        service._on_mission_message(None, mission_message())
+        # The failed mission leaves the pipeline before its redelivery arrives
+        assert not influx.done.wait(0.5)
+        service._on_mission_message(None, mission_message())
+        assert influx.done.wait(5)
+    finally:
+        service.pipeline.stop()
+        service.publisher.stop()
+
+    assert influx.written == [(1, EndUseType.SHOWER)]
+
+
+def test_published_mission_stays_claimed():
+    influx = FakeConnector()
+    service = make_service(influx)
+    service.pipeline.start()
+    try:
+        service._on_mission_message(None, mission_message())
+        assert influx.done.wait(5)
+        service._on_mission_message(None, mission_message())
+    finally:
+        service.pipeline.stop()
+        service.publisher.stop()
+
+    assert len(influx.written) == 1
+
+
+def test_binary_frames_are_journaled_as_they_are(tmp_path):
+    journal = WriteAheadJournal(str(tmp_path))
+    model = SimpleNamespace(predictor=FakePredictor(), version="test")
+    service = WebSocketService(influx=FakeConnector(), model=model, journal=journal)
+
+    service._on_mission_message(None, mission_message())
+    service._on_mission_message(None, mission_message().encode())
+    journal.close()
+
+    assert WriteAheadJournal(str(tmp_path)).backlog == 2
+
+
+def test_missions_without_readings_have_no_features():
+    service = make_service(FakeConnector(readings=False))
+    mission = _MISSION_ADAPTER.validate_json(mission_message())
+
+    # One mission is fetched on its own, several with the batched query
+    assert service.features_for_missions([mission]) == ([None], [None])
+    assert service.features_for_missions([mission, mission]) == ([None, None], [None, None])
+
+
+def test_race_estimates_from_the_trajectory_after_its_budget():
+    influx = SlowConnector()
+    service = make_service(influx, feature_source="race", race_budget_ms=50)
+    missions = [_MISSION_ADAPTER.validate_json(mission_message(valve_id)) for valve_id in (1, 2)]
+
+    started = time.monotonic()
+    flow_summaries, sources = service.summarize_missions(missions)
+    elapsed = time.monotonic() - started
+    influx.reader.close()
+
+    assert elapsed < 1
+    assert flow_summaries == summarize_trajectories(missions)
+    assert sources == [FeatureSource.TRAJECTORY] * 2
+
+
+def test_race_keeps_the_flowmeter_summaries_in_time():
+    service = make_service(FakeConnector(), feature_source="race", race_budget_ms=50)
+    mission = _MISSION_ADAPTER.validate_json(mission_message())
+
+    assert service.summarize_missions([mission]) == ([SUMMARY], [FeatureSource.FLOWMETER])
+
+
+def test_feature_source_is_recorded_with_the_classification():
+    influx = FakeConnector()
+    service = make_service(influx, feature_source="trajectory")
+    payloads = []
+    service._post_to_backend = payloads.append
+    service.pipeline.start()
+    try:
+        service._on_mission_message(None, mission_message())
+        assert influx.done.wait(5)
+    finally:
+        service.pipeline.stop()
+
+    assert influx.sources == [FeatureSource.TRAJECTORY]
+    assert json.loads(payloads[0])["feature_source"] == "trajectory"